@@ -0,0 +1,121 @@
+"""
+The arithmetic and logic operations of the CPU. Each operation takes the
+operand(s) and the current F register, and returns the result and the new F
+register.
+"""
+from typing import Callable, Dict, Tuple
+
+from pyboy.registers import FLAG_C, FLAG_H, FLAG_N, FLAG_Z
+
+
+def add(a: int, value: int, f: int) -> Tuple[int, int]:
+    result = a + value
+    return result & 0xFF, ((0 if result & 0xFF else FLAG_Z) |
+                           ((a & 0xF) + (value & 0xF) > 0xF) << 5 |
+                           (result > 0xFF) << 4)
+
+
+def adc(a: int, value: int, f: int) -> Tuple[int, int]:
+    carry = (f >> 4) & 1
+    result = a + value + carry
+    return result & 0xFF, ((0 if result & 0xFF else FLAG_Z) |
+                           ((a & 0xF) + (value & 0xF) + carry > 0xF) << 5 |
+                           (result > 0xFF) << 4)
+
+
+def sub(a: int, value: int, f: int) -> Tuple[int, int]:
+    result = a - value
+    return result & 0xFF, ((0 if result & 0xFF else FLAG_Z) | FLAG_N |
+                           ((a & 0xF) < (value & 0xF)) << 5 |
+                           (result < 0) << 4)
+
+
+def sbc(a: int, value: int, f: int) -> Tuple[int, int]:
+    carry = (f >> 4) & 1
+    result = a - value - carry
+    return result & 0xFF, ((0 if result & 0xFF else FLAG_Z) | FLAG_N |
+                           ((a & 0xF) - (value & 0xF) - carry < 0) << 5 |
+                           (result < 0) << 4)
+
+
+def and_(a: int, value: int, f: int) -> Tuple[int, int]:
+    result = a & value
+    return result, (0 if result else FLAG_Z) | FLAG_H
+
+
+def or_(a: int, value: int, f: int) -> Tuple[int, int]:
+    result = a | value
+    return result, 0 if result else FLAG_Z
+
+
+def xor(a: int, value: int, f: int) -> Tuple[int, int]:
+    result = a ^ value
+    return result, 0 if result else FLAG_Z
+
+
+def cp(a: int, value: int, f: int) -> Tuple[int, int]:
+    return a, sub(a, value, f)[1]
+
+
+ALU_OPERATIONS = {
+    "ADD": add, "ADC": adc, "SUB": sub, "SBC": sbc,
+    "AND": and_, "OR": or_, "XOR": xor, "CP": cp,
+}  # type: Dict[str, Callable[[int, int, int], Tuple[int, int]]]
+
+
+def rlc(value: int, f: int) -> Tuple[int, int]:
+    carry = value >> 7
+    return ((value << 1) | carry) & 0xFF, carry
+
+
+def rrc(value: int, f: int) -> Tuple[int, int]:
+    carry = value & 1
+    return (value >> 1) | (carry << 7), carry
+
+
+def rl(value: int, f: int) -> Tuple[int, int]:
+    return ((value << 1) | ((f >> 4) & 1)) & 0xFF, value >> 7
+
+
+def rr(value: int, f: int) -> Tuple[int, int]:
+    return (value >> 1) | ((f << 3) & 0x80), value & 1
+
+
+def sla(value: int, f: int) -> Tuple[int, int]:
+    return (value << 1) & 0xFF, value >> 7
+
+
+def sra(value: int, f: int) -> Tuple[int, int]:
+    return (value >> 1) | (value & 0x80), value & 1
+
+
+def srl(value: int, f: int) -> Tuple[int, int]:
+    return value >> 1, value & 1
+
+
+def swap(value: int, f: int) -> Tuple[int, int]:
+    return ((value << 4) | (value >> 4)) & 0xFF, 0
+
+
+# the operations return the result and the carry
+SHIFT_OPERATIONS = {
+    "RLC": rlc, "RRC": rrc, "RL": rl, "RR": rr,
+    "SLA": sla, "SRA": sra, "SRL": srl, "SWAP": swap,
+}  # type: Dict[str, Callable[[int, int], Tuple[int, int]]]
+
+
+def daa(a: int, f: int) -> Tuple[int, int]:
+    carry = f & FLAG_C
+    if not f & FLAG_N:
+        if carry or a > 0x99:
+            a += 0x60
+            carry = FLAG_C
+        if f & FLAG_H or (a & 0x0F) > 0x09:
+            a += 0x06
+    else:
+        if carry:
+            a -= 0x60
+        if f & FLAG_H:
+            a -= 0x06
+    a &= 0xFF
+    return a, (0 if a else FLAG_Z) | (f & FLAG_N) | carry
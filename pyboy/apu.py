@@ -0,0 +1,337 @@
+"""
+The audio processing unit : two square channels (the first with a frequency
+sweep), a wave channel and a noise channel, mixed to stereo.
+
+Writes to the sound registers are only recorded with their cycle count.
+Once a frame, an event replays them : the samples between two writes are
+synthesized with NumPy for the whole span, as the channels do not change
+in between except for their envelope, length and sweep, which are
+functions of the time since the channel was triggered. The samples of each
+frame are stored as an int16 block of (left, right) pairs.
+
+Without audio, the GameBoy has no APU at all : the registers are plain
+memory and nothing is scheduled.
+"""
+from collections import deque
+from functools import lru_cache
+from typing import Deque, List, Optional, Tuple
+
+import numpy as np
+
+from pyboy.gpu import LINE_CYCLES, LINES
+from pyboy.scheduler import Event, Scheduler
+
+CLOCK = 4194304
+FRAME_CYCLES = LINE_CYCLES * LINES
+SAMPLE_RATE = 48000
+
+# registers
+NR10 = 0xFF10
+NR11 = 0xFF11
+NR12 = 0xFF12
+NR13 = 0xFF13
+NR14 = 0xFF14
+NR21 = 0xFF16
+NR22 = 0xFF17
+NR23 = 0xFF18
+NR24 = 0xFF19
+NR30 = 0xFF1A
+NR31 = 0xFF1B
+NR32 = 0xFF1C
+NR33 = 0xFF1D
+NR34 = 0xFF1E
+NR41 = 0xFF20
+NR42 = 0xFF21
+NR43 = 0xFF22
+NR44 = 0xFF23
+NR50 = 0xFF24
+NR51 = 0xFF25
+NR52 = 0xFF26
+WAVE_RAM = 0xFF30
+# the sound registers and the wave RAM
+SOUND_START = NR10
+SOUND_END = 0xFF40
+
+POWER = 0x80
+TRIGGER = 0x80
+LENGTH_ENABLE = 0x40
+
+# cycles between two steps of the length counters (256 Hz), the sweep
+# (128 Hz) and the envelopes (64 Hz)
+LENGTH_CYCLES = CLOCK // 256
+SWEEP_CYCLES = CLOCK // 128
+ENVELOPE_CYCLES = CLOCK // 64
+
+# the 8 steps of the square waves, by duty cycle
+DUTY = np.array([[0, 0, 0, 0, 0, 0, 0, 1],
+                 [1, 0, 0, 0, 0, 0, 0, 1],
+                 [1, 0, 0, 0, 0, 1, 1, 1],
+                 [0, 1, 1, 1, 1, 1, 1, 0]], dtype=np.float32) * 2 - 1
+# right shift of the wave samples by output level, 4 muting them
+WAVE_SHIFTS = (4, 0, 1, 2)
+# cycles between two noise steps, before the shift of NR43
+NOISE_DIVISORS = (8, 16, 32, 48, 64, 80, 96, 112)
+# a channel at full volume is 15 : 4 channels at the full master volume fit an int16
+SCALE = 64
+
+
+@lru_cache(maxsize=None)
+def lfsr(width: int) -> np.ndarray:
+    """returns a period of the noise channel output, -1 or 1, for a 15 or 7 bits LFSR"""
+    state = (1 << width) - 1
+    bits = []  # type: List[int]
+    for _ in range((1 << width) - 1):
+        bits.append(~state & 1)
+        feedback = (state ^ (state >> 1)) & 1
+        state = (state >> 1) | (feedback << (width - 1))
+    return np.array(bits, dtype=np.float32) * 2 - 1
+
+
+class Channel(object):
+    """The state of a channel, besides its registers"""
+    __slots__ = ('base', 'length', 'on', 'trigger', 'length_end', 'frequency', 'phase', 'sweep_next')
+
+    def __init__(self, base: int, length: int):
+        # address of the first register (NRx0), and length counter range
+        self.base = base
+        self.length = length
+        self.on = False
+        self.trigger = 0
+        self.length_end = 0
+        self.frequency = 0
+        # position in the waveform, in steps
+        self.phase = 0.0
+        # cycle count of the next sweep step, for the first channel
+        self.sweep_next = None  # type: Optional[int]
+
+
+class APU(object):
+    """
+    registers are the sound registers and the wave RAM as of position, the
+    cycle count synthesis has reached : memory has them as of now.
+
+    read() returns the samples of the frames synthesized since the last
+    call, up to max_frames of them.
+    """
+
+    def __init__(self, memory, scheduler: Scheduler, sample_rate: int = SAMPLE_RATE, max_frames: int = 60):
+        self.memory = memory
+        self.mem = memory.mem
+        self.scheduler = scheduler
+        self.sample_rate = sample_rate
+        self.registers = bytearray(self.mem[SOUND_START:SOUND_END])
+        self.channels = [Channel(NR10, 64), Channel(NR21 - 1, 64), Channel(NR30, 256), Channel(NR41 - 1, 64)]
+        # (cycle count, address, value) of the writes not replayed yet
+        self.writes = []  # type: List[Tuple[int, int, int]]
+        self.position = scheduler.cycles
+        self.sample = self.sample_index(self.position)
+        # the samples of the current frame, and of the last frames
+        self.spans = []  # type: List[np.ndarray]
+        self.blocks = deque(maxlen=max_frames)  # type: Deque[np.ndarray]
+        self.frame = None  # type: Optional[Event]
+        for address in range(SOUND_START, SOUND_END):
+            memory.add_io_hook(address, write=self.write)
+        memory.add_io_hook(NR52, read=self.read_status, write=self.write)
+        self.reschedule()
+
+    def sample_index(self, cycles: int) -> int:
+        return cycles * self.sample_rate // CLOCK
+
+    def reschedule(self) -> None:
+        """
+        schedules the end of the current frame, after the scheduler was
+        cleared. The writes not replayed yet are dropped : synthesis resumes
+        from the registers as they are now.
+        """
+        self.writes.clear()
+        self.spans.clear()
+        self.registers[:] = self.mem[SOUND_START:SOUND_END]
+        self.position = self.scheduler.cycles
+        self.sample = self.sample_index(self.position)
+        self.frame = self.scheduler.schedule(self.position + FRAME_CYCLES, self.frame_event)
+
+    # registers
+
+    def write(self, address: int, value: int) -> None:
+        mem = self.mem
+        if address < NR52 and not mem[NR52] & POWER:
+            # powered off, NR10-NR51 ignore writes
+            return
+        self.writes.append((self.scheduler.cycles, address, value))
+        if address == NR52:
+            if not value & POWER:
+                mem[NR10:NR52] = bytes(NR52 - NR10)
+            value = (value & POWER) | (mem[NR52] & 0x7F)
+        mem[address] = value
+
+    def read_status(self, address: int) -> int:
+        self.sync(self.scheduler.cycles)
+        status = self.registers[NR52 - SOUND_START] & POWER
+        for index, channel in enumerate(self.channels):
+            if channel.on:
+                status |= 1 << index
+        return 0x70 | status
+
+    def register(self, address: int) -> int:
+        return self.registers[address - SOUND_START]
+
+    def apply(self, cycle: int, address: int, value: int) -> None:
+        """applies a recorded write, at its cycle count"""
+        registers = self.registers
+        if address == NR52:
+            registers[NR52 - SOUND_START] = value & POWER
+            if not value & POWER:
+                # powering off clears the registers
+                registers[:NR52 - SOUND_START] = bytes(NR52 - SOUND_START)
+                for channel in self.channels:
+                    channel.on = False
+            return
+        registers[address - SOUND_START] = value
+        if address >= NR50:
+            return
+        channel = self.channels[min((address - NR10) // 5, 3)]
+        register = address - channel.base
+        if register == 1:
+            channel.length_end = cycle + (channel.length - (value & (channel.length - 1))) * LENGTH_CYCLES
+        elif register == 2 and not self.dac(channel):
+            channel.on = False
+        elif register == 0 and channel.base == NR30 and not value & 0x80:
+            channel.on = False
+        elif register in (3, 4):
+            channel.frequency = (self.register(channel.base + 4) & 0x07) << 8 | self.register(channel.base + 3)
+        if register == 4 and value & TRIGGER:
+            self.trigger(channel, cycle)
+
+    def dac(self, channel: Channel) -> bool:
+        """returns whether the DAC of a channel is on"""
+        if channel.base == NR30:
+            return bool(self.register(NR30) & 0x80)
+        return bool(self.register(channel.base + 2) & 0xF8)
+
+    def trigger(self, channel: Channel, cycle: int) -> None:
+        channel.on = self.dac(channel)
+        channel.trigger = cycle
+        if channel.length_end <= cycle:
+            channel.length_end = cycle + channel.length * LENGTH_CYCLES
+        channel.phase = 0.0
+        if channel.base == NR10:
+            period = (self.register(NR10) >> 4) & 0x07
+            channel.sweep_next = cycle + period * SWEEP_CYCLES if period else None
+
+    # synthesis
+
+    def frame_event(self, cycle: int) -> int:
+        self.sync(cycle)
+        if self.spans:
+            self.blocks.append(np.concatenate(self.spans))
+            self.spans.clear()
+        return cycle + FRAME_CYCLES
+
+    def sync(self, cycles: int) -> None:
+        """replays the recorded writes and synthesizes the samples up to the given cycle count"""
+        for cycle, address, value in self.writes:
+            self.synthesize(cycle)
+            self.apply(cycle, address, value)
+        self.writes.clear()
+        self.synthesize(cycles)
+
+    def synthesize(self, until: int) -> None:
+        """synthesizes the samples from position to until, the registers not changing"""
+        sweep = self.channels[0]
+        while sweep.on and sweep.sweep_next is not None and sweep.sweep_next < until:
+            self.synthesize_span(sweep.sweep_next)
+            self.step_sweep(sweep)
+        self.synthesize_span(until)
+
+    def step_sweep(self, channel: Channel) -> None:
+        nr10 = self.register(NR10)
+        period = (nr10 >> 4) & 0x07
+        shift = nr10 & 0x07
+        if shift:
+            delta = channel.frequency >> shift
+            frequency = channel.frequency - delta if nr10 & 0x08 else channel.frequency + delta
+            if frequency > 0x7FF:
+                channel.on = False
+            else:
+                channel.frequency = frequency
+        channel.sweep_next = channel.sweep_next + period * SWEEP_CYCLES if period else None
+
+    def synthesize_span(self, until: int) -> None:
+        start = self.position
+        if until <= start:
+            return
+        self.position = until
+        end_sample = self.sample_index(until)
+        count = end_sample - self.sample
+        if count <= 0:
+            return
+        times = (self.sample + np.arange(count)) * (CLOCK / self.sample_rate)
+        self.sample = end_sample
+        left = np.zeros(count, dtype=np.float32)
+        right = np.zeros(count, dtype=np.float32)
+        if self.register(NR52) & POWER:
+            panning = self.register(NR51)
+            for index, channel in enumerate(self.channels):
+                if not channel.on:
+                    continue
+                output = self.channel_output(channel, times, start, until)
+                if channel.on and self.register(channel.base + 4) & LENGTH_ENABLE and channel.length_end < until:
+                    output[times >= channel.length_end] = 0
+                    channel.on = False
+                if panning & (0x10 << index):
+                    left += output
+                if panning & (0x01 << index):
+                    right += output
+        volume = self.register(NR50)
+        samples = np.empty((count, 2), dtype=np.int16)
+        samples[:, 0] = left * (((volume >> 4) & 0x07) + 1) * SCALE
+        samples[:, 1] = right * ((volume & 0x07) + 1) * SCALE
+        self.spans.append(samples)
+
+    def channel_output(self, channel: Channel, times: np.ndarray, start: int, until: int) -> np.ndarray:
+        """returns the output of a channel at the given cycle counts, advancing its phase"""
+        if channel.base == NR30:
+            # 32 4-bit samples, a step every 2 cycles per unit of 2048 - frequency
+            steps = self.advance(channel, times, start, until, (0x800 - channel.frequency) * 2, 32)
+            wave = np.frombuffer(self.registers, dtype=np.uint8)[WAVE_RAM - SOUND_START:]
+            nibbles = np.empty(32, dtype=np.float32)
+            nibbles[0::2] = wave >> 4
+            nibbles[1::2] = wave & 0x0F
+            shift = WAVE_SHIFTS[(self.register(NR32) >> 5) & 0x03]
+            return (nibbles[steps] * 2 - 15) / (1 << shift) if shift < 4 else np.zeros(len(times), np.float32)
+        if channel.base == NR41 - 1:
+            nr43 = self.register(NR43)
+            sequence = lfsr(7 if nr43 & 0x08 else 15)
+            period = NOISE_DIVISORS[nr43 & 0x07] << (nr43 >> 4)
+            output = sequence[self.advance(channel, times, start, until, period, len(sequence))]
+        else:
+            duty = DUTY[self.register(channel.base + 1) >> 6]
+            output = duty[self.advance(channel, times, start, until, (0x800 - channel.frequency) * 4, 8)]
+        return output * self.envelope(channel, times)
+
+    @staticmethod
+    def advance(channel: Channel, times: np.ndarray, start: int, until: int, period: int, steps: int) -> np.ndarray:
+        """returns the waveform step at each cycle count, a step lasting period cycles"""
+        positions = ((channel.phase + (times - start) / period) % steps).astype(np.intp)
+        channel.phase = (channel.phase + (until - start) / period) % steps
+        return positions
+
+    def envelope(self, channel: Channel, times: np.ndarray) -> np.ndarray:
+        """returns the volume of a square or noise channel at the given cycle counts"""
+        nrx2 = self.register(channel.base + 2)
+        volume = nrx2 >> 4
+        period = nrx2 & 0x07
+        if not period:
+            return np.float32(volume)
+        steps = (times - channel.trigger) // (period * ENVELOPE_CYCLES)
+        if nrx2 & 0x08:
+            return np.minimum(volume + steps, 15).astype(np.float32)
+        return np.maximum(volume - steps, 0).astype(np.float32)
+
+    def read(self) -> np.ndarray:
+        """returns the (left, right) int16 samples of the frames since the last call"""
+        if not self.blocks:
+            return np.empty((0, 2), dtype=np.int16)
+        samples = np.concatenate(self.blocks)
+        self.blocks.clear()
+        return samples
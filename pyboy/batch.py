@@ -0,0 +1,85 @@
+from typing import List, Optional
+
+import numpy as np
+
+from pyboy.cartridge import Cartridge
+from pyboy.gameboy import GameBoy
+from pyboy.gpu import SCREEN_HEIGHT, SCREEN_WIDTH, SHADES
+
+
+class GameBoyBatch(object):
+    """
+    Runs many GameBoys on the same ROM in lockstep, one frame per step.
+
+    Screens are rendered straight into one (N, 144, 160) array, so step()
+    returns them without copying : the array is overwritten by the next step.
+    The instances share the memory-mapped ROM, the instruction table and the
+    code of the blocks compiled by the JIT. Screens can be rendered into a
+    given array instead, such as one in shared memory. Keyword options are
+    passed to each GameBoy.
+    """
+
+    def __init__(self, rom: str, count: int, screens: Optional[np.ndarray] = None, **options):
+        self.cartridge = Cartridge(rom)
+        if screens is None:
+            screens = np.empty((count, SCREEN_HEIGHT, SCREEN_WIDTH), dtype=np.uint8)
+        screens.fill(SHADES[0])
+        self.screens = screens
+        self.buttons = np.zeros(count, dtype=np.uint8)
+        self.gameboys = []  # type: List[GameBoy]
+        for index in range(count):
+            gameboy = GameBoy(**options)
+            gameboy.gpu.framebuffer = self.screens[index]
+            gameboy.load_cartridge(self.cartridge)
+            self.gameboys.append(gameboy)
+
+    def __len__(self):
+        return len(self.gameboys)
+
+    def __getitem__(self, index: int) -> GameBoy:
+        return self.gameboys[index]
+
+    def step(self, buttons: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        runs a frame on every instance, with the given (N,) array of pressed
+        buttons (see pyboy.joypad) or the previous ones, returns the screens
+        """
+        if buttons is not None:
+            self.buttons[:] = buttons
+            for gameboy, pressed in zip(self.gameboys, self.buttons.tolist()):
+                gameboy.joypad.press(pressed)
+        for gameboy in self.gameboys:
+            gameboy.run_frame()
+        return self.screens
+
+    def script(self, inputs: np.ndarray) -> None:
+        """
+        presses the masks of a (frames, N) array on the next frames, such as
+        an input log mapped by pyboy.joypad.load_inputs : instance i reads
+        column i in place
+        """
+        for index, gameboy in enumerate(self.gameboys):
+            gameboy.joypad.script(inputs[:, index])
+
+    def run(self, frames: int) -> np.ndarray:
+        """
+        runs frames frames on every instance in lockstep, with their scripted
+        input if any, returns the screens
+        """
+        gameboys = self.gameboys
+        for _ in range(frames):
+            for gameboy in gameboys:
+                gameboy.run_frame()
+        return self.screens
+
+    def get_screens(self) -> np.ndarray:
+        """
+        returns the screens, rendering the last frame of the instances which
+        skipped it
+        """
+        for gameboy in self.gameboys:
+            gameboy.get_screen()
+        return self.screens
+
+    def close(self) -> None:
+        self.cartridge.close()
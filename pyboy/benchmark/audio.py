@@ -0,0 +1,52 @@
+"""
+Measures the CPU time per emulated second with the APU on and off, on a
+synthetic ROM : a copy loop run by the JIT, which changes the frequency of
+the second channel on each pass, with the four channels playing.
+
+Run with ``python -m pyboy.benchmark.audio``
+"""
+import time
+
+from pyboy.apu import NR12, NR14, NR22, NR24, NR30, NR34, NR42, NR44, NR50, NR51, NR52, WAVE_RAM
+from pyboy.gameboy import GameBoy
+
+# start: LD HL,0x0200 / LD DE,0xC000 / LD B,0x00
+# loop:  LDI A,(HL) / LD (DE),A / INC DE / DEC B / JR NZ,loop
+#        LDH (0x18),A : NR23
+#        JP start
+PROGRAM = [0x21, 0x00, 0x02, 0x11, 0x00, 0xC0, 0x06, 0x00,
+           0x2A, 0x12, 0x13, 0x05, 0x20, 0xFA,
+           0xE0, 0x18,
+           0xC3, 0x00, 0x01]
+SECONDS = 5
+FRAMES_PER_SECOND = 60
+
+
+def run(audio: bool) -> float:
+    """returns the CPU seconds per emulated second"""
+    gameboy = GameBoy(jit_threshold=16, headless=True, audio=audio)
+    memory = gameboy.memory
+    memory.write_block(0x100, PROGRAM)
+    memory.write_block(WAVE_RAM, bytes(range(0, 0x100, 0x10)))
+    memory[NR52] = 0x80
+    memory[NR50] = 0x77
+    memory[NR51] = 0xFF
+    for register, value in ((NR12, 0xF0), (NR14, 0x87), (NR22, 0xF0), (NR24, 0x87),
+                            (NR30, 0x80), (NR34, 0x87), (NR42, 0xF3), (NR44, 0x80)):
+        memory[register] = value
+    start = time.process_time()
+    for _ in range(SECONDS * FRAMES_PER_SECOND):
+        gameboy.run_frame()
+        gameboy.get_audio()
+    return (time.process_time() - start) / SECONDS
+
+
+def main():
+    off = run(audio=False)
+    on = run(audio=True)
+    print("audio off : {:.3f} CPU s per emulated second".format(off))
+    print("audio on  : {:.3f} CPU s per emulated second (+{:.1f}%)".format(on, (on / off - 1) * 100))
+
+
+if __name__ == "__main__":
+    main()
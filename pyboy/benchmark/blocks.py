@@ -0,0 +1,44 @@
+"""
+Compares the run loop executing single instructions against the basic-block
+cache and the JIT, on a synthetic ROM copying a block of ROM to work RAM in a
+loop.
+
+Run with ``python -m pyboy.benchmark.blocks``
+"""
+import time
+
+from pyboy.gameboy import GameBoy
+
+# start: LD HL,0x0200 / LD DE,0xC000 / LD B,0x00
+# loop:  LDI A,(HL) / LD (DE),A / INC DE / DEC B / JR NZ,loop
+#        JP start
+PROGRAM = [0x21, 0x00, 0x02, 0x11, 0x00, 0xC0, 0x06, 0x00,
+           0x2A, 0x12, 0x13, 0x05, 0x20, 0xFA,
+           0xC3, 0x00, 0x01]
+FRAMES = 30
+
+
+def run(use_block_cache: bool, jit_threshold=None):
+    """returns the emulated frames per second, and the gameboy"""
+    gameboy = GameBoy(use_block_cache=use_block_cache, jit_threshold=jit_threshold)
+    for address, byte in enumerate(PROGRAM, 0x100):
+        gameboy.memory[address] = byte
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        gameboy.run_frame()
+    return FRAMES / (time.perf_counter() - start), gameboy
+
+
+def main():
+    before, _ = run(False)
+    after, _ = run(True)
+    jit, gameboy = run(True, jit_threshold=16)
+    print("instructions : {:>8.1f} frames/s".format(before))
+    print("block cache  : {:>8.1f} frames/s ({:.2f}x)".format(after, after / before))
+    print("jit          : {:>8.1f} frames/s ({:.2f}x)".format(jit, jit / before))
+    for name, value in sorted(gameboy.cpu.block_cache.stats().items()):
+        print("  {:<15} {:>12,.2f}".format(name, value))
+
+
+if __name__ == "__main__":
+    main()
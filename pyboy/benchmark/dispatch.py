@@ -0,0 +1,117 @@
+"""
+Compares the instructions per second of the opcode dispatch table against the
+string comparison chain it replaced, on a synthetic ROM made of loads.
+
+Run with ``python -m pyboy.benchmark.dispatch``
+"""
+import time
+
+from pyboy.cpu import CPU, OpcodeException
+from pyboy.instruction import ArgumentType as ArgType, Instruction
+from pyboy.memory import Memory
+
+# LD A,0x12 / LD B,A / LD C,A / LD A,B / LD B,0x34 / LD HL,0xC000
+# LD (HL),A / LD A,(HL) / LDI (HL),A / NOP
+PROGRAM = [0x3E, 0x12, 0x47, 0x4F, 0x78, 0x06, 0x34, 0x21, 0x00, 0xC0, 0x77, 0x7E, 0x22, 0x00]
+INSTRUCTIONS = 10
+ROUNDS = 20000
+
+
+class StringDispatchCPU(CPU):
+    """
+    The CPU as it was before the dispatch table : a string comparison chain.
+    Only loads are executed, other groups stop at their comparison.
+    """
+
+    def exec_next(self) -> int:
+        self.exec(self.get_next_byte())
+        return 4
+
+    def exec(self, opcode: int) -> None:
+        instruction = self.instructions.tables['default'][opcode]
+        asm = instruction.asm
+
+        if asm == "PREFIX CB":
+            return
+        elif asm.startswith("LD"):
+            self.exec_load(instruction)
+        elif asm == "PUSH":
+            pass
+        elif asm == "POP":
+            pass
+        elif asm in ("ADD", "ADC"):
+            pass
+        elif asm in ("SUB", "SBC"):
+            pass
+        elif asm == "AND":
+            pass
+        elif asm == "OR":
+            pass
+        elif asm == "XOR":
+            pass
+        elif asm == "CP":
+            pass
+        elif asm == "INC":
+            pass
+        elif asm == "DEC":
+            pass
+
+    def exec_load(self, instruction: Instruction) -> None:
+        store_to = instruction.args[0]
+        store_from = instruction.args[1]
+        value = 0
+        asm = instruction.asm
+        if asm == "LD":
+            if store_to.arg_type == ArgType.REGISTER:
+                if store_from.arg_type == ArgType.REGISTER:
+                    if store_from.dereference:
+                        value = self.memory[self.registers[store_from.register]]
+                    else:
+                        value = self.registers[store_from.register]
+                elif store_from.arg_type == ArgType.UNSIGNED_8:
+                    value = self.get_next_byte()
+                elif store_from.arg_type == ArgType.UNSIGNED_16:
+                    value = self.get_next_byte()
+                    value += self.get_next_byte() << 8
+
+                if store_to.dereference:
+                    self.memory[self.registers[store_to.register]] = value
+                else:
+                    self.registers[store_to.register] = value
+            else:
+                raise OpcodeException("{} not implemented".format(repr(instruction)))
+        elif asm in ("LDD", "LDI"):
+            if store_to.register == "A":
+                self.registers["A"] = self.memory[self.registers["HL"]]
+            else:
+                self.memory[self.registers["HL"]] = self.registers["A"]
+            self.registers["HL"] += 1 if asm == "LDI" else -1
+        else:
+            raise OpcodeException("{} not implemented".format(repr(instruction)))
+
+
+def run(cpu_class) -> float:
+    """returns the number of instructions executed per second"""
+    memory = Memory()
+    cpu = cpu_class(memory)
+    for address, byte in enumerate(PROGRAM, 0x100):
+        memory[address] = byte
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        cpu.registers['PC'] = 0x100
+        cpu.registers['HL'] = 0xC000
+        for _ in range(INSTRUCTIONS):
+            cpu.exec_next()
+    return INSTRUCTIONS * ROUNDS / (time.perf_counter() - start)
+
+
+def main():
+    before = run(StringDispatchCPU)
+    after = run(CPU)
+    print("string dispatch : {:>12,.0f} instructions/s".format(before))
+    print("dispatch table  : {:>12,.0f} instructions/s".format(after))
+    print("speedup         : {:>12.2f}x".format(after / before))
+
+
+if __name__ == "__main__":
+    main()
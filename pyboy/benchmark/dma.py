@@ -0,0 +1,41 @@
+"""
+Measures an OAM DMA started by a write to 0xFF46, a single slice copy, next
+to the same 160 bytes copied byte by byte through the page table.
+
+Run with ``python -m pyboy.benchmark.dma``
+"""
+import time
+
+from pyboy.dma import DMA_REGISTER, OAM_LENGTH
+from pyboy.gameboy import GameBoy
+
+TRANSFERS = 20000
+
+
+def per_byte(gameboy, source):
+    memory = gameboy.memory
+    for offset in range(OAM_LENGTH):
+        memory[0xFE00 + offset] = memory[source + offset]
+
+
+def dma(gameboy, source):
+    gameboy.memory[DMA_REGISTER] = source >> 8
+    gameboy.dma.finish()
+
+
+def measure(function) -> float:
+    """returns the microseconds per transfer"""
+    gameboy = GameBoy(headless=True)
+    start = time.perf_counter()
+    for _ in range(TRANSFERS):
+        function(gameboy, 0xC100)
+    return (time.perf_counter() - start) / TRANSFERS * 1e6
+
+
+def main():
+    for name, function in (("per byte", per_byte), ("dma", dma)):
+        print("{:<8} : {:>7.2f} us per transfer".format(name, measure(function)))
+
+
+if __name__ == "__main__":
+    main()
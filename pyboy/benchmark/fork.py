@@ -0,0 +1,122 @@
+"""
+Measures the memory and time of a fork tree : every node runs a frame, then
+branches into children, either forked (copy-on-write) or copied (a new
+GameBoy restoring a snapshot of its parent). Time is the time to branch.
+
+Memory is split into the buffers (memory and cartridge RAM) the kernel
+allocated, read from /proc/self/smaps_rollup (Linux), and the Python objects,
+measured with tracemalloc.
+
+Run with ``python -m pyboy.benchmark.fork [depth] [branching]``
+"""
+import gc
+import multiprocessing
+import os
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+
+from pyboy.benchmark.rom import write_rom
+from pyboy.gameboy import GameBoy
+
+# start: LD HL,0xC000 / LD B,0x00
+# loop:  LD A,(HL) / ADD A,B / LDI (HL),A / INC B / JR NZ,loop
+#        LD (0xA000),A / JP start
+PROGRAM = [0x21, 0x00, 0xC0, 0x06, 0x00,
+           0x7E, 0x80, 0x22, 0x04, 0x20, 0xFA,
+           0xEA, 0x00, 0xA0, 0xC3, 0x00, 0x01]
+HEADER = {0x147: 0x1B,  # MBC5 with RAM
+          0x149: 0x04}  # 128 KiB of RAM
+
+
+def private_bytes() -> int:
+    """returns the private memory of the process, 0 if unknown"""
+    try:
+        with open('/proc/self/smaps_rollup') as smaps:
+            for line in smaps:
+                if line.startswith('Private_Dirty:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def copy(gameboy: GameBoy) -> GameBoy:
+    child = GameBoy(jit_threshold=16)
+    child.load_cartridge(gameboy.cartridge)
+    child.restore(gameboy.snapshot())
+    return child
+
+
+def grow(path: str, branch, depth: int, branching: int) -> Tuple[List[GameBoy], float]:
+    """returns every node of the tree, and the seconds spent branching"""
+    root = GameBoy(jit_threshold=16)
+    root.load_rom(path)
+    root.memory[0x0000] = 0x0A  # enable RAM
+    root.memory.write_block(0xD000, bytes(range(256)) * 16)
+    nodes = [root]
+    level = [root]
+    seconds = 0.0
+    for _ in range(depth):
+        children = []
+        for node in level:
+            node.run_frame()
+            start = time.perf_counter()
+            children.extend(branch(node) for _ in range(branching))
+            seconds += time.perf_counter() - start
+        nodes.extend(children)
+        level = children
+    for node in level:
+        node.run_frame()
+    return nodes, seconds
+
+
+BRANCHES = {'copy': copy, 'fork': GameBoy.fork}
+
+
+def measure(path: str, name: str, depth: int, branching: int) -> tuple:
+    """
+    returns the seconds to branch, the bytes of buffers and of Python objects
+    per node. The private memory of the process is measured in a run without
+    tracing, and the Python objects in a traced one.
+    """
+    branch = BRANCHES[name]
+    gc.collect()
+    private = private_bytes()
+    nodes, seconds = grow(path, branch, depth, branching)
+    private = private_bytes() - private
+    nodes[0].cartridge.close()
+    del nodes
+    gc.collect()
+
+    tracemalloc.start()
+    nodes, _ = grow(path, branch, depth, branching)
+    python = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    nodes[0].cartridge.close()
+    count = len(nodes) - 1
+    del nodes
+    gc.collect()
+    return seconds / count, max(private - python, 0) / count, python / count
+
+
+def main():
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    branching = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    path = write_rom(PROGRAM, HEADER)
+    try:
+        print("depth {}, branching {}, 128 KiB of cartridge RAM".format(depth, branching))
+        print("per node   {:>10} {:>16} {:>16}".format("time", "buffers", "Python objects"))
+        for name in BRANCHES:
+            # in a new process each, for the memory of one not to be reused by the other
+            with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as executor:
+                seconds, kernel, python = executor.submit(measure, path, name, depth, branching).result()
+            print("{:<10} {:>7.2f} ms {:>13,.0f} B {:>14,.0f} B".format(name, seconds * 1000, kernel, python))
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
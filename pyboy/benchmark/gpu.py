@@ -0,0 +1,47 @@
+"""
+Measures the frames per second of the PPU alone, rendering random tiles with
+the window and 40 sprites on, and the counters of its tile cache.
+
+Run with ``python -m pyboy.benchmark.gpu``
+"""
+import random
+import time
+
+from pyboy.gameboy import CYCLES_PER_FRAME
+from pyboy.gpu import GPU, LCDC, WX, WY
+from pyboy.memory import Memory
+
+FRAMES = 120
+
+
+def create(sprites: bool) -> GPU:
+    rng = random.Random(0)
+    memory = Memory()
+    memory.write_block(0x8000, bytes(rng.randrange(0x100) for _ in range(0x2000)))
+    if sprites:
+        memory.write_block(0xFE00, bytes(
+            value for index in range(40) for value in (16 + index * 3, 8 + index * 4, index, rng.randrange(0x100))
+        ))
+    memory[LCDC] = 0xF3 if sprites else 0xF1
+    memory[WY] = 72
+    memory[WX] = 87
+    return GPU(memory)
+
+
+def run(gpu: GPU) -> float:
+    """returns the frames rendered per second"""
+    start = time.perf_counter()
+    gpu.update(FRAMES * CYCLES_PER_FRAME)
+    return gpu.frames / (time.perf_counter() - start)
+
+
+def main():
+    print("background and window : {:>8.1f} frames/s".format(run(create(False))))
+    gpu = create(True)
+    print("with sprites          : {:>8.1f} frames/s".format(run(gpu)))
+    for name, value in sorted(gpu.tile_cache.stats().items()):
+        print("  {:<20} {:>10,}".format(name, value))
+
+
+if __name__ == "__main__":
+    main()
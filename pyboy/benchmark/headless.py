@@ -0,0 +1,54 @@
+"""
+Compares the emulated frames per second with every frame rendered, with
+frame-skip and headless, on a synthetic ROM : a copy loop run by the JIT,
+with a full background, the window and sprites on screen.
+
+Run with ``python -m pyboy.benchmark.headless``
+"""
+import random
+import time
+
+from pyboy.gameboy import GameBoy
+from pyboy.gpu import LCDC, WX, WY
+
+# start: LD HL,0x0200 / LD DE,0xC000 / LD B,0x00
+# loop:  LDI A,(HL) / LD (DE),A / INC DE / DEC B / JR NZ,loop
+#        JP start
+PROGRAM = [0x21, 0x00, 0x02, 0x11, 0x00, 0xC0, 0x06, 0x00,
+           0x2A, 0x12, 0x13, 0x05, 0x20, 0xFA,
+           0xC3, 0x00, 0x01]
+FRAMES = 60
+
+
+def run(**options) -> float:
+    """returns the emulated frames per second"""
+    rng = random.Random(0)
+    gameboy = GameBoy(jit_threshold=16, **options)
+    memory = gameboy.memory
+    for address, byte in enumerate(PROGRAM, 0x100):
+        memory[address] = byte
+    memory.write_block(0x8000, bytes(rng.randrange(0x100) for _ in range(0x2000)))
+    memory.write_block(0xFE00, bytes(
+        value for index in range(40) for value in (16 + index * 3, 8 + index * 4, index, rng.randrange(0x100))
+    ))
+    memory[LCDC] = 0xF3
+    memory[WY] = 72
+    memory[WX] = 87
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        gameboy.run_frame()
+    return FRAMES / (time.perf_counter() - start)
+
+
+def main():
+    rendered = run()
+    print("every frame rendered : {:>8.1f} frames/s".format(rendered))
+    for frame_skip in (1, 3, 9):
+        skipped = run(frame_skip=frame_skip)
+        print("frame skip {:<10} : {:>8.1f} frames/s ({:.2f}x)".format(frame_skip, skipped, skipped / rendered))
+    headless = run(headless=True)
+    print("headless             : {:>8.1f} frames/s ({:.2f}x)".format(headless, headless / rendered))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Measures the frames per second of a synthetic ROM which, like most games,
+does a little work then waits for the vertical blank every frame, with and
+without skipping its idle loop to the next GPU event.
+
+Run with ``python -m pyboy.benchmark.idle``
+"""
+import time
+
+from pyboy.gameboy import GameBoy
+
+# start: LD HL,0x0200 / LD DE,0xC000 / LD B,0x40
+# copy:  LDI A,(HL) / LD (DE),A / INC DE / DEC B / JR NZ,copy
+# vbl:   LDH A,(0x44) / CP 0x90 / JR NZ,vbl
+# end:   LDH A,(0x44) / CP 0x90 / JR Z,end
+#        JP start
+PROGRAM = [0x21, 0x00, 0x02, 0x11, 0x00, 0xC0, 0x06, 0x40,
+           0x2A, 0x12, 0x13, 0x05, 0x20, 0xFA,
+           0xF0, 0x44, 0xFE, 0x90, 0x20, 0xFA,
+           0xF0, 0x44, 0xFE, 0x90, 0x28, 0xFA,
+           0xC3, 0x00, 0x01]
+FRAMES = 60
+
+
+def run(skip: bool, **options) -> float:
+    """returns the frames per second"""
+    gameboy = GameBoy(headless=True, **options)
+    if not skip:
+        gameboy.cpu.block_cache.is_idle_loop = lambda decoded, address: False
+    for address, byte in enumerate(PROGRAM, 0x100):
+        gameboy.memory[address] = byte
+    gameboy.run_frame()
+    start = time.process_time()
+    for _ in range(FRAMES):
+        gameboy.run_frame()
+    return FRAMES / (time.process_time() - start)
+
+
+def main():
+    baseline = None
+    for name, skip, options in (
+            ("interpreter", False, {}),
+            ("JIT", False, {'jit_threshold': 16}),
+            ("JIT, idle loops skipped", True, {'jit_threshold': 16}),
+    ):
+        frames = max(run(skip, **options) for _ in range(3))
+        baseline = baseline or frames
+        print("{:<24}: {:>10.1f} frames/s ({:.1f}x)".format(name, frames, frames / baseline))
+
+
+if __name__ == "__main__":
+    main()
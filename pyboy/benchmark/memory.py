@@ -0,0 +1,49 @@
+"""
+Measures the throughput of Memory reads and writes through the page table,
+for sequential and random accesses, next to a plain bytearray for reference.
+
+Run with ``python -m pyboy.benchmark.memory``
+"""
+import random
+import time
+
+from pyboy.memory import Memory
+
+ACCESSES = 200000
+
+
+def measure(function, addresses) -> float:
+    """returns the number of accesses per second"""
+    start = time.perf_counter()
+    function(addresses)
+    return len(addresses) / (time.perf_counter() - start)
+
+
+def reads(memory):
+    def run(addresses):
+        for address in addresses:
+            memory[address]
+    return run
+
+
+def writes(memory):
+    def run(addresses):
+        for address in addresses:
+            memory[address] = 0x42
+    return run
+
+
+def main():
+    memory = Memory()
+    reference = bytearray(0x10000)
+    # work RAM and high RAM, where game code spends most of its accesses
+    sequential = [0xC000 + address % 0x2000 for address in range(ACCESSES)]
+    random_addresses = [random.choice((0xC000, 0xFF80)) + random.randrange(0x7F) for _ in range(ACCESSES)]
+    for name, addresses in (("sequential", sequential), ("random", random_addresses)):
+        for operation, make in (("reads", reads), ("writes", writes)):
+            print("{:<10} {:<6} : memory {:>12,.0f}/s   bytearray {:>12,.0f}/s".format(
+                name, operation, measure(make(memory), addresses), measure(make(reference), addresses)))
+
+
+if __name__ == "__main__":
+    main()
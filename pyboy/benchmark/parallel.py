@@ -0,0 +1,54 @@
+"""
+Measures how the frames per second of the ParallelRunner scale with the
+number of worker processes, with a fixed number of instances stepped in
+lockstep on a synthetic ROM running a copy loop through the JIT.
+
+Run with ``python -m pyboy.benchmark.parallel [instances]``
+"""
+import os
+import sys
+import time
+
+from pyboy.benchmark.rom import write_rom
+from pyboy.parallel import ParallelRunner
+
+# start: LD HL,0x0200 / LD DE,0xC000 / LD B,0x00
+# loop:  LDI A,(HL) / LD (DE),A / INC DE / DEC B / JR NZ,loop
+#        JP start
+PROGRAM = [0x21, 0x00, 0x02, 0x11, 0x00, 0xC0, 0x06, 0x00,
+           0x2A, 0x12, 0x13, 0x05, 0x20, 0xFA,
+           0xC3, 0x00, 0x01]
+STEPS = 30
+
+
+def run(path: str, instances: int, workers: int) -> float:
+    """returns the emulated frames per second, over all the instances"""
+    with ParallelRunner(path, instances, workers=workers, jit_threshold=16) as runner:
+        runner.step()  # warm up
+        start = time.perf_counter()
+        for _ in range(STEPS):
+            runner.step()
+        return STEPS * instances / (time.perf_counter() - start)
+
+
+def main():
+    cores = os.cpu_count() or 1
+    instances = int(sys.argv[1]) if len(sys.argv) > 1 else max(cores, 4)
+    path = write_rom(PROGRAM)
+    try:
+        print("{} instances, {} cores".format(instances, cores))
+        workers = 1
+        single = None
+        while True:
+            frames = run(path, instances, workers)
+            single = single or frames
+            print("{:>3} workers : {:>8.1f} frames/s ({:.2f}x)".format(workers, frames, frames / single))
+            if workers >= min(cores, instances):
+                break
+            workers = min(workers * 2, cores, instances)
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
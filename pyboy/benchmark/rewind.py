@@ -0,0 +1,55 @@
+"""
+Measures the overhead of recording rewind states, and the bytes per record,
+on a synthetic ROM : a copy loop run by the JIT, with a full background.
+
+Run with ``python -m pyboy.benchmark.rewind``
+"""
+import random
+import time
+import timeit
+
+from pyboy.gameboy import GameBoy
+from pyboy.gpu import LCDC
+
+# start: LD HL,0x0200 / LD DE,0xC000 / LD B,0x00
+# loop:  LDI A,(HL) / LD (DE),A / INC DE / DEC B / JR NZ,loop
+#        JP start
+PROGRAM = [0x21, 0x00, 0x02, 0x11, 0x00, 0xC0, 0x06, 0x00,
+           0x2A, 0x12, 0x13, 0x05, 0x20, 0xFA,
+           0xC3, 0x00, 0x01]
+FRAMES = 120
+
+
+def create() -> GameBoy:
+    rng = random.Random(0)
+    gameboy = GameBoy(jit_threshold=16)
+    for address, byte in enumerate(PROGRAM, 0x100):
+        gameboy.memory[address] = byte
+    gameboy.memory.write_block(0x8000, bytes(rng.randrange(0x100) for _ in range(0x2000)))
+    gameboy.memory[LCDC] = 0x91
+    return gameboy
+
+
+def main():
+    """
+    times frames and records separately : on a shared machine, the noise of
+    comparing two frame rates exceeds the overhead
+    """
+    gameboy = create()
+    rewind = gameboy.enable_rewind(interval=1)
+    for _ in range(FRAMES):
+        gameboy.run_frame()
+    frame = min(timeit.repeat(gameboy.run_frame, number=10, repeat=5)) / 10
+    record = min(timeit.repeat(rewind.record, number=100, repeat=5)) / 100
+    stats = rewind.stats()
+    print("frame            : {:>8.0f} us".format(frame * 1e6))
+    print("record           : {:>8.0f} us, {:,.0f} bytes".format(record * 1e6, stats['bytes'] / stats['records']))
+    for interval in (1, 4, 16):
+        print("every {:<2} frames  : {:>8.1f} % overhead".format(interval, 100 * record / interval / frame))
+    start = time.perf_counter()
+    rewind.rewind(rewind.keyframe_interval - 1)
+    print("rewind           : {:>8.0f} us".format((time.perf_counter() - start) * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+"""
+Synthetic ROMs for the benchmarks.
+"""
+import os
+import tempfile
+from typing import Dict, Optional, Sequence
+
+
+def write_rom(program: Sequence[int], header: Optional[Dict[int, int]] = None) -> str:
+    """
+    writes a 32 KiB ROM running the program from 0x100, with the given header
+    bytes ({address: value}), returns its path
+    """
+    rom = bytearray(0x8000)
+    rom[0x100:0x100 + len(program)] = bytes(program)
+    for address, value in (header or {}).items():
+        rom[address] = value
+    handle, path = tempfile.mkstemp(suffix='.gb')
+    with os.fdopen(handle, 'wb') as output:
+        output.write(rom)
+    return path
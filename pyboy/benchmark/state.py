@@ -0,0 +1,49 @@
+"""
+Measures the latency of save states : the in-memory snapshot and restore,
+the binary save_state and load_state, next to building a new GameBoy.
+
+Run with ``python -m pyboy.benchmark.state``
+"""
+import os
+import timeit
+
+from pyboy.benchmark.rom import write_rom
+from pyboy.gameboy import GameBoy
+
+# loop: INC A / JR loop
+PROGRAM = [0x3C, 0x18, 0xFD]
+HEADER = {0x147: 0x03,  # MBC1
+          0x149: 0x03}  # 32 KiB of RAM
+REPEAT = 2000
+
+
+def measure(function) -> float:
+    """returns the best time of a call, in microseconds"""
+    return min(timeit.repeat(function, number=REPEAT, repeat=5)) / REPEAT * 1e6
+
+
+def main():
+    path = write_rom(PROGRAM, HEADER)
+    try:
+        gameboy = GameBoy(jit_threshold=16)
+        gameboy.load_rom(path)
+        gameboy.run_frame()
+        state = gameboy.snapshot()
+        data = gameboy.save_state()
+
+        def create():
+            GameBoy(jit_threshold=16).load_cartridge(gameboy.cartridge)
+
+        print("save state size        : {:>8,} bytes".format(len(data)))
+        print("snapshot()             : {:>8.1f} us".format(measure(gameboy.snapshot)))
+        print("restore()              : {:>8.1f} us".format(measure(lambda: gameboy.restore(state))))
+        print("save_state()           : {:>8.1f} us".format(measure(gameboy.save_state)))
+        print("load_state()           : {:>8.1f} us".format(measure(lambda: gameboy.load_state(data))))
+        print("new GameBoy            : {:>8.1f} us".format(min(timeit.repeat(create, number=20, repeat=3)) / 20 * 1e6))
+        gameboy.cartridge.close()
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
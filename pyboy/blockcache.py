@@ -0,0 +1,300 @@
+from itertools import cycle
+from typing import Dict, List, Optional, Set, Tuple
+
+from pyboy.dma import BUSY_READ_PAGE
+from pyboy.instruction import WAITING, ArgumentType, Instruction
+from pyboy.jit import compile_block
+from pyboy.page import HookedPage
+
+# instructions after which a block ends : they change PC or the interrupts state
+TERMINATORS = ("JP", "JR", "CALL", "RET", "RETI", "RST", "HALT", "STOP", "DI", "EI")
+MAX_BLOCK_LENGTH = 32
+
+# registers only changed by the GPU events (STAT, LY, IF), polled by idle loops
+WAIT_REGISTERS = (0xFF41, 0xFF44, 0xFF0F)
+# instructions of an idle loop after the load of A : they only compute flags from A
+IDLE_TESTS = ("CP", "AND", "OR", "BIT")
+
+
+class Block(object):
+    """A decoded basic block : run executes it and returns the cycles it took"""
+    __slots__ = ('address', 'end', 'length', 'run', 'decoded', 'executions', 'idle')
+
+    def __init__(self, address, end, length, run, decoded, idle=False):
+        self.address = address  # type: int
+        self.end = end  # type: int
+        self.length = length  # type: int
+        self.run = run
+        # (instruction, immediate operands, address) of each instruction, for the JIT
+        self.decoded = decoded  # type: List[Tuple[Instruction, List[int], int]]
+        self.executions = 0
+        # whether the block is a loop polling a register until an event changes it
+        self.idle = idle  # type: bool
+
+
+class BlockCache(object):
+    """
+    Caches the basic blocks executed by the CPU : straight-line runs of
+    instructions, decoded once into a sequence of handlers with their
+    immediate operands already extracted.
+
+    Blocks are keyed by ROM bank and address, so bank switches need no
+    invalidation. Blocks in RAM are invalidated when a write lands in one of
+    their pages : those pages are mapped to write hooks until then.
+
+    With a jit_threshold, blocks executed that many times are compiled into
+    Python functions (see pyboy.jit); blocks the JIT does not support keep
+    running their handlers.
+
+    Idle loops, which poll STAT, LY or IF until the GPU changes them, return
+    WAITING when they loop back : the run loop then skips to the next event.
+
+    During an OAM DMA transfer, code in the pages the CPU cannot access runs
+    through the interpreter : blocks are neither built from nor run on the
+    0xFF the CPU reads there.
+    """
+
+    def __init__(self, cpu, jit_threshold: Optional[int] = None):
+        self.cpu = cpu
+        self.memory = cpu.memory
+        self.blocks = {}  # type: Dict[int, Block]
+        self.page_blocks = {}  # type: Dict[int, Set[int]]
+        self.watched_pages = {}  # type: Dict[int, object]
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.instructions = 0
+        self.jit_threshold = jit_threshold
+        self.compiled = 0
+        self.not_compiled = 0
+
+    def key(self, address: int) -> Optional[int]:
+        """
+        returns the cache key of a block starting at address, None if blocks
+        there are not cached
+        """
+        if address < 0x4000:
+            return self.memory.rom0_bank << 16 | address
+        if address < 0x8000:
+            return self.memory.rom_bank << 16 | address
+        if 0xC000 <= address < 0xE000:
+            return address
+        return None
+
+    def exec_block(self) -> int:
+        """
+        executes the block at PC, returns the cycles it took
+        """
+        cpu = self.cpu
+        if cpu.halted:
+            return WAITING
+        pc = cpu.registers.pc
+        key = self.key(pc)
+        if key is None or self.memory.read_pages[pc >> 8] is BUSY_READ_PAGE:
+            return cpu.exec_next()
+        block = self.blocks.get(key)
+        if block is None:
+            block = self.build(pc, key)
+            if block is None:
+                return cpu.exec_next()
+            self.misses += 1
+        else:
+            self.hits += 1
+        self.instructions += block.length
+        block.executions += 1
+        if block.executions == self.jit_threshold:
+            self.compile(block)
+        return block.run()
+
+    def compile(self, block: Block) -> None:
+        """
+        replaces the handlers of a block by a compiled function, if supported
+        """
+        run = compile_block(self.cpu, block.decoded, block.end)
+        if run is None:
+            self.not_compiled += 1
+        else:
+            block.run = self.wait(block.address, run) if block.idle else run
+            self.compiled += 1
+
+    def build(self, address: int, key: int) -> Optional[Block]:
+        """
+        decodes and caches the block starting at address
+        """
+        cpu = self.cpu
+        memory = self.memory
+        registers = cpu.registers
+        table = cpu.instructions.tables['default']
+        limit = 0x4000 if address < 0x4000 else 0x8000 if address < 0x8000 else 0xE000
+
+        handlers = []
+        cycles = []  # type: List[int]
+        decoded = []  # type: List[Tuple[Instruction, List[int], int]]
+        pc = address
+        while len(handlers) < MAX_BLOCK_LENGTH:
+            instruction = table[memory[pc]]
+            length = instruction.length
+            if pc + length > limit:
+                break
+            operands = []  # type: List[int]
+            if instruction.asm == "PREFIX CB":
+                instruction = cpu.instructions.tables['PREFIX CB'][memory[pc + 1]]
+                handler = cpu.handler(cpu.dispatch_cb, instruction.opcode)
+            elif length > 1:
+                operands = [memory[pc + offset] for offset in range(1, length)]
+                handler = cpu.compile_instruction(instruction, cycle(operands).__next__)
+            else:
+                handler = cpu.handler(cpu.dispatch, instruction.opcode)
+            decoded.append((instruction, operands, pc))
+            handlers.append(handler)
+            cycles.append(instruction.cycles)
+            pc += length
+            if instruction.asm.split(" ")[0] in TERMINATORS or self.writes_rom(instruction, memory, pc):
+                break
+        if not handlers:
+            return None
+
+        body = handlers[:-1]
+        last = handlers[-1]
+        body_cycles = sum(cycles[:-1])
+        end = pc
+
+        # only the last instruction may read PC : jumps, calls and returns
+        def run():
+            for handler in body:
+                handler()
+            registers.pc = end
+            return body_cycles + last()
+
+        idle = self.is_idle_loop(decoded, address)
+        if idle:
+            run = self.wait(address, run)
+        block = self.blocks[key] = Block(address, end, len(handlers), run, decoded, idle)
+        self.watch(address, end, key)
+        return block
+
+    def wait(self, address: int, run):
+        """
+        returns the run function of an idle loop : it adds WAITING to the
+        cycles of an iteration ending back at the start of the loop
+        """
+        registers = self.cpu.registers
+
+        def run_idle():
+            cycles = run()
+            if registers.pc == address:
+                return cycles + WAITING
+            return cycles
+        return run_idle
+
+    @staticmethod
+    def is_idle_loop(decoded: List[Tuple[Instruction, List[int], int]], address: int) -> bool:
+        """
+        returns whether a block is a loop waiting for an event : it loads A
+        from a register changed by the GPU, tests it, then jumps back to its
+        start on a condition. Until an event, every iteration is the same.
+        """
+        if len(decoded) < 2:
+            return False
+        (load, load_operands, _), (jump, jump_operands, jump_address) = decoded[0], decoded[-1]
+        if load.opcode == 0xF0:  # LDH A,(a8)
+            source = 0xFF00 | load_operands[0]
+        elif load.opcode == 0xFA:  # LD A,(a16)
+            source = load_operands[0] | load_operands[1] << 8
+        else:
+            return False
+        if source not in WAIT_REGISTERS:
+            return False
+        for instruction, _, _ in decoded[1:-1]:
+            if instruction.asm.split(" ")[0] not in IDLE_TESTS or any(
+                    argument.arg_type == ArgumentType.REGISTER and argument.register != "A"
+                    or argument.dereference for argument in instruction.args):
+                return False
+        if jump.asm == "JR" and jump.args[0].arg_type in (ArgumentType.FLAG_SET, ArgumentType.FLAG_NOT_SET):
+            offset = jump_operands[0]
+            target = jump_address + 2 + (offset - 0x100 if offset & 0x80 else offset)
+        elif jump.asm == "JP" and jump.args[0].arg_type in (ArgumentType.FLAG_SET, ArgumentType.FLAG_NOT_SET):
+            target = jump_operands[0] | jump_operands[1] << 8
+        else:
+            return False
+        return target == address
+
+    @staticmethod
+    def writes_rom(instruction, memory, end: int) -> bool:
+        """
+        returns whether the instruction writes to an immediate ROM address,
+        which may switch banks
+        """
+        if instruction.asm == "LD" and instruction.length == 3 and instruction.args[0].dereference:
+            return (memory[end - 2] | memory[end - 1] << 8) < 0x8000
+        return False
+
+    def watch(self, start: int, end: int, key: int) -> None:
+        """
+        maps the writable pages of a block to write hooks invalidating it, then
+        writing through the page they replaced (a view, or in a fork the hook
+        copying a shared page). ROM pages already go through the bank
+        controller and are left as is.
+        """
+        memory = self.memory
+        for page in range(start >> 8, ((end - 1) >> 8) + 1):
+            self.page_blocks.setdefault(page, set()).add(key)
+            if page < 0x80 or page in self.watched_pages:
+                continue
+            view = memory.write_pages[page]
+            # the page and its aliases (echo RAM)
+            for alias in range(0x100):
+                if memory.write_pages[alias] is view:
+                    self.watched_pages[alias] = view
+                    memory.write_pages[alias] = HookedPage(alias << 8, write=self.write_watched)
+
+    def write_watched(self, address: int, value: int) -> None:
+        page = address >> 8
+        view = self.watched_pages[page]
+        for alias, watched in list(self.watched_pages.items()):
+            if watched is view:
+                self.invalidate_page(alias)
+                self.memory.write_pages[alias] = watched
+                del self.watched_pages[alias]
+        view[address & 0xFF] = value
+
+    def invalidate_page(self, page: int) -> None:
+        for key in self.page_blocks.pop(page, ()):
+            if self.blocks.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def invalidate_ram(self) -> None:
+        """
+        drops the blocks in RAM, when it was changed behind the write hooks
+        (restoring a state). Blocks in ROM stay valid.
+        """
+        for page, view in self.watched_pages.items():
+            self.memory.write_pages[page] = view
+        self.watched_pages.clear()
+        for page in list(self.page_blocks):
+            if page >= 0x80:
+                self.invalidate_page(page)
+
+    def clear(self) -> None:
+        """
+        drops every cached block
+        """
+        for page, view in self.watched_pages.items():
+            self.memory.write_pages[page] = view
+        self.watched_pages.clear()
+        self.page_blocks.clear()
+        self.blocks.clear()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            'blocks': len(self.blocks),
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'instructions': self.instructions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'average_length': self.instructions / lookups if lookups else 0.0,
+            'compiled': self.compiled,
+            'not_compiled': self.not_compiled,
+        }
@@ -0,0 +1,81 @@
+import mmap
+from typing import List, Optional
+
+from pyboy.page import split_pages
+
+BANK_SIZE = 0x4000
+
+
+class Cartridge(object):
+    """
+    A cartridge ROM, memory-mapped from its file.
+
+    Banks are memoryviews over the mapping, created the first time they are
+    requested : nothing is read from the file until the emulator actually
+    accesses a bank, and processes mapping the same ROM share the page cache.
+    """
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as rom_file:
+            self.mmap = mmap.mmap(rom_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.mmap) == 0 or len(self.mmap) % BANK_SIZE:
+            size = len(self.mmap)
+            self.mmap.close()
+            raise ValueError("{}: ROM size ({} bytes) is not a multiple of 16 KiB".format(path, size))
+        self.path = path
+        self.view = memoryview(self.mmap)
+        self.bank_count = len(self.mmap) // BANK_SIZE
+        self._banks = [None] * self.bank_count  # type: List[Optional[memoryview]]
+        self._bank_pages = [None] * self.bank_count  # type: List[Optional[List[memoryview]]]
+
+    def bank(self, number: int) -> memoryview:
+        """
+        returns a read-only view over the given ROM bank
+        """
+        view = self._banks[number]
+        if view is None:
+            view = self._banks[number] = self.view[number * BANK_SIZE:(number + 1) * BANK_SIZE]
+        return view
+
+    def bank_pages(self, number: int) -> List[memoryview]:
+        """
+        returns the 64 page views of the given ROM bank, for the memory page table
+        """
+        pages = self._bank_pages[number]
+        if pages is None:
+            pages = self._bank_pages[number] = split_pages(self.bank(number))
+        return pages
+
+    @property
+    def title(self) -> str:
+        return bytes(self.view[0x134:0x144]).split(b'\x00')[0].decode('ascii', 'replace')
+
+    @property
+    def cartridge_type(self) -> int:
+        return self.view[0x147]
+
+    @property
+    def rom_size(self) -> int:
+        return self.view[0x148]
+
+    @property
+    def ram_size(self) -> int:
+        return self.view[0x149]
+
+    def close(self) -> None:
+        for pages in self._bank_pages:
+            for page in pages or ():
+                page.release()
+        for view in self._banks:
+            if view is not None:
+                view.release()
+        self._banks = [None] * self.bank_count
+        self._bank_pages = [None] * self.bank_count
+        self.view.release()
+        self.mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
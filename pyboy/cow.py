@@ -0,0 +1,42 @@
+"""
+Copy-on-write buffers, for forks.
+
+Buffers are anonymous memory maps : their pages are only allocated when
+first written. To fork a buffer, it is frozen into a Snapshot, an immutable
+copy split into read-only page views. A fork maps those views in its page
+table for reading, and write hooks for writing : the first write to a page
+copies it into the fork's own buffer, whose view is then mapped instead.
+Forks of the same state share the snapshot, and only hold the pages they
+wrote.
+
+A snapshot is reused by the next forks until the buffer it was taken from
+is written again : the owner of the cartridge RAM maps write hooks too while
+it is frozen, so its first write drops the snapshot, without comparing
+buffers. The video and work RAM, written all the time, are compared with the
+last snapshot instead (see Memory.freeze()).
+"""
+import mmap
+from typing import List, Union
+
+from pyboy.page import split_pages
+
+Buffer = Union[bytearray, mmap.mmap]
+
+
+def allocate(size: int) -> Buffer:
+    """returns a zero-filled buffer, whose pages are allocated when written"""
+    if size == 0:
+        return bytearray()
+    return mmap.mmap(-1, size)
+
+
+class Snapshot(object):
+    """A frozen copy of a buffer, and its read-only page views shared by the forks"""
+    __slots__ = ('data', 'pages')
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.pages = split_pages(memoryview(data))  # type: List[memoryview]
+
+    def __len__(self):
+        return len(self.data)
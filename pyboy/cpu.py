@@ -1,218 +1,716 @@
-from pyboy.instruction import ArgumentType as ArgType, Instruction
-from pyboy.instructiontable import InstructionTable
+from functools import partial
+from operator import attrgetter
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from pyboy.alu import ALU_OPERATIONS, SHIFT_OPERATIONS, daa
+from pyboy.blockcache import BlockCache
+from pyboy.instruction import WAITING, Argument, ArgumentType as ArgType, Instruction
+from pyboy.instructiontable import INSTRUCTION_TABLE
+from pyboy.registers import FLAG_C, FLAG_H, FLAG_MASKS, FLAG_N, FLAG_Z, Registers
+
+# a compiled instruction : executes it and returns the cycles it took
+Handler = Callable[[], int]
+
+IF = 0xFF0F
+IE = 0xFFFF
+# VBlank, STAT, timer, serial and joypad : the lowest bit has priority
+INTERRUPTS = 0x1F
+# an interrupt jumps to 0x40 + 8 * its bit
+INTERRUPT_VECTOR = 0x40
+INTERRUPT_CYCLES = 20
 
 
 class OpcodeException(BaseException):
     pass
 
 
+class LazyHandler(object):
+    """
+    The entry of a handler table before its instruction runs : the first
+    call compiles the instruction and replaces the entry with its handler
+    """
+    __slots__ = ('cpu', 'table', 'opcode', 'instruction')
+
+    def __init__(self, cpu: 'CPU', table: List[Handler], opcode: int, instruction: Instruction):
+        self.cpu = cpu
+        self.table = table
+        self.opcode = opcode
+        self.instruction = instruction
+
+    def __call__(self) -> int:
+        return self.compile()()
+
+    def compile(self) -> Handler:
+        handler = self.table[self.opcode] = self.cpu.compile_instruction(self.instruction)
+        return handler
+
+
 class CPU(object):
-    """The GameBoy CPU"""
+    """
+    The GameBoy CPU. It initializes the IO registers at power on, unless
+    given a memory already running (power_on False).
+    """
 
-    def __init__(self, memory):
+    def __init__(self, memory, power_on: bool = True):
         self.memory = memory
-        registers_names = [
-            'A', 'F', 'B', 'C', 'D', 'E', 'H', 'L',
-            'AF', 'BC', 'DE', 'HL', 'SP', 'PC'
-        ]
-        self.registers = dict.fromkeys(registers_names, 0)
-        self.registers['A'] = 0x01
-        self.registers['F'] = 0xb0
-        self.registers['BC'] = 0x0013
-        self.registers['DE'] = 0x00D8
-        self.registers['HL'] = 0x014D
-        self.registers['PC'] = 0x100
-        self.registers['SP'] = 0xFFFE
-        self.instructions = InstructionTable()
+        self.registers = Registers()
+        self.registers.a = 0x01
+        self.registers.f = 0xB0
+        self.registers.bc = 0x0013
+        self.registers.de = 0x00D8
+        self.registers.hl = 0x014D
+        self.registers.pc = 0x100
+        self.registers.sp = 0xFFFE
+        self.instructions = INSTRUCTION_TABLE
 
         self.stopped = False
         self.halted = False
+        # IME
         self.interrupts_enabled = True
-        self.prefixed = False
+        # interrupts requested and enabled while IME is set : the run loop
+        # services them when non zero. Updated by writes to IF and IE and
+        # changes of IME.
+        self.pending = 0
+        memory.add_io_hook(IF, write=self.write_if)
+        memory.add_io_hook(IE, write=self.write_ie)
+
+        self.compilers = {
+            "PUSH": self.compile_push,
+            "POP": self.compile_pop,
+            "ADD": self.compile_add,
+            "ADC": self.compile_alu,
+            "SUB": self.compile_alu,
+            "SBC": self.compile_alu,
+            "AND": self.compile_alu,
+            "OR": self.compile_alu,
+            "XOR": self.compile_alu,
+            "CP": self.compile_alu,
+            "INC": self.compile_inc,
+            "DEC": self.compile_dec,
+            "JP": self.compile_jp,
+            "JR": self.compile_jr,
+            "CALL": self.compile_call,
+            "RET": self.compile_ret,
+            "RETI": self.compile_ret,
+            "RST": self.compile_rst,
+            "RR": self.compile_shift,
+            "RRA": self.compile_shift,
+            "RRC": self.compile_shift,
+            "RRCA": self.compile_shift,
+            "SRA": self.compile_shift,
+            "SRL": self.compile_shift,
+            "RL": self.compile_shift,
+            "RLA": self.compile_shift,
+            "RLC": self.compile_shift,
+            "RLCA": self.compile_shift,
+            "SLA": self.compile_shift,
+            "SWAP": self.compile_shift,
+            "BIT": self.compile_bit,
+            "RES": self.compile_res,
+            "SET": self.compile_set,
+        }  # type: Dict[str, Callable[[Instruction, Callable[[], int]], Handler]]
+        self.dispatch = self.lazy_table(self.instructions.tables['default'])
+        self.dispatch_cb = self.lazy_table(self.instructions.tables['PREFIX CB'])
+        self.block_cache = BlockCache(self)
+
+        if power_on:
+            self.init_memory()
+
+    def exec_next(self) -> int:
+        """
+        executes the instruction at PC, returns the cycles it took, or
+        WAITING while halted
+        """
+        if self.halted:
+            return WAITING
+        registers = self.registers
+        pc = registers.pc
+        registers.pc = (pc + 1) & 0xFFFF
+        return self.dispatch[self.memory[pc]]()
+
+    def write_if(self, address: int, value: int) -> None:
+        self.memory.mem[IF] = 0xE0 | value
+        self.update_interrupts()
+
+    def write_ie(self, address: int, value: int) -> None:
+        self.memory.mem[IE] = value
+        self.update_interrupts()
+
+    def requested_interrupts(self) -> int:
+        """returns the interrupts both requested in IF and enabled in IE"""
+        mem = self.memory.mem
+        return mem[IF] & mem[IE] & INTERRUPTS
+
+    def update_interrupts(self) -> None:
+        """
+        recomputes the pending interrupts : a requested interrupt also wakes
+        the CPU from HALT, even with IME reset
+        """
+        requested = self.requested_interrupts()
+        if requested:
+            self.halted = False
+        self.pending = requested if self.interrupts_enabled else 0
 
-        self.init_memory()
+    def interrupt(self) -> int:
+        """
+        services the pending interrupt of highest priority : resets IME and
+        its IF bit, then calls its vector. Returns the cycles it took.
+        """
+        pending = self.pending
+        interrupt = pending & -pending
+        self.interrupts_enabled = False
+        self.memory[IF] = self.memory[IF] & ~interrupt
+        self.push(self.registers.pc)
+        self.registers.pc = INTERRUPT_VECTOR + 8 * (interrupt.bit_length() - 1)
+        return INTERRUPT_CYCLES
+
+    def exec(self, opcode: int) -> int:
+        return self.dispatch[opcode]()
+
+    def compile_table(self, table: Sequence[Instruction]) -> List[Handler]:
+        """
+        compiles an instruction table into a list of callables indexed by opcode
+        """
+        return [self.compile_instruction(instruction) for instruction in table]
 
-    def exec_next(self):
-        self.exec(self.get_next_byte())
+    def lazy_table(self, table: Sequence[Instruction]) -> List[Handler]:
+        """
+        returns a handler table compiling each instruction on its first run :
+        a CPU, such as a fork, only compiles the instructions it runs
+        """
+        handlers = []  # type: List[Handler]
+        handlers.extend(LazyHandler(self, handlers, opcode, instruction) for opcode, instruction in enumerate(table))
+        return handlers
 
-    def exec(self, opcode: int) -> None:
-        if self.prefixed:
-            instruction = self.instructions.tables['PREFIX CB'][opcode]
-            self.prefixed = False
-        else:
-            instruction = self.instructions.tables['default'][opcode]
+    @staticmethod
+    def handler(table: List[Handler], opcode: int) -> Handler:
+        """returns the handler of an opcode in a table, compiled"""
+        handler = table[opcode]
+        if isinstance(handler, LazyHandler):
+            handler = handler.compile()
+        return handler
+
+    def compile_instruction(self, instruction: Instruction,
+                            next_byte: Optional[Callable[[], int]] = None) -> Handler:
+        """
+        returns a callable executing the instruction, with its arguments already
+        decoded. It returns the cycles the instruction took.
+
+        Immediate operands are read with next_byte, which defaults to reading
+        them at PC.
+        """
+        if next_byte is None:
+            next_byte = self.get_next_byte
         asm = instruction.asm
+        if asm == "PREFIX CB":
+            return self.exec_prefix_cb
+        if asm.startswith("LD"):
+            return self.compile_load(instruction, next_byte)
+        compiler = self.compilers.get(asm.split(" ")[0], self.compile_misc)
+        return compiler(instruction, next_byte)
 
-        if asm == "CB":
-            self.prefixed = True
-            return
-        elif asm.startswith("LD"):
-            self.exec_load(instruction)
-        elif asm == "PUSH":
-            self.exec_push(instruction)
-        elif asm == "POP":
-            self.exec_pop(instruction)
-        elif asm in ("ADD", "ADC"):
-            self.exec_add(instruction)
-        elif asm in ("SUB", "SBC"):
-            self.exec_sub(instruction)
-        elif asm == "AND":
-            self.exec_and(instruction)
-        elif asm == "OR":
-            self.exec_or(instruction)
-        elif asm == "XOR":
-            self.exec_xor(instruction)
-        elif asm == "CP":
-            self.exec_cp(instruction)
-        elif asm == "INC":
-            self.exec_inc(instruction)
-        elif asm == "DEC":
-            self.exec_dec(instruction)
-        elif asm == "JP":
-            self.exec_jp(instruction)
-        elif asm == "CALL":
-            self.exec_call(instruction)
-        elif asm in ("RET", "RETI"):
-            self.exec_ret(instruction)
-        elif asm == "RST":
-            self.exec_rst(instruction)
-        elif asm in ("RR", "RRA", "RRC", "RRCA", "SRA", "SRL"):
-            self.exec_shiftr(instruction)
-        elif asm in ("RL", "RLA", "RLC", "RLCA", "SLA"):
-            self.exec_shiftl(instruction)
-        elif asm == "SWAP":
-            self.exec_swap(instruction)
-        elif asm == "BIT":
-            self.exec_bit(instruction)
-        elif asm == "RES":
-            self.exec_res(instruction)
-        elif asm == "SET":
-            self.exec_set(instruction)
-        else:
-            self.exec_misc(instruction)
-
-    def exec_load(self, instruction: Instruction) -> None:
-        store_to = instruction.args[0]
-        store_from = instruction.args[1]
-        value = 0
+    def exec_prefix_cb(self) -> int:
+        return self.dispatch_cb[self.get_next_byte()]()
+
+    def compile_load(self, instruction: Instruction, next_byte: Callable[[], int]) -> Handler:
         asm = instruction.asm
         opcode = instruction.opcode
+        cycles = instruction.cycles
+        registers = self.registers
+        memory = self.memory
+
         # differentiate between the different load instructions
-        if asm == "LD":
-            if store_to.arg_type == ArgType.REGISTER:
-                if store_from.arg_type == ArgType.REGISTER:
-                    if store_from.dereference:
-                        value = self.memory[self.registers[store_from.register]]
-                    else:
-                        value = self.registers[store_from.register]
-                elif store_from.arg_type == ArgType.UNSIGNED_8:
-                    value = self.get_next_byte()
-                elif store_from.arg_type == ArgType.UNSIGNED_16:
-                    value = self.get_next_byte()
-                    value += self.get_next_byte() << 8
-                elif store_from.arg_type == ArgType.ADDRESS_16 and store_from.dereference:
-                    address = self.get_next_byte()
-                    address += self.get_next_byte() << 8
-                    value = self.memory[address]
-
-                if store_to.dereference:
-                    if store_to.register == "C":
-                        self.memory[0xFF00 + self.registers["C"]] = value
-                    else:
-                        self.memory[self.registers[store_to.register]] = value
-                else:
-                    self.registers[store_to.register] = value
-            elif store_to.arg_type == ArgType.ADDRESS_16 and store_to.dereference:
-                address = self.get_next_byte() + (self.get_next_byte() << 8)
-                self.memory[address] = self.registers[store_from.register]
-            else:
-                raise OpcodeException("{} not implemented".format(repr(instruction)))
+        if opcode == 0x08:  # LD (a16),SP
+            def exec_load_sp():
+                address = next_byte() | next_byte() << 8
+                memory[address] = registers.sp & 0xFF
+                memory[(address + 1) & 0xFFFF] = registers.sp >> 8
+                return cycles
+            return exec_load_sp
+        elif asm == "LD":
+            store_to, store_from = instruction.args
+            if store_to.arg_type == ArgType.REGISTER and not store_to.dereference:
+                # most frequent loads get a single closure
+                to_register = store_to.register.lower()
+                if store_from.arg_type == ArgType.REGISTER and not store_from.dereference:
+                    from_register = attrgetter(store_from.register.lower())
+
+                    def load_register():
+                        setattr(registers, to_register, from_register(registers))
+                        return cycles
+                    return load_register
+                if store_from.arg_type == ArgType.UNSIGNED_8:
+                    def load_immediate():
+                        setattr(registers, to_register, next_byte())
+                        return cycles
+                    return load_immediate
+
+            load = self.compile_source(instruction, store_from, next_byte)
+            store = self.compile_destination(instruction, store_to, next_byte)
+
+            def exec_load():
+                store(load())
+                return cycles
+            return exec_load
         elif asm in ("LDD", "LDI"):
-            if store_to.register == "A":
-                self.registers["A"] = self.memory[self.registers["HL"]]
+            step = 1 if asm == "LDI" else -1
+            if instruction.args[0].register == "A":
+                def exec_load_hl():
+                    hl = registers.hl
+                    registers.a = memory[hl]
+                    registers.hl = hl + step
+                    return cycles
             else:
-                self.memory[self.registers["HL"]] = self.registers["A"]
-            self.registers["HL"] += 1 if asm == "LDI" else -1
+                def exec_load_hl():
+                    hl = registers.hl
+                    memory[hl] = registers.a
+                    registers.hl = hl + step
+                    return cycles
+            return exec_load_hl
         elif opcode == 0xE0:  # LDH (a8),A
-            self.memory[0xFF00 + self.get_next_byte()] = self.registers["A"]
+            def exec_ldh():
+                memory[0xFF00 + next_byte()] = registers.a
+                return cycles
+            return exec_ldh
         elif opcode == 0xF0:  # LDH A,(a8)
-            self.registers["A"] = self.memory[0xFF00 + self.get_next_byte()]
+            def exec_ldh():
+                registers.a = memory[0xFF00 + next_byte()]
+                return cycles
+            return exec_ldh
         elif asm == "LDHL":  # LD HL, SP+n
-            self.registers["HL"] = self.registers["SP"] + self.signed(self.get_next_byte())
-        else:
-            raise OpcodeException("{} not implemented".format(repr(instruction)))
-
-    def exec_push(self, instruction: Instruction) -> None:
-        pass
-
-    def exec_pop(self, instruction: Instruction) -> None:
-        pass
-
-    def exec_add(self, instruction: Instruction) -> None:
-        pass
-
-    def exec_sub(self, instruction: Instruction) -> None:
-        pass
-
-    def exec_and(self, instruction: Instruction) -> None:
-        pass
-
-    def exec_or(self, instruction: Instruction) -> None:
-        pass
-
-    def exec_xor(self, instruction: Instruction) -> None:
-        pass
-
-    def exec_cp(self, instruction: Instruction) -> None:
-        pass
-
-    def exec_inc(self, instruction: Instruction) -> None:
-        pass
-
-    def exec_dec(self, instruction: Instruction) -> None:
-        pass
-
-    def exec_jp(self, instruction: Instruction) -> None:
-        pass
-
-    def exec_call(self, instruction: Instruction) -> None:
-        pass
-
-    def exec_ret(self, instruction: Instruction) -> None:
-        pass
-
-    def exec_rst(self, instruction: Instruction) -> None:
-        pass
-
-    def exec_shiftr(self, instruction: Instruction) -> None:
-        pass
-
-    def exec_shiftl(self, instruction: Instruction) -> None:
-        pass
+            def exec_ldhl():
+                sp = registers.sp
+                value = next_byte()
+                registers.hl = sp + (value - 0x100 if value & 0x80 else value)
+                registers.f = (((sp & 0xF) + (value & 0xF) > 0xF) << 5 |
+                               ((sp & 0xFF) + value > 0xFF) << 4)
+                return cycles
+            return exec_ldhl
+        raise OpcodeException("{} not implemented".format(repr(instruction)))
+
+    def compile_source(self, instruction: Instruction, arg: Argument,
+                       next_byte: Callable[[], int]) -> Callable[[], int]:
+        """
+        returns a callable reading the value of an argument
+        """
+        registers = self.registers
+        memory = self.memory
+        if arg.arg_type == ArgType.REGISTER:
+            register = attrgetter(arg.register.lower())
+            if not arg.dereference:
+                return partial(register, registers)
+            if arg.register == "C":
+                return lambda: memory[0xFF00 + registers.c]
+            return lambda: memory[register(registers)]
+        elif arg.arg_type == ArgType.UNSIGNED_8:
+            return next_byte
+        elif arg.arg_type == ArgType.SIGNED_8:
+            signed = self.signed
+            return lambda: signed(next_byte())
+        elif arg.arg_type in (ArgType.UNSIGNED_16, ArgType.ADDRESS_16) and not arg.dereference:
+            return lambda: next_byte() | next_byte() << 8
+        elif arg.arg_type == ArgType.ADDRESS_16 and arg.dereference:
+            return lambda: memory[next_byte() | next_byte() << 8]
+        raise OpcodeException("{} not implemented".format(repr(instruction)))
+
+    def compile_destination(self, instruction: Instruction, arg: Argument,
+                            next_byte: Callable[[], int]) -> Callable[[int], None]:
+        """
+        returns a callable storing a value to an argument
+        """
+        registers = self.registers
+        memory = self.memory
+        if arg.arg_type == ArgType.REGISTER:
+            if not arg.dereference:
+                return partial(setattr, registers, arg.register.lower())
+            if arg.register == "C":
+                def store_c(value):
+                    memory[0xFF00 + registers.c] = value
+                return store_c
+
+            register = attrgetter(arg.register.lower())
+
+            def store_deref(value):
+                memory[register(registers)] = value
+            return store_deref
+        elif arg.arg_type == ArgType.ADDRESS_16 and arg.dereference:
+            def store_address(value):
+                memory[next_byte() | next_byte() << 8] = value
+            return store_address
+        raise OpcodeException("{} not implemented".format(repr(instruction)))
+
+    def compile_condition(self, arg: Argument) -> Tuple[int, int]:
+        """
+        returns the F register mask and expected value of a condition argument
+        """
+        mask = FLAG_MASKS[arg.flag]
+        return mask, mask if arg.arg_type == ArgType.FLAG_SET else 0
+
+    def push(self, value: int) -> None:
+        registers = self.registers
+        memory = self.memory
+        sp = registers.sp
+        memory[(sp - 1) & 0xFFFF] = value >> 8
+        memory[(sp - 2) & 0xFFFF] = value & 0xFF
+        registers.sp = (sp - 2) & 0xFFFF
+
+    def pop(self) -> int:
+        registers = self.registers
+        memory = self.memory
+        sp = registers.sp
+        registers.sp = (sp + 2) & 0xFFFF
+        return memory[sp] | memory[(sp + 1) & 0xFFFF] << 8
+
+    def compile_push(self, instruction: Instruction, next_byte: Callable[[], int]) -> Handler:
+        registers = self.registers
+        register = attrgetter(instruction.args[0].register.lower())
+        push = self.push
+        cycles = instruction.cycles
+
+        def exec_push():
+            push(register(registers))
+            return cycles
+        return exec_push
+
+    def compile_pop(self, instruction: Instruction, next_byte: Callable[[], int]) -> Handler:
+        store = partial(setattr, self.registers, instruction.args[0].register.lower())
+        pop = self.pop
+        cycles = instruction.cycles
+
+        def exec_pop():
+            store(pop())
+            return cycles
+        return exec_pop
+
+    def compile_add(self, instruction: Instruction, next_byte: Callable[[], int]) -> Handler:
+        registers = self.registers
+        cycles = instruction.cycles
+        store_to = instruction.args[0]
+        if store_to.register == "HL":  # ADD HL,rr
+            register = attrgetter(instruction.args[1].register.lower())
+
+            def exec_add_hl():
+                hl = registers.hl
+                value = register(registers)
+                registers.hl = hl + value
+                registers.f = ((registers.f & FLAG_Z) |
+                               ((hl & 0xFFF) + (value & 0xFFF) > 0xFFF) << 5 |
+                               (hl + value > 0xFFFF) << 4)
+                return cycles
+            return exec_add_hl
+        if store_to.register == "SP":  # ADD SP,r8
+
+            def exec_add_sp():
+                sp = registers.sp
+                value = next_byte()
+                registers.sp = (sp + (value - 0x100 if value & 0x80 else value)) & 0xFFFF
+                registers.f = (((sp & 0xF) + (value & 0xF) > 0xF) << 5 |
+                               ((sp & 0xFF) + value > 0xFF) << 4)
+                return cycles
+            return exec_add_sp
+        return self.compile_alu(instruction, next_byte)
+
+    def compile_alu(self, instruction: Instruction, next_byte: Callable[[], int]) -> Handler:
+        """
+        ADD, ADC, SUB, SBC, AND, OR, XOR and CP : A is the destination, the
+        last argument the operand
+        """
+        registers = self.registers
+        cycles = instruction.cycles
+        operation = ALU_OPERATIONS[instruction.asm]
+        operand = self.compile_source(instruction, instruction.args[-1], next_byte)
 
-    def exec_swap(self, instruction: Instruction) -> None:
-        pass
+        def exec_alu():
+            registers.a, registers.f = operation(registers.a, operand(), registers.f)
+            return cycles
+        return exec_alu
 
-    def exec_bit(self, instruction: Instruction) -> None:
-        pass
+    def compile_inc(self, instruction: Instruction, next_byte: Callable[[], int]) -> Handler:
+        return self.compile_step(instruction, next_byte, 1)
 
-    def exec_res(self, instruction: Instruction) -> None:
-        pass
+    def compile_dec(self, instruction: Instruction, next_byte: Callable[[], int]) -> Handler:
+        return self.compile_step(instruction, next_byte, -1)
 
-    def exec_set(self, instruction: Instruction) -> None:
-        pass
+    def compile_step(self, instruction: Instruction, next_byte: Callable[[], int], step: int) -> Handler:
+        """
+        INC and DEC
+        """
+        registers = self.registers
+        cycles = instruction.cycles
+        arg = instruction.args[0]
+        if not arg.dereference and len(arg.register) == 2:  # 16 bits registers, no flags affected
+            name = arg.register.lower()
+            register = attrgetter(name)
+
+            def exec_step_16():
+                setattr(registers, name, (register(registers) + step) & 0xFFFF)
+                return cycles
+            return exec_step_16
+
+        load = self.compile_source(instruction, arg, next_byte)
+        store = self.compile_destination(instruction, arg, next_byte)
+        if step == 1:
+            def exec_inc():
+                value = (load() + 1) & 0xFF
+                store(value)
+                registers.f = (registers.f & FLAG_C) | (0 if value else FLAG_Z) | ((value & 0xF) == 0) << 5
+                return cycles
+            return exec_inc
+
+        def exec_dec():
+            value = (load() - 1) & 0xFF
+            store(value)
+            registers.f = ((registers.f & FLAG_C) | (0 if value else FLAG_Z) | FLAG_N |
+                           ((value & 0xF) == 0xF) << 5)
+            return cycles
+        return exec_dec
+
+    def compile_jp(self, instruction: Instruction, next_byte: Callable[[], int]) -> Handler:
+        registers = self.registers
+        cycles = instruction.cycles
+        args = instruction.args
+        if args[0].arg_type == ArgType.REGISTER:  # JP HL
+            def exec_jp_hl():
+                registers.pc = registers.hl
+                return cycles
+            return exec_jp_hl
+        if len(args) == 1:
+            def exec_jp():
+                registers.pc = next_byte() | next_byte() << 8
+                return cycles
+            return exec_jp
+
+        mask, expected = self.compile_condition(args[0])
+        branch_cycles = instruction.branch_cycles
+
+        def exec_jp_conditional():
+            address = next_byte() | next_byte() << 8
+            if registers.f & mask == expected:
+                registers.pc = address
+                return branch_cycles
+            return cycles
+        return exec_jp_conditional
+
+    def compile_jr(self, instruction: Instruction, next_byte: Callable[[], int]) -> Handler:
+        registers = self.registers
+        cycles = instruction.cycles
+        args = instruction.args
+        if len(args) == 1:
+            def exec_jr():
+                offset = next_byte()
+                registers.pc = (registers.pc + (offset - 0x100 if offset & 0x80 else offset)) & 0xFFFF
+                return cycles
+            return exec_jr
+
+        mask, expected = self.compile_condition(args[0])
+        branch_cycles = instruction.branch_cycles
+
+        def exec_jr_conditional():
+            offset = next_byte()
+            if registers.f & mask == expected:
+                registers.pc = (registers.pc + (offset - 0x100 if offset & 0x80 else offset)) & 0xFFFF
+                return branch_cycles
+            return cycles
+        return exec_jr_conditional
+
+    def compile_call(self, instruction: Instruction, next_byte: Callable[[], int]) -> Handler:
+        registers = self.registers
+        push = self.push
+        cycles = instruction.cycles
+        args = instruction.args
+        if len(args) == 1:
+            def exec_call():
+                address = next_byte() | next_byte() << 8
+                push(registers.pc)
+                registers.pc = address
+                return cycles
+            return exec_call
+
+        mask, expected = self.compile_condition(args[0])
+        branch_cycles = instruction.branch_cycles
+
+        def exec_call_conditional():
+            address = next_byte() | next_byte() << 8
+            if registers.f & mask == expected:
+                push(registers.pc)
+                registers.pc = address
+                return branch_cycles
+            return cycles
+        return exec_call_conditional
+
+    def compile_ret(self, instruction: Instruction, next_byte: Callable[[], int]) -> Handler:
+        registers = self.registers
+        pop = self.pop
+        cycles = instruction.cycles
+        args = instruction.args
+        if instruction.asm == "RETI":
+            def exec_reti():
+                registers.pc = pop()
+                self.interrupts_enabled = True
+                self.update_interrupts()
+                return cycles
+            return exec_reti
+        if not args:
+            def exec_ret():
+                registers.pc = pop()
+                return cycles
+            return exec_ret
+
+        mask, expected = self.compile_condition(args[0])
+        branch_cycles = instruction.branch_cycles
+
+        def exec_ret_conditional():
+            if registers.f & mask == expected:
+                registers.pc = pop()
+                return branch_cycles
+            return cycles
+        return exec_ret_conditional
+
+    def compile_rst(self, instruction: Instruction, next_byte: Callable[[], int]) -> Handler:
+        registers = self.registers
+        push = self.push
+        cycles = instruction.cycles
+        address = int(instruction.asm[4:6], 16)  # "RST 18H"
+
+        def exec_rst():
+            push(registers.pc)
+            registers.pc = address
+            return cycles
+        return exec_rst
+
+    def compile_shift(self, instruction: Instruction, next_byte: Callable[[], int]) -> Handler:
+        """
+        rotates, shifts and SWAP. RLCA, RLA, RRCA and RRA work on A and
+        always reset the Z flag.
+        """
+        registers = self.registers
+        cycles = instruction.cycles
+        asm = instruction.asm
+        if not instruction.args:
+            operation = SHIFT_OPERATIONS[asm[:-1]]
+
+            def exec_shift_a():
+                registers.a, carry = operation(registers.a, registers.f)
+                registers.f = carry << 4
+                return cycles
+            return exec_shift_a
+
+        operation = SHIFT_OPERATIONS[asm]
+        load = self.compile_source(instruction, instruction.args[0], next_byte)
+        store = self.compile_destination(instruction, instruction.args[0], next_byte)
+
+        def exec_shift():
+            value, carry = operation(load(), registers.f)
+            store(value)
+            registers.f = (0 if value else FLAG_Z) | carry << 4
+            return cycles
+        return exec_shift
+
+    def compile_bit(self, instruction: Instruction, next_byte: Callable[[], int]) -> Handler:
+        registers = self.registers
+        cycles = instruction.cycles
+        mask = 1 << int(instruction.asm[4])  # "BIT 3"
+        load = self.compile_source(instruction, instruction.args[0], next_byte)
+
+        def exec_bit():
+            registers.f = (registers.f & FLAG_C) | FLAG_H | (0 if load() & mask else FLAG_Z)
+            return cycles
+        return exec_bit
+
+    def compile_res(self, instruction: Instruction, next_byte: Callable[[], int]) -> Handler:
+        cycles = instruction.cycles
+        mask = ~(1 << int(instruction.asm[4])) & 0xFF  # "RES 3"
+        load = self.compile_source(instruction, instruction.args[0], next_byte)
+        store = self.compile_destination(instruction, instruction.args[0], next_byte)
+
+        def exec_res():
+            store(load() & mask)
+            return cycles
+        return exec_res
+
+    def compile_set(self, instruction: Instruction, next_byte: Callable[[], int]) -> Handler:
+        cycles = instruction.cycles
+        mask = 1 << int(instruction.asm[4])  # "SET 3"
+        load = self.compile_source(instruction, instruction.args[0], next_byte)
+        store = self.compile_destination(instruction, instruction.args[0], next_byte)
+
+        def exec_set():
+            store(load() | mask)
+            return cycles
+        return exec_set
+
+    def compile_misc(self, instruction: Instruction, next_byte: Callable[[], int]) -> Handler:
+        registers = self.registers
+        cycles = instruction.cycles
+        asm = instruction.asm
 
-    def exec_misc(self, instruction: Instruction) -> None:
-        pass
+        if asm == "HALT":
+            requested_interrupts = self.requested_interrupts
+
+            def exec_halt():
+                # a requested interrupt ends HALT at once
+                self.halted = not requested_interrupts()
+                return cycles
+            return exec_halt
+        elif asm == "STOP":
+
+            def exec_stop():
+                next_byte()
+                self.stopped = True
+                return cycles
+            return exec_stop
+        elif asm == "DI":
+            def exec_di():
+                self.interrupts_enabled = False
+                self.pending = 0
+                return cycles
+            return exec_di
+        elif asm == "EI":
+            def exec_ei():
+                if self.interrupts_enabled:
+                    return cycles
+                # IME is set after the next instruction : execute it first
+                self.interrupts_enabled = True
+                spent = cycles + self.exec_next()
+                self.update_interrupts()
+                return spent
+            return exec_ei
+        elif asm == "DAA":
+            def exec_daa():
+                registers.a, registers.f = daa(registers.a, registers.f)
+                return cycles
+            return exec_daa
+        elif asm == "CPL":
+            def exec_cpl():
+                registers.a ^= 0xFF
+                registers.f |= FLAG_N | FLAG_H
+                return cycles
+            return exec_cpl
+        elif asm == "SCF":
+            def exec_scf():
+                registers.f = (registers.f & FLAG_Z) | FLAG_C
+                return cycles
+            return exec_scf
+        elif asm == "CCF":
+            def exec_ccf():
+                registers.f = (registers.f & (FLAG_Z | FLAG_C)) ^ FLAG_C
+                return cycles
+            return exec_ccf
+
+        # NOP, and the opcodes the CPU does not define
+        def exec_nop():
+            return cycles
+        return exec_nop
 
     def get_next_byte(self):
-        value = self.memory[self.registers['PC']]
-        self.registers['PC'] += 1
-        return value
+        registers = self.registers
+        pc = registers.pc
+        registers.pc = (pc + 1) & 0xFFFF
+        return self.memory[pc]
 
     @staticmethod
     def signed(byte):
-        if byte > 0x80:
+        if byte & 0x80:
             return (byte & 0x7F) - 128
         return byte
 
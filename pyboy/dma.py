@@ -0,0 +1,75 @@
+"""
+The OAM DMA : a write of a page number to the DMA register (0xFF46) copies
+the 160 bytes at page << 8 to the sprite attribute table (OAM).
+
+The bytes are copied at once, with a single slice copy when the source is
+a buffer region, but the transfer still lasts 160 machine cycles : until
+its end, an event, the CPU can only access the IO registers and the high
+RAM, where games wait for it. Other pages read 0xFF and ignore writes.
+"""
+from typing import Optional
+
+from pyboy.page import PAGE_SIZE, HookedPage
+from pyboy.scheduler import Event, Scheduler
+
+DMA_REGISTER = 0xFF46
+OAM_LENGTH = 0xA0
+# 160 machine cycles
+DMA_CYCLES = 640
+# pages the CPU cannot access during a transfer : all but the IO registers and the high RAM
+BUSY_PAGES = 0xFF
+
+# pages mapped during a transfer
+BUSY_READ_PAGE = memoryview(b'\xFF' * PAGE_SIZE)
+BUSY_WRITE_PAGE = HookedPage(0, write=lambda address, value: None)
+
+
+class DMA(object):
+    """
+    During a transfer, the page table entries the CPU cannot access are kept
+    in memory.saved_pages, to be mapped back at its end : pages mapped until
+    then (a fork freezing the cartridge RAM, a shared page copied) are mapped
+    to those, see Memory.tables(). Restoring a state ends the transfer first.
+    """
+
+    def __init__(self, memory, scheduler: Scheduler):
+        self.memory = memory
+        self.scheduler = scheduler
+        self.transfer = None  # type: Optional[Event]
+        memory.add_io_hook(DMA_REGISTER, write=self.write_dma)
+
+    @property
+    def active(self) -> bool:
+        return self.transfer is not None
+
+    def write_dma(self, address: int, value: int) -> None:
+        memory = self.memory
+        memory.mem[DMA_REGISTER] = value
+        source = value << 8
+        if source >= 0xE000:
+            # the echo of the work RAM
+            source -= 0x2000
+        if self.active:
+            # a new transfer restarts the current one
+            self.finish()
+        memory.oam[:] = memory.read_block(source, OAM_LENGTH)
+        memory.saved_pages = [memory.read_pages[:BUSY_PAGES], memory.write_pages[:BUSY_PAGES]]
+        memory.read_pages[:BUSY_PAGES] = [BUSY_READ_PAGE] * BUSY_PAGES
+        memory.write_pages[:BUSY_PAGES] = [BUSY_WRITE_PAGE] * BUSY_PAGES
+        self.transfer = self.scheduler.schedule(self.scheduler.cycles + DMA_CYCLES, self.end_event)
+
+    def end_event(self, cycle: int) -> None:
+        self.transfer = None
+        self.finish()
+
+    def finish(self) -> None:
+        """ends the current transfer : maps back the pages the CPU could not access"""
+        self.scheduler.cancel(self.transfer)
+        self.transfer = None
+        memory = self.memory
+        if memory.saved_pages is None:
+            return
+        read_pages, write_pages = memory.saved_pages
+        memory.saved_pages = None
+        memory.read_pages[:BUSY_PAGES] = read_pages
+        memory.write_pages[:BUSY_PAGES] = write_pages
@@ -1,21 +1,224 @@
+from typing import Optional
+
+import numpy as np
+
+from pyboy.apu import APU
+from pyboy.cartridge import Cartridge
 from pyboy.cpu import CPU
+from pyboy.dma import DMA
 from pyboy.gpu import GPU
+from pyboy.instruction import WAITING
+from pyboy.joypad import Joypad
 from pyboy.memory import Memory
+from pyboy.rewind import Rewind
+from pyboy.scheduler import Scheduler
+from pyboy.state import State, restore, snapshot
+from pyboy.timer import Timer
+
+# cycles of a frame : 154 lines of 456 cycles
+CYCLES_PER_FRAME = 70224
 
 
 class GameBoy(object):
-    """" GameBoy """
-    def __init__(self):
-        self.memory = Memory()
-        self.cpu = CPU(self.memory)
-        self.gpu = GPU()
+    """"
+    GameBoy
+
+    With use_block_cache, the run loop executes whole cached basic blocks
+    instead of single instructions : faster, but cycle budgets are then
+    respected to the block rather than to the instruction. A jit_threshold
+    enables the block cache and compiles blocks executed that many times.
+
+    Headless, the GPU keeps its timing and interrupts but does not render,
+    except the frames given by get_screen(). With frame_skip, it renders one
+    frame then skips the next frame_skip ones.
+
+    With audio, the APU synthesizes the sound of each frame, returned by
+    get_audio(). It defaults to on unless headless; without it, there is no
+    APU at all.
+
+    A memory can be given, such as a fork of another one : its IO registers
+    are kept as they are.
+    """
+    def __init__(self, use_block_cache=False, jit_threshold=None, headless=False, frame_skip=0,
+                 memory: Optional[Memory] = None, audio: Optional[bool] = None):
+        self.memory = Memory() if memory is None else memory
+        # the clock, and the events of the GPU and the timer
+        self.scheduler = Scheduler()
+        self.cpu = CPU(self.memory, power_on=memory is None)
+        self.gpu = GPU(self.memory, power_on=memory is None)
+        self.gpu.attach(self.scheduler)
+        self.timer = Timer(self.memory, self.scheduler)
+        self.dma = DMA(self.memory, self.scheduler)
+        if audio is None:
+            audio = not headless
+        self.apu = APU(self.memory, self.scheduler) if audio else None  # type: Optional[APU]
+        self.joypad = Joypad(self.memory)
+        self.cartridge = None  # type: Optional[Cartridge]
+        # cycles the run loop has been asked to reach
+        self.target_cycles = 0
+        self.use_block_cache = use_block_cache or jit_threshold is not None
+        self.cpu.block_cache.jit_threshold = jit_threshold
+        self.headless = headless
+        self.gpu.frame_interval = 0 if headless else frame_skip + 1
+        self.gpu.rendering = not headless
+        self.rewind = None  # type: Optional[Rewind]
+
+    @property
+    def cycles(self) -> int:
+        """cycles spent since power on"""
+        return self.scheduler.cycles
+
+    @cycles.setter
+    def cycles(self, value: int) -> None:
+        self.scheduler.cycles = value
+
+    def reschedule(self) -> None:
+        """
+        rebuilds the queue of events from the state of the GPU and the timer,
+        after it was restored
+        """
+        self.scheduler.clear()
+        self.gpu.attach(self.scheduler)
+        self.timer.reschedule()
+        if self.apu is not None:
+            self.apu.reschedule()
 
     def load_rom(self, rom):
-        pass
+        """
+        memory-maps the ROM file at the given path into the GameBoy memory
+        """
+        self.load_cartridge(Cartridge(rom))
+
+    def load_cartridge(self, cartridge: Cartridge) -> None:
+        """
+        maps an already opened cartridge : GameBoys running the same ROM can
+        share one
+        """
+        self.cartridge = cartridge
+        self.memory.load_rom(cartridge)
+
+    def get_screen(self):
+        """
+        returns the screen as a 144x160 NumPy array of grey levels, rendering
+        the last frame if it was skipped
+        """
+        return self.gpu.screen()
+
+    def get_audio(self) -> np.ndarray:
+        """
+        returns the sound of the frames run since the last call, as int16
+        (left, right) samples. Empty without audio.
+        """
+        if self.apu is None:
+            return np.empty((0, 2), dtype=np.int16)
+        return self.apu.read()
+
+    def save_state(self) -> bytes:
+        """
+        returns the state of the GameBoy as a binary blob, see pyboy.state
+        """
+        return snapshot(self).to_bytes()
+
+    def load_state(self, data: bytes) -> None:
+        """
+        restores a state returned by save_state(), on a GameBoy running the
+        same cartridge
+        """
+        restore(self, State.from_bytes(data))
+
+    def snapshot(self) -> State:
+        """
+        returns the state of the GameBoy, kept in memory : the fastest to
+        restore, again and again
+        """
+        return snapshot(self)
+
+    def restore(self, state: State) -> None:
+        restore(self, state)
+
+    def fork(self) -> 'GameBoy':
+        """
+        returns a GameBoy in the same state, running the same cartridge. Its
+        video, work and cartridge RAM share their pages with this GameBoy's as
+        they are now, a page being copied on its first write (see pyboy.cow),
+        and OAM, IO and high RAM are copied. Its CPU compiles the instructions
+        it runs on their first run : forking many times from the same state
+        costs the pages each fork writes, not copies of the whole GameBoy.
+        """
+        memory = self.memory.fork()
+        gameboy = GameBoy(jit_threshold=self.cpu.block_cache.jit_threshold, headless=self.headless,
+                          memory=memory, audio=self.apu is not None)
+        gameboy.use_block_cache = self.use_block_cache
+        gameboy.gpu.frame_interval = self.gpu.frame_interval
+        gameboy.cartridge = self.cartridge
+        # after the tile cache mapped its write hooks, which the shared pages wrap
+        memory.share(self.memory.freeze())
+        restore(gameboy, snapshot(self, buffers=False))
+        return gameboy
+
+    def enable_rewind(self, **options) -> Rewind:
+        """
+        records the states of the following frames, to go back with
+        rewind.rewind(frames). Options are those of pyboy.rewind.Rewind.
+        """
+        self.rewind = Rewind(self, **options)
+        return self.rewind
 
     def run(self, rom):
         self.load_rom(rom)
         self.main_loop()
 
     def main_loop(self):
-        pass
+        while not self.cpu.stopped:
+            self.run_frame()
+
+    def run_cycles(self, cycles: int) -> int:
+        """
+        executes instructions until the cycle budget is spent, returns the
+        cycles actually spent. An instruction overrunning the budget is
+        deducted from the next call's budget.
+
+        Pending interrupts are serviced between instructions, or between
+        blocks with the block cache.
+        """
+        scheduler = self.scheduler
+        cpu = self.cpu
+        start = scheduler.cycles
+        target = self.target_cycles = self.target_cycles + cycles
+        if self.use_block_cache:
+            exec_next = cpu.block_cache.exec_block
+        else:
+            exec_next = cpu.exec_next
+        spent = start
+        # registers only change on events : run the CPU until the next one.
+        # An instruction may schedule an earlier event (a write to the timer),
+        # so the next event is read again after each one.
+        while spent < target:
+            while spent < target and spent < scheduler.next_event:
+                if cpu.pending:
+                    spent += cpu.interrupt()
+                spent += exec_next()
+                scheduler.cycles = spent
+            limit = min(target, scheduler.next_event)
+            if spent >= WAITING:
+                # nothing changes until the next event : skip to it, in steps of 4 cycles
+                spent -= WAITING
+                if spent < limit:
+                    spent += (limit - spent + 3) & ~3
+                scheduler.cycles = spent
+            if spent >= scheduler.next_event:
+                scheduler.run(spent)
+        return spent - start
+
+    def run_frame(self) -> int:
+        """
+        executes a frame worth of cycles, returns the cycles actually spent.
+        Scripted input is pressed first.
+        """
+        joypad = self.joypad
+        if joypad.inputs is not None or joypad.log is not None:
+            joypad.frame()
+        cycles = self.run_cycles(CYCLES_PER_FRAME)
+        if self.rewind is not None:
+            self.rewind.frame()
+        return cycles
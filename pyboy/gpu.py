@@ -1,3 +1,325 @@
+"""
+The picture processing unit : LCD timing and a scanline renderer.
+
+Each line takes 456 cycles : OAM scan (mode 2, 80 cycles), pixel transfer
+(mode 3, 172 cycles) then horizontal blank (mode 0, 204 cycles). Lines 144
+to 153 are the vertical blank (mode 1). A line is rendered when its pixel
+transfer ends, with the registers as they are then.
+
+Rendering works on whole lines with NumPy : background and window lines are
+slices of the tile map images of the tile cache, and palettes are applied
+with one lookup from color numbers to shades.
+"""
+import numpy as np
+
+from pyboy.tilecache import TileCache
+
+SCREEN_WIDTH = 160
+SCREEN_HEIGHT = 144
+
+# cycles of each mode, and of a line
+OAM_SCAN_CYCLES = 80
+TRANSFER_CYCLES = 172
+HBLANK_CYCLES = 204
+LINE_CYCLES = 456
+LINES = 154
+
+MODE_HBLANK = 0
+MODE_VBLANK = 1
+MODE_OAM_SCAN = 2
+MODE_TRANSFER = 3
+
+# registers
+LCDC = 0xFF40
+STAT = 0xFF41
+SCY = 0xFF42
+SCX = 0xFF43
+LY = 0xFF44
+LYC = 0xFF45
+BGP = 0xFF47
+OBP0 = 0xFF48
+OBP1 = 0xFF49
+WY = 0xFF4A
+WX = 0xFF4B
+IF = 0xFF0F
+
+INTERRUPT_VBLANK = 0x01
+INTERRUPT_STAT = 0x02
+
+MAX_SPRITES_PER_LINE = 10
+
+# shade of each color of a palette, from white to black, as grey levels
+SHADES = np.array([0xFF, 0xAA, 0x55, 0x00], dtype=np.uint8)
+
+_X = np.arange(SCREEN_WIDTH)
+
+
+def palette(value: int) -> np.ndarray:
+    """returns the shades of the 4 colors of a palette register"""
+    return SHADES[[(value >> shift) & 0x03 for shift in (0, 2, 4, 6)]]
+
+
 class GPU(object):
-    """" GPU """
-    pass
+    """
+    GPU : the picture processing unit.
+
+    update() advances it to a cycle count of the CPU clock and returns the
+    cycle count of its next event : registers only change on events, so the
+    CPU can run until then without synchronizing. Attached to a scheduler,
+    its events are scheduler events instead.
+
+    Timing, registers and interrupts are always emulated, but lines are only
+    rendered on the frames selected by frame_interval (every frame by
+    default, every nth frame, or none with 0) or requested with
+    request_frame(). screen() renders an unrendered frame on demand.
+
+    STAT and LY are set at power on, unless given a memory already running
+    (power_on False).
+    """
+
+    def __init__(self, memory, power_on: bool = True):
+        self.memory = memory
+        self.mem = memory.mem
+        self.tile_cache = TileCache(memory)
+        self.framebuffer = np.full((SCREEN_HEIGHT, SCREEN_WIDTH), SHADES[0], dtype=np.uint8)
+        # color numbers of the background and window of the line being rendered
+        self.line = np.zeros(SCREEN_WIDTH, dtype=np.uint8)
+
+        self.mode = MODE_OAM_SCAN
+        self.ly = 0
+        self.window_line = 0
+        self.next_event = OAM_SCAN_CYCLES
+        # completed frames, and the one the framebuffer holds
+        self.frames = 0
+        self.screen_frame = 0
+        self.frame_interval = 1
+        self.frame_requested = False
+        # whether the lines of the current frame are rendered
+        self.rendering = True
+
+        self.bg_palette = palette(self.mem[BGP])
+        self.sprite_palettes = [palette(self.mem[OBP0]), palette(self.mem[OBP1])]
+        memory.add_io_hook(LCDC, write=self.write_lcdc)
+        memory.add_io_hook(STAT, write=self.write_stat)
+        memory.add_io_hook(LY, write=self.write_ly)
+        memory.add_io_hook(LYC, write=self.write_lyc)
+        memory.add_io_hook(BGP, write=self.write_palette)
+        memory.add_io_hook(OBP0, write=self.write_palette)
+        memory.add_io_hook(OBP1, write=self.write_palette)
+        if power_on:
+            self.set_mode(MODE_OAM_SCAN)
+            self.set_ly(0)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.mem[LCDC] & 0x80)
+
+    # registers
+
+    def write_lcdc(self, address: int, value: int) -> None:
+        if self.enabled and not value & 0x80:
+            # the LCD is turned off : it stays at the start of the frame
+            self.mode = MODE_HBLANK
+            self.mem[STAT] &= 0xFC
+            self.set_ly(0)
+        elif not self.enabled and value & 0x80:
+            # it restarts at line 0 on its next event
+            self.mode = MODE_VBLANK
+            self.ly = LINES - 1
+        self.mem[LCDC] = value
+
+    def write_stat(self, address: int, value: int) -> None:
+        # only the interrupt sources are writable
+        self.mem[STAT] = 0x80 | (value & 0x78) | (self.mem[STAT] & 0x07)
+
+    def write_ly(self, address: int, value: int) -> None:
+        pass
+
+    def write_lyc(self, address: int, value: int) -> None:
+        self.mem[LYC] = value
+        self.set_ly(self.ly)
+
+    def write_palette(self, address: int, value: int) -> None:
+        self.mem[address] = value
+        if address == BGP:
+            self.bg_palette = palette(value)
+        else:
+            self.sprite_palettes[address - OBP0] = palette(value)
+
+    def set_mode(self, mode: int) -> None:
+        self.mode = mode
+        self.mem[STAT] = (self.mem[STAT] & 0xFC) | mode
+        # mode 0, 1 and 2 interrupt sources are bits 3, 4 and 5
+        if mode != MODE_TRANSFER and self.mem[STAT] & (0x08 << mode):
+            self.request_interrupt(INTERRUPT_STAT)
+
+    def set_ly(self, ly: int) -> None:
+        self.ly = ly
+        self.mem[LY] = ly
+        if ly == self.mem[LYC]:
+            self.mem[STAT] |= 0x04
+            if self.mem[STAT] & 0x40 and self.enabled:
+                self.request_interrupt(INTERRUPT_STAT)
+        else:
+            self.mem[STAT] &= ~0x04 & 0xFF
+
+    def request_interrupt(self, interrupt: int) -> None:
+        self.memory[IF] = self.memory[IF] | interrupt
+
+    # timing
+
+    def attach(self, scheduler) -> None:
+        """
+        schedules the next event of the GPU on a scheduler : each event then
+        schedules the next one, instead of the GPU being updated
+        """
+        scheduler.schedule(self.next_event, self.event)
+
+    def event(self, cycle: int) -> int:
+        """moves to the next mode, returns the cycle count of the next event"""
+        self.next_event = cycle + self.advance()
+        return self.next_event
+
+    def update(self, cycles: int) -> int:
+        """
+        processes the events up to the given cycle count, returns the cycle
+        count of the next one
+        """
+        while self.next_event <= cycles:
+            self.next_event += self.advance()
+        return self.next_event
+
+    def advance(self) -> int:
+        """
+        moves to the next mode, returns the cycles it lasts
+        """
+        if not self.enabled:
+            return LINE_CYCLES
+        mode = self.mode
+        if mode == MODE_OAM_SCAN:
+            self.set_mode(MODE_TRANSFER)
+            return TRANSFER_CYCLES
+        if mode == MODE_TRANSFER:
+            if self.rendering:
+                self.render_line(self.ly)
+            self.set_mode(MODE_HBLANK)
+            return HBLANK_CYCLES
+        if mode == MODE_HBLANK:
+            self.set_ly(self.ly + 1)
+            if self.ly == SCREEN_HEIGHT:
+                self.end_frame()
+                self.set_mode(MODE_VBLANK)
+                self.request_interrupt(INTERRUPT_VBLANK)
+                return LINE_CYCLES
+            self.set_mode(MODE_OAM_SCAN)
+            return OAM_SCAN_CYCLES
+        # vertical blank
+        if self.ly == LINES - 1:
+            self.set_ly(0)
+            self.set_mode(MODE_OAM_SCAN)
+            return OAM_SCAN_CYCLES
+        self.set_ly(self.ly + 1)
+        return LINE_CYCLES
+
+    # rendering
+
+    def end_frame(self) -> None:
+        """
+        counts a completed frame, and selects whether the next one is rendered
+        """
+        self.frames += 1
+        if self.rendering:
+            self.screen_frame = self.frames
+        self.window_line = 0
+        self.select_rendering()
+        self.frame_requested = False
+
+    def select_rendering(self) -> None:
+        """selects whether the current frame is rendered, from the frame interval"""
+        interval = self.frame_interval
+        self.rendering = self.frame_requested or bool(interval and self.frames % interval == 0)
+
+    def request_frame(self) -> None:
+        """renders the next frame, whatever the frame interval"""
+        self.frame_requested = True
+        if self.ly == 0 and self.mode == MODE_OAM_SCAN:  # not started yet
+            self.rendering = True
+
+    def render_frame(self) -> None:
+        """
+        renders every line of the screen from the current state, as if it
+        did not change during the frame
+        """
+        window_line = self.window_line
+        self.window_line = 0
+        for ly in range(SCREEN_HEIGHT):
+            self.render_line(ly)
+        self.window_line = window_line
+
+    def render_line(self, ly: int) -> None:
+        """
+        renders the background, window and sprites of a line into the framebuffer
+        """
+        mem = self.mem
+        lcdc = mem[LCDC]
+        line = self.line
+        if lcdc & 0x01:
+            unsigned = bool(lcdc & 0x10)
+            pixels = self.tile_cache.tile_map(0x1C00 if lcdc & 0x08 else 0x1800, unsigned)[(ly + mem[SCY]) & 0xFF]
+            pixels.take((_X + mem[SCX]) & 0xFF, out=line)
+            wx = mem[WX] - 7
+            if lcdc & 0x20 and mem[WY] <= ly and wx < SCREEN_WIDTH:
+                pixels = self.tile_cache.tile_map(0x1C00 if lcdc & 0x40 else 0x1800, unsigned)[self.window_line]
+                start = max(wx, 0)
+                line[start:] = pixels[start - wx:SCREEN_WIDTH - wx]
+                self.window_line += 1
+        else:
+            line.fill(0)
+        row = self.framebuffer[ly]
+        self.bg_palette.take(line, out=row)
+        if lcdc & 0x02:
+            self.render_sprites(ly, lcdc, row)
+
+    def render_sprites(self, ly: int, lcdc: int, row: np.ndarray) -> None:
+        height = 16 if lcdc & 0x04 else 8
+        mem = self.mem
+        # OAM scan : the first 10 sprites on the line
+        visible = [
+            address for address in range(0xFE00, 0xFEA0, 4) if 0 <= ly + 16 - mem[address] < height
+        ][:MAX_SPRITES_PER_LINE]
+        if not visible:
+            return
+        # the sprite with the lowest x, then the first in OAM, is drawn last
+        visible.sort(key=lambda address: (mem[address + 1], address), reverse=True)
+        line = self.line
+        for address in visible:
+            y, x, tile, attributes = mem[address:address + 4]
+            sprite_row = ly + 16 - y
+            if attributes & 0x40:
+                sprite_row = height - 1 - sprite_row
+            if height == 16:
+                tile = (tile & 0xFE) + (sprite_row >> 3)
+            pixels = self.tile_cache.tile(tile)[sprite_row & 7]
+            if attributes & 0x20:
+                pixels = pixels[::-1]
+            left = x - 8
+            start = max(left, 0)
+            end = min(left + 8, SCREEN_WIDTH)
+            if start >= end:
+                continue
+            pixels = pixels[start - left:end - left]
+            drawn = pixels != 0
+            if attributes & 0x80:  # behind background colors 1-3
+                drawn &= line[start:end] == 0
+            shades = self.sprite_palettes[(attributes >> 4) & 1]
+            np.copyto(row[start:end], shades.take(pixels), where=drawn)
+
+    def screen(self) -> np.ndarray:
+        """
+        returns the framebuffer : shades of grey, 144 rows of 160 pixels. If
+        the last completed frame was not rendered, it is rendered now.
+        """
+        if self.screen_frame != self.frames:
+            self.render_frame()
+            self.screen_frame = self.frames
+        return self.framebuffer
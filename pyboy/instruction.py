@@ -1,6 +1,10 @@
 from enum import Enum
-from typing import Dict
-from typing import List
+from types import MappingProxyType
+from typing import Mapping, Optional, Sequence
+
+# added to the cycles returned by an executed instruction or block when the
+# CPU then waits for an event (HALT, idle loop) : the run loop skips to it
+WAITING = 1 << 62
 
 
 class FlagAction(Enum):
@@ -22,14 +26,27 @@ class ArgumentType(Enum):
     FLAG_NOT_SET = "condition : the flag is not set"
 
 
-class Argument(object):
+class Immutable(object):
+    """Base of the records of the instruction tables : their attributes are set once"""
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError("{} is immutable".format(type(self).__name__))
+
+    def __delattr__(self, name):
+        raise AttributeError("{} is immutable".format(type(self).__name__))
+
+
+class Argument(Immutable):
     """An argument : an argument type and a bool"""
+    __slots__ = ('flag', 'register', 'dereference', 'arg_type')
 
-    def __init__(self, arg_type, dereference=False, flag="", register=""):
-        self.flag = flag  # type: str
-        self.register = register  # type: str
-        self.dereference = dereference  # type: bool
-        self.arg_type = arg_type  # type: ArgumentType
+    def __init__(self, arg_type: ArgumentType, dereference: bool = False, flag: str = "", register: str = ""):
+        set_attribute = object.__setattr__
+        set_attribute(self, 'flag', flag)
+        set_attribute(self, 'register', register)
+        set_attribute(self, 'dereference', dereference)
+        set_attribute(self, 'arg_type', arg_type)
 
     def __repr__(self):
         string = ""
@@ -48,15 +65,37 @@ class Argument(object):
         return string
 
 
-class Instruction(object):
-    """An opcode"""
+# bytes taken by each immediate operand type
+OPERAND_LENGTHS = {
+    ArgumentType.SIGNED_8: 1,
+    ArgumentType.UNSIGNED_8: 1,
+    ArgumentType.ADDRESS_8: 1,
+    ArgumentType.UNSIGNED_16: 2,
+    ArgumentType.ADDRESS_16: 2,
+}
+
 
-    def __init__(self, opcode, asm, args, cycles, flags=None):
-        self.flags = flags  # type: Dict[str, FlagAction]
-        self.cycles = cycles  # type: int
-        self.asm = asm  # type: str
-        self.opcode = opcode  # type: int
-        self.args = args  # type: List[Argument]
+class Instruction(Immutable):
+    """An opcode : cycles are the cycles it takes, or when it has a condition,
+    the cycles it takes when the condition is not met (branch_cycles otherwise).
+    length is the bytes it takes : the opcode and its immediate operands."""
+    __slots__ = ('opcode', 'asm', 'args', 'cycles', 'flags', 'branch_cycles', 'length')
+
+    def __init__(self, opcode: int, asm: str, args: Sequence[Argument], cycles: int,
+                 flags: Optional[Mapping[str, FlagAction]] = None, branch_cycles: Optional[int] = None):
+        set_attribute = object.__setattr__
+        # the table reuses one dict across groups : freeze a copy of this instruction's actions
+        set_attribute(self, 'flags', MappingProxyType(dict(flags)) if flags is not None else None)
+        set_attribute(self, 'cycles', cycles)
+        set_attribute(self, 'branch_cycles', branch_cycles if branch_cycles is not None else cycles)
+        set_attribute(self, 'asm', asm)
+        set_attribute(self, 'opcode', opcode)
+        set_attribute(self, 'args', tuple(args))
+        if asm in ("STOP", "PREFIX CB"):
+            length = 2
+        else:
+            length = 1 + sum(OPERAND_LENGTHS.get(arg.arg_type, 0) for arg in args)
+        set_attribute(self, 'length', length)
 
     def __index__(self):
         return self.opcode
@@ -1,5 +1,5 @@
 from typing import Dict
-from typing import List
+from typing import Tuple
 
 from pyboy.instruction import Argument as Arg
 from pyboy.instruction import ArgumentType as ArgType
@@ -7,6 +7,11 @@ from pyboy.instruction import Instruction, FlagAction
 
 
 class InstructionTable(object):
+    """
+    The instruction tables, indexed by opcode. Tables and instructions are
+    immutable : CPUs share INSTRUCTION_TABLE rather than building their own.
+    """
+
     def __init__(self):
         self._a8_deref = Arg(ArgType.ADDRESS_8, dereference=True)
         self._a16 = Arg(ArgType.ADDRESS_16)
@@ -39,7 +44,7 @@ class InstructionTable(object):
         self._flag_c = Arg(ArgType.FLAG_SET, flag="c")
         self._flag_nc = Arg(ArgType.FLAG_NOT_SET, flag="c")
 
-        self.tables = {}  # type: Dict[str, List[Instruction]]
+        self.tables = {}  # type: Dict[str, Tuple[Instruction, ...]]
         self.create_tables()
 
     def create_tables(self) -> None:
@@ -57,7 +62,7 @@ class InstructionTable(object):
         # LD REG, self.d8
         table[0x06] = Instruction(0x06, "LD", [self._b, self._d8], 8)
         table[0x0E] = Instruction(0x0E, "LD", [self._c, self._d8], 8)
-        table[0x12] = Instruction(0x12, "LD", [self._d, self._d8], 8)
+        table[0x16] = Instruction(0x16, "LD", [self._d, self._d8], 8)
         table[0x1E] = Instruction(0x1E, "LD", [self._e, self._d8], 8)
         table[0x26] = Instruction(0x26, "LD", [self._h, self._d8], 8)
         table[0x2E] = Instruction(0x2E, "LD", [self._l, self._d8], 8)
@@ -68,7 +73,7 @@ class InstructionTable(object):
         table[0x42] = Instruction(0x42, "LD", [self._b, self._d], 4)
         table[0x43] = Instruction(0x43, "LD", [self._b, self._e], 4)
         table[0x44] = Instruction(0x44, "LD", [self._b, self._h], 4)
-        table[0x41] = Instruction(0x41, "LD", [self._b, self._l], 4)
+        table[0x45] = Instruction(0x45, "LD", [self._b, self._l], 4)
         table[0x46] = Instruction(0x46, "LD", [self._b, self._hl_deref], 8)
         table[0x48] = Instruction(0x48, "LD", [self._c, self._b], 4)
         table[0x49] = Instruction(0x49, "LD", [self._c, self._c], 4)
@@ -77,26 +82,26 @@ class InstructionTable(object):
         table[0x4C] = Instruction(0x4C, "LD", [self._c, self._h], 4)
         table[0x4D] = Instruction(0x4D, "LD", [self._c, self._l], 4)
         table[0x4E] = Instruction(0x4E, "LD", [self._c, self._hl_deref], 8)
-        table[0x10] = Instruction(0x10, "LD", [self._d, self._b], 4)
-        table[0x11] = Instruction(0x11, "LD", [self._d, self._c], 4)
-        table[0x12] = Instruction(0x12, "LD", [self._d, self._d], 4)
-        table[0x13] = Instruction(0x13, "LD", [self._d, self._e], 4)
-        table[0x14] = Instruction(0x14, "LD", [self._d, self._h], 4)
-        table[0x15] = Instruction(0x15, "LD", [self._d, self._l], 4)
-        table[0x16] = Instruction(0x16, "LD", [self._d, self._hl_deref], 8)
-        table[0x18] = Instruction(0x18, "LD", [self._e, self._b], 4)
-        table[0x19] = Instruction(0x19, "LD", [self._e, self._c], 4)
-        table[0x1A] = Instruction(0x1A, "LD", [self._e, self._d], 4)
-        table[0x1B] = Instruction(0x1B, "LD", [self._e, self._e], 4)
-        table[0x1C] = Instruction(0x1C, "LD", [self._e, self._h], 4)
-        table[0x1D] = Instruction(0x1D, "LD", [self._e, self._l], 4)
-        table[0x1E] = Instruction(0x1E, "LD", [self._e, self._hl_deref], 8)
+        table[0x50] = Instruction(0x50, "LD", [self._d, self._b], 4)
+        table[0x51] = Instruction(0x51, "LD", [self._d, self._c], 4)
+        table[0x52] = Instruction(0x52, "LD", [self._d, self._d], 4)
+        table[0x53] = Instruction(0x53, "LD", [self._d, self._e], 4)
+        table[0x54] = Instruction(0x54, "LD", [self._d, self._h], 4)
+        table[0x55] = Instruction(0x55, "LD", [self._d, self._l], 4)
+        table[0x56] = Instruction(0x56, "LD", [self._d, self._hl_deref], 8)
+        table[0x58] = Instruction(0x58, "LD", [self._e, self._b], 4)
+        table[0x59] = Instruction(0x59, "LD", [self._e, self._c], 4)
+        table[0x5A] = Instruction(0x5A, "LD", [self._e, self._d], 4)
+        table[0x5B] = Instruction(0x5B, "LD", [self._e, self._e], 4)
+        table[0x5C] = Instruction(0x5C, "LD", [self._e, self._h], 4)
+        table[0x5D] = Instruction(0x5D, "LD", [self._e, self._l], 4)
+        table[0x5E] = Instruction(0x5E, "LD", [self._e, self._hl_deref], 8)
         table[0x60] = Instruction(0x60, "LD", [self._h, self._b], 4)
         table[0x61] = Instruction(0x61, "LD", [self._h, self._c], 4)
         table[0x62] = Instruction(0x62, "LD", [self._h, self._d], 4)
         table[0x63] = Instruction(0x63, "LD", [self._h, self._e], 4)
         table[0x64] = Instruction(0x64, "LD", [self._h, self._h], 4)
-        table[0x61] = Instruction(0x61, "LD", [self._h, self._l], 4)
+        table[0x65] = Instruction(0x65, "LD", [self._h, self._l], 4)
         table[0x66] = Instruction(0x66, "LD", [self._h, self._hl_deref], 8)
         table[0x68] = Instruction(0x68, "LD", [self._l, self._b], 4)
         table[0x69] = Instruction(0x69, "LD", [self._l, self._c], 4)
@@ -105,13 +110,13 @@ class InstructionTable(object):
         table[0x6C] = Instruction(0x6C, "LD", [self._l, self._h], 4)
         table[0x6D] = Instruction(0x6D, "LD", [self._l, self._l], 4)
         table[0x6E] = Instruction(0x6E, "LD", [self._l, self._hl_deref], 8)
-        table[0x70] = Instruction(0x70, "LD", [self._hl, self._b], 8)
-        table[0x71] = Instruction(0x71, "LD", [self._hl, self._c], 8)
-        table[0x72] = Instruction(0x72, "LD", [self._hl, self._d], 8)
-        table[0x73] = Instruction(0x73, "LD", [self._hl, self._e], 8)
-        table[0x74] = Instruction(0x74, "LD", [self._hl, self._h], 8)
-        table[0x71] = Instruction(0x71, "LD", [self._hl, self._l], 8)
-        table[0x36] = Instruction(0x36, "LD", [self._hl, self._d8], 12)
+        table[0x70] = Instruction(0x70, "LD", [self._hl_deref, self._b], 8)
+        table[0x71] = Instruction(0x71, "LD", [self._hl_deref, self._c], 8)
+        table[0x72] = Instruction(0x72, "LD", [self._hl_deref, self._d], 8)
+        table[0x73] = Instruction(0x73, "LD", [self._hl_deref, self._e], 8)
+        table[0x74] = Instruction(0x74, "LD", [self._hl_deref, self._h], 8)
+        table[0x75] = Instruction(0x75, "LD", [self._hl_deref, self._l], 8)
+        table[0x36] = Instruction(0x36, "LD", [self._hl_deref, self._d8], 12)
 
         # Loads to register A
         table[0x78] = Instruction(0x78, "LD", [self._a, self._b], 4)
@@ -129,8 +134,8 @@ class InstructionTable(object):
         # Loads from register A
         table[0x47] = Instruction(0x47, "LD", [self._b, self._a], 4)
         table[0x4F] = Instruction(0x4F, "LD", [self._c, self._a], 4)
-        table[0x17] = Instruction(0x17, "LD", [self._d, self._a], 4)
-        table[0x1F] = Instruction(0x1F, "LD", [self._e, self._a], 4)
+        table[0x57] = Instruction(0x57, "LD", [self._d, self._a], 4)
+        table[0x5F] = Instruction(0x5F, "LD", [self._e, self._a], 4)
         table[0x67] = Instruction(0x67, "LD", [self._h, self._a], 4)
         table[0x6F] = Instruction(0x6F, "LD", [self._l, self._a], 4)
         table[0x02] = Instruction(0x02, "LD", [self._bc_deref, self._a], 8)
@@ -159,17 +164,17 @@ class InstructionTable(object):
 
         # Misc 16 bits loads
         table[0xF9] = Instruction(0xF9, "LD", [self._sp, self._hl], 8)
-        table[0xF8] = Instruction(0xF8, "LDHL", [self._sp, self._d8], 12, {
+        table[0xF8] = Instruction(0xF8, "LDHL", [self._sp, self._r8], 12, {
             'z': FlagAction.RESET, 'n': FlagAction.RESET,
             'h': FlagAction.AFFECTED, 'c': FlagAction.AFFECTED
         })
         table[0x08] = Instruction(0x08, "LD", [self._a16_deref, self._sp], 20)
 
         # Push
-        table[0xC1] = Instruction(0xC1, "PUSH", [self._bc], 12)
-        table[0xD1] = Instruction(0xD1, "PUSH", [self._de], 12)
-        table[0xE1] = Instruction(0xE1, "PUSH", [self._hl], 12)
-        table[0xF1] = Instruction(0xF1, "PUSH", [self._af], 12)
+        table[0xC5] = Instruction(0xC5, "PUSH", [self._bc], 16)
+        table[0xD5] = Instruction(0xD5, "PUSH", [self._de], 16)
+        table[0xE5] = Instruction(0xE5, "PUSH", [self._hl], 16)
+        table[0xF5] = Instruction(0xF5, "PUSH", [self._af], 16)
 
         # Pop
         table[0xC1] = Instruction(0xC1, "POP", [self._bc], 12)
@@ -305,15 +310,15 @@ class InstructionTable(object):
         flags['z'] = FlagAction.AFFECTED
         flags['n'] = FlagAction.SET
         flags['h'] = FlagAction.AFFECTED
-        flags['c'] = FlagAction.AFFECTED
-        table[0x05] = Instruction(0x05, "INC", [self._b], 4, flags)
-        table[0x0D] = Instruction(0x0D, "INC", [self._c], 4, flags)
-        table[0x15] = Instruction(0x15, "INC", [self._d], 4, flags)
-        table[0x1D] = Instruction(0x1D, "INC", [self._e], 4, flags)
-        table[0x25] = Instruction(0x25, "INC", [self._h], 4, flags)
-        table[0x2D] = Instruction(0x2D, "INC", [self._l], 4, flags)
-        table[0x35] = Instruction(0x35, "INC", [self._hl_deref], 12, flags)
-        table[0x3D] = Instruction(0x3D, "INC", [self._a], 4, flags)
+        flags['c'] = FlagAction.NOT_AFFECTED
+        table[0x05] = Instruction(0x05, "DEC", [self._b], 4, flags)
+        table[0x0D] = Instruction(0x0D, "DEC", [self._c], 4, flags)
+        table[0x15] = Instruction(0x15, "DEC", [self._d], 4, flags)
+        table[0x1D] = Instruction(0x1D, "DEC", [self._e], 4, flags)
+        table[0x25] = Instruction(0x25, "DEC", [self._h], 4, flags)
+        table[0x2D] = Instruction(0x2D, "DEC", [self._l], 4, flags)
+        table[0x35] = Instruction(0x35, "DEC", [self._hl_deref], 12, flags)
+        table[0x3D] = Instruction(0x3D, "DEC", [self._a], 4, flags)
 
         # 16 bits arithmetic
 
@@ -342,24 +347,24 @@ class InstructionTable(object):
         table[0x3B] = Instruction(0x3B, "DEC", [self._sp], 8)
 
         # Jumps
-        table[0xC3] = Instruction(0xC3, "JP", [self._a16], 12)
-        table[0xC2] = Instruction(0xC2, "JP", [self._flag_nz, self._a16], 12)
-        table[0xCA] = Instruction(0xCA, "JP", [self._flag_z, self._a16], 12)
-        table[0xD2] = Instruction(0xD2, "JP", [self._flag_nc, self._a16], 12)
-        table[0xDA] = Instruction(0xDA, "JP", [self._flag_c, self._a16], 12)
-        table[0xE9] = Instruction(0xE9, "JP", [self._hl_deref], 4)
-        table[0x18] = Instruction(0x18, "JR", [self._r8], 8)
-        table[0x20] = Instruction(0x20, "JR", [self._flag_nz, self._r8], 8)
-        table[0x28] = Instruction(0x28, "JR", [self._flag_z, self._r8], 8)
-        table[0x30] = Instruction(0x30, "JR", [self._flag_nc, self._r8], 8)
-        table[0x38] = Instruction(0x38, "JR", [self._flag_c, self._r8], 8)
+        table[0xC3] = Instruction(0xC3, "JP", [self._a16], 16)
+        table[0xC2] = Instruction(0xC2, "JP", [self._flag_nz, self._a16], 12, branch_cycles=16)
+        table[0xCA] = Instruction(0xCA, "JP", [self._flag_z, self._a16], 12, branch_cycles=16)
+        table[0xD2] = Instruction(0xD2, "JP", [self._flag_nc, self._a16], 12, branch_cycles=16)
+        table[0xDA] = Instruction(0xDA, "JP", [self._flag_c, self._a16], 12, branch_cycles=16)
+        table[0xE9] = Instruction(0xE9, "JP", [self._hl], 4)
+        table[0x18] = Instruction(0x18, "JR", [self._r8], 12)
+        table[0x20] = Instruction(0x20, "JR", [self._flag_nz, self._r8], 8, branch_cycles=12)
+        table[0x28] = Instruction(0x28, "JR", [self._flag_z, self._r8], 8, branch_cycles=12)
+        table[0x30] = Instruction(0x30, "JR", [self._flag_nc, self._r8], 8, branch_cycles=12)
+        table[0x38] = Instruction(0x38, "JR", [self._flag_c, self._r8], 8, branch_cycles=12)
 
         # Calls
-        table[0xCD] = Instruction(0xCD, "CALL", [self._a16], 12)
-        table[0xC4] = Instruction(0xC4, "CALL", [self._flag_nz, self._a16], 12)
-        table[0xCC] = Instruction(0xCC, "CALL", [self._flag_z, self._a16], 12)
-        table[0xD4] = Instruction(0xD4, "CALL", [self._flag_nc, self._a16], 12)
-        table[0xDC] = Instruction(0xDC, "CALL", [self._flag_c, self._a16], 12)
+        table[0xCD] = Instruction(0xCD, "CALL", [self._a16], 24)
+        table[0xC4] = Instruction(0xC4, "CALL", [self._flag_nz, self._a16], 12, branch_cycles=24)
+        table[0xCC] = Instruction(0xCC, "CALL", [self._flag_z, self._a16], 12, branch_cycles=24)
+        table[0xD4] = Instruction(0xD4, "CALL", [self._flag_nc, self._a16], 12, branch_cycles=24)
+        table[0xDC] = Instruction(0xDC, "CALL", [self._flag_c, self._a16], 12, branch_cycles=24)
 
         # Restarts
         table[0xC7] = Instruction(0xC7, "RST 00H", [], 16)
@@ -372,12 +377,12 @@ class InstructionTable(object):
         table[0xFF] = Instruction(0xFF, "RST 38H", [], 16)
 
         # Returns
-        table[0xC9] = Instruction(0xC9, "RET", [], 8)
-        table[0xC0] = Instruction(0xC0, "RET", [self._flag_nz], 8)
-        table[0xC8] = Instruction(0xC8, "RET", [self._flag_z], 8)
-        table[0xD0] = Instruction(0xD0, "RET", [self._flag_nc], 8)
-        table[0xD8] = Instruction(0xD8, "RET", [self._flag_c], 8)
-        table[0xD9] = Instruction(0xD9, "RETI", [], 8)
+        table[0xC9] = Instruction(0xC9, "RET", [], 16)
+        table[0xC0] = Instruction(0xC0, "RET", [self._flag_nz], 8, branch_cycles=20)
+        table[0xC8] = Instruction(0xC8, "RET", [self._flag_z], 8, branch_cycles=20)
+        table[0xD0] = Instruction(0xD0, "RET", [self._flag_nc], 8, branch_cycles=20)
+        table[0xD8] = Instruction(0xD8, "RET", [self._flag_c], 8, branch_cycles=20)
+        table[0xD9] = Instruction(0xD9, "RETI", [], 16)
 
         # Miscellaneous
         table[0x27] = Instruction(0x27, "DAA", [], 4, {
@@ -409,7 +414,7 @@ class InstructionTable(object):
         table[0x0F] = Instruction(0x0F, "RRCA", [], 4, flags)
         table[0x1F] = Instruction(0x1F, "RRA", [], 4, flags)
 
-        self.tables['default'] = table
+        self.tables['default'] = tuple(table)
 
     def create_prefix_cb_instruction_table(self) -> None:
         """Initialize "PREFIX CB" instruction table"""
@@ -496,7 +501,7 @@ class InstructionTable(object):
         table[0x43] = Instruction(0x43, "BIT 0", [self._e], 8)
         table[0x44] = Instruction(0x44, "BIT 0", [self._h], 8)
         table[0x45] = Instruction(0x45, "BIT 0", [self._l], 8)
-        table[0x46] = Instruction(0x46, "BIT 0", [self._hl_deref], 16)
+        table[0x46] = Instruction(0x46, "BIT 0", [self._hl_deref], 12)
         table[0x47] = Instruction(0x47, "BIT 0", [self._a], 8)
         table[0x48] = Instruction(0x48, "BIT 1", [self._b], 8)
         table[0x49] = Instruction(0x49, "BIT 1", [self._c], 8)
@@ -504,7 +509,7 @@ class InstructionTable(object):
         table[0x4B] = Instruction(0x4B, "BIT 1", [self._e], 8)
         table[0x4C] = Instruction(0x4C, "BIT 1", [self._h], 8)
         table[0x4D] = Instruction(0x4D, "BIT 1", [self._l], 8)
-        table[0x4E] = Instruction(0x4E, "BIT 1", [self._hl_deref], 16)
+        table[0x4E] = Instruction(0x4E, "BIT 1", [self._hl_deref], 12)
         table[0x4F] = Instruction(0x4F, "BIT 1", [self._a], 8)
         table[0x50] = Instruction(0x50, "BIT 2", [self._b], 8)
         table[0x51] = Instruction(0x51, "BIT 2", [self._c], 8)
@@ -512,7 +517,7 @@ class InstructionTable(object):
         table[0x53] = Instruction(0x53, "BIT 2", [self._e], 8)
         table[0x54] = Instruction(0x54, "BIT 2", [self._h], 8)
         table[0x55] = Instruction(0x55, "BIT 2", [self._l], 8)
-        table[0x56] = Instruction(0x56, "BIT 2", [self._hl_deref], 16)
+        table[0x56] = Instruction(0x56, "BIT 2", [self._hl_deref], 12)
         table[0x57] = Instruction(0x57, "BIT 2", [self._a], 8)
         table[0x58] = Instruction(0x58, "BIT 3", [self._b], 8)
         table[0x59] = Instruction(0x59, "BIT 3", [self._c], 8)
@@ -520,7 +525,7 @@ class InstructionTable(object):
         table[0x5B] = Instruction(0x5B, "BIT 3", [self._e], 8)
         table[0x5C] = Instruction(0x5C, "BIT 3", [self._h], 8)
         table[0x5D] = Instruction(0x5D, "BIT 3", [self._l], 8)
-        table[0x5E] = Instruction(0x5E, "BIT 3", [self._hl_deref], 16)
+        table[0x5E] = Instruction(0x5E, "BIT 3", [self._hl_deref], 12)
         table[0x5F] = Instruction(0x5F, "BIT 3", [self._a], 8)
         table[0x60] = Instruction(0x60, "BIT 4", [self._b], 8)
         table[0x61] = Instruction(0x61, "BIT 4", [self._c], 8)
@@ -528,7 +533,7 @@ class InstructionTable(object):
         table[0x63] = Instruction(0x63, "BIT 4", [self._e], 8)
         table[0x64] = Instruction(0x64, "BIT 4", [self._h], 8)
         table[0x65] = Instruction(0x65, "BIT 4", [self._l], 8)
-        table[0x66] = Instruction(0x66, "BIT 4", [self._hl_deref], 16)
+        table[0x66] = Instruction(0x66, "BIT 4", [self._hl_deref], 12)
         table[0x67] = Instruction(0x67, "BIT 4", [self._a], 8)
         table[0x68] = Instruction(0x68, "BIT 5", [self._b], 8)
         table[0x69] = Instruction(0x69, "BIT 5", [self._c], 8)
@@ -536,7 +541,7 @@ class InstructionTable(object):
         table[0x6B] = Instruction(0x6B, "BIT 5", [self._e], 8)
         table[0x6C] = Instruction(0x6C, "BIT 5", [self._h], 8)
         table[0x6D] = Instruction(0x6D, "BIT 5", [self._l], 8)
-        table[0x6E] = Instruction(0x6E, "BIT 5", [self._hl_deref], 16)
+        table[0x6E] = Instruction(0x6E, "BIT 5", [self._hl_deref], 12)
         table[0x6F] = Instruction(0x6F, "BIT 5", [self._a], 8)
         table[0x70] = Instruction(0x70, "BIT 6", [self._b], 8)
         table[0x71] = Instruction(0x71, "BIT 6", [self._c], 8)
@@ -544,7 +549,7 @@ class InstructionTable(object):
         table[0x73] = Instruction(0x73, "BIT 6", [self._e], 8)
         table[0x74] = Instruction(0x74, "BIT 6", [self._h], 8)
         table[0x75] = Instruction(0x75, "BIT 6", [self._l], 8)
-        table[0x76] = Instruction(0x76, "BIT 6", [self._hl_deref], 16)
+        table[0x76] = Instruction(0x76, "BIT 6", [self._hl_deref], 12)
         table[0x77] = Instruction(0x77, "BIT 6", [self._a], 8)
         table[0x78] = Instruction(0x78, "BIT 7", [self._b], 8)
         table[0x79] = Instruction(0x79, "BIT 7", [self._c], 8)
@@ -552,7 +557,7 @@ class InstructionTable(object):
         table[0x7B] = Instruction(0x7B, "BIT 7", [self._e], 8)
         table[0x7C] = Instruction(0x7C, "BIT 7", [self._h], 8)
         table[0x7D] = Instruction(0x7D, "BIT 7", [self._l], 8)
-        table[0x7E] = Instruction(0x7E, "BIT 7", [self._hl_deref], 16)
+        table[0x7E] = Instruction(0x7E, "BIT 7", [self._hl_deref], 12)
         table[0x7F] = Instruction(0x7F, "BIT 7", [self._a], 8)
 
         # Res instructions
@@ -687,4 +692,8 @@ class InstructionTable(object):
         table[0xFE] = Instruction(0xFE, "SET 7", [self._hl_deref], 16)
         table[0xFF] = Instruction(0xFF, "SET 7", [self._a], 8)
 
-        self.tables['PREFIX CB'] = table
+        self.tables['PREFIX CB'] = tuple(table)
+
+
+# built once, at import : shared by every CPU of the process
+INSTRUCTION_TABLE = InstructionTable()
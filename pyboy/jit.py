@@ -0,0 +1,443 @@
+"""
+Compiles hot basic blocks into Python functions.
+
+The source of a function is generated from the instruction table : for each
+instruction, its asm, arguments and cycles select the code to emit, and its
+flag actions (set, reset, affected, not affected) how F is updated. Registers
+are held in local variables for the duration of the block, memory is accessed
+through the memory page table directly, and flags are only computed when an
+instruction reads them or when the block exits : flags overwritten before
+being read are never computed.
+"""
+from collections import OrderedDict
+from types import CodeType
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from pyboy.instruction import ArgumentType as ArgType, FlagAction, Instruction
+from pyboy.registers import FLAG_MASKS
+
+# decoded instruction : the instruction, its immediate operands bytes and its address
+Decoded = Tuple[Instruction, Sequence[int], int]
+
+PAIRS = {'bc': ('b', 'c'), 'de': ('d', 'e'), 'hl': ('h', 'l'), 'af': ('a', 'f')}
+
+# the result of an 8 bits operation from a (A), v (operand) and cin (carry in),
+# and the expression of its affected flags, from the same names and r (result)
+ALU_EXPRESSIONS = {
+    'ADD': ('{a} + {v}', {
+        'z': '(0 if {r} & 0xFF else 0x80)',
+        'h': '((({a} & 0xF) + ({v} & 0xF) > 0xF) << 5)',
+        'c': '(({r} > 0xFF) << 4)',
+    }),
+    'ADC': ('{a} + {v} + {cin}', {
+        'z': '(0 if {r} & 0xFF else 0x80)',
+        'h': '((({a} & 0xF) + ({v} & 0xF) + {cin} > 0xF) << 5)',
+        'c': '(({r} > 0xFF) << 4)',
+    }),
+    'SUB': ('{a} - {v}', {
+        'z': '(0 if {r} & 0xFF else 0x80)',
+        'h': '((({a} & 0xF) < ({v} & 0xF)) << 5)',
+        'c': '(({r} < 0) << 4)',
+    }),
+    'SBC': ('{a} - {v} - {cin}', {
+        'z': '(0 if {r} & 0xFF else 0x80)',
+        'h': '((({a} & 0xF) - ({v} & 0xF) - {cin} < 0) << 5)',
+        'c': '(({r} < 0) << 4)',
+    }),
+    'AND': ('{a} & {v}', {'z': '(0 if {r} else 0x80)'}),
+    'OR': ('{a} | {v}', {'z': '(0 if {r} else 0x80)'}),
+    'XOR': ('{a} ^ {v}', {'z': '(0 if {r} else 0x80)'}),
+    'INC': ('{v} + 1', {
+        'z': '(0 if {r} & 0xFF else 0x80)',
+        'h': '((({v} & 0xF) == 0xF) << 5)',
+    }),
+    'DEC': ('{v} - 1', {
+        'z': '(0 if {r} & 0xFF else 0x80)',
+        'h': '((({v} & 0xF) == 0) << 5)',
+    }),
+}  # type: Dict[str, Tuple[str, Dict[str, str]]]
+ALU_EXPRESSIONS['CP'] = ALU_EXPRESSIONS['SUB']
+
+# rotates of A : result and carry flag, from v (A) and cin (carry in)
+ROTATE_EXPRESSIONS = {
+    'RLCA': ('((({v} << 1) | ({v} >> 7)) & 0xFF)', '(({v} >> 7) << 4)'),
+    'RRCA': ('(({v} >> 1) | (({v} & 1) << 7))', '(({v} & 1) << 4)'),
+    'RLA': ('((({v} << 1) | {cin}) & 0xFF)', '(({v} >> 7) << 4)'),
+    'RRA': ('(({v} >> 1) | ({cin} << 7))', '(({v} & 1) << 4)'),
+}
+
+# instructions reading the carry flag
+CARRY_IN = ('ADC', 'SBC', 'RLA', 'RRA')
+
+
+class UnsupportedInstruction(BaseException):
+    pass
+
+
+class BlockCompiler(object):
+    """Generates the source of the function executing a block"""
+
+    def __init__(self, block: Sequence[Decoded], end: int):
+        self.block = block
+        self.end = end
+        self.lines = []  # type: List[str]
+        self.reads = set()  # type: Set[str]
+        self.writes = set()  # type: Set[str]
+        self.temp = 0
+        # expression of F when it is not up to date in the f local
+        self.pending_flags = None  # type: Optional[str]
+        self.cycles = 0
+
+    def new_temp(self, prefix: str) -> str:
+        self.temp += 1
+        return "{}{}".format(prefix, self.temp)
+
+    def emit(self, line: str) -> None:
+        self.lines.append("    " + line)
+
+    # registers
+
+    def read_register(self, name: str) -> str:
+        name = name.lower()
+        if name in PAIRS:
+            high, low = PAIRS[name]
+            if name == 'af':
+                self.flags()
+            self.reads.update((high, low))
+            return "({} << 8 | {})".format(high, low)
+        self.reads.add(name)
+        if name == 'f':
+            self.flags()
+        return name
+
+    def write_register(self, name: str, value: str) -> None:
+        name = name.lower()
+        if name in PAIRS:
+            high, low = PAIRS[name]
+            temp = self.new_temp("w")
+            self.emit("{} = {}".format(temp, value))
+            self.emit("{} = {} >> 8".format(high, temp))
+            self.emit("{} = {} & {}".format(low, temp, "0xF0" if name == 'af' else "0xFF"))
+            self.writes.update((high, low))
+            if name == 'af':
+                self.pending_flags = None
+        else:
+            self.emit("{} = {}".format(name, value))
+            self.writes.add(name)
+
+    def flags(self) -> str:
+        """
+        materializes the pending flags into the f local, returns it
+        """
+        self.reads.add('f')
+        if self.pending_flags is not None:
+            self.emit("f = {}".format(self.pending_flags))
+            self.writes.add('f')
+            self.pending_flags = None
+        return 'f'
+
+    def update_flags(self, instruction: Instruction, affected: Dict[str, str]) -> None:
+        """
+        records the new F as a pending expression, built from the flag actions
+        of the instruction and the expressions of its affected flags
+        """
+        actions = instruction.flags or {}
+        keep = 0
+        parts = []
+        for flag, mask in FLAG_MASKS.items():
+            action = actions.get(flag, FlagAction.NOT_AFFECTED)
+            if action == FlagAction.NOT_AFFECTED:
+                keep |= mask
+            elif action == FlagAction.SET:
+                parts.append(hex(mask))
+            elif action == FlagAction.AFFECTED:
+                if flag not in affected:
+                    raise UnsupportedInstruction(repr(instruction))
+                parts.append(affected[flag])
+        if keep == 0xF0:
+            return
+        if keep:
+            parts.insert(0, "({} & {})".format(self.flags(), hex(keep)))
+        self.pending_flags = " | ".join(parts) or "0"
+
+    # memory
+
+    def address(self, instruction: Instruction, arg, operands: Sequence[int]) -> str:
+        """
+        returns the expression of the address of a dereferenced argument
+        """
+        if arg.arg_type == ArgType.REGISTER:
+            if arg.register == "C":
+                return "(0xFF00 | {})".format(self.read_register('c'))
+            return self.read_register(arg.register)
+        if arg.arg_type == ArgType.ADDRESS_16:
+            return hex(operands[0] | operands[1] << 8)
+        if arg.arg_type == ArgType.ADDRESS_8:
+            return hex(0xFF00 | operands[0])
+        raise UnsupportedInstruction(repr(instruction))
+
+    def read_memory(self, address: str) -> str:
+        if address.startswith("0x"):
+            value = int(address, 16)
+            return "rp[{}][{}]".format(hex(value >> 8), hex(value & 0xFF))
+        temp = self.new_temp("t")
+        self.emit("{} = {}".format(temp, address))
+        return "rp[{0} >> 8][{0} & 0xFF]".format(temp)
+
+    def write_memory(self, address: str, value: str) -> None:
+        if address.startswith("0x"):
+            value_address = int(address, 16)
+            self.emit("wp[{}][{}] = {}".format(hex(value_address >> 8), hex(value_address & 0xFF), value))
+            return
+        temp = self.new_temp("t")
+        self.emit("{} = {}".format(temp, address))
+        self.emit("wp[{0} >> 8][{0} & 0xFF] = {1}".format(temp, value))
+
+    def read_operand(self, instruction: Instruction, arg, operands: Sequence[int]) -> str:
+        """
+        returns an expression of the value of an argument, evaluated once
+        """
+        if arg.dereference:
+            temp = self.new_temp("v")
+            self.emit("{} = {}".format(temp, self.read_memory(self.address(instruction, arg, operands))))
+            return temp
+        if arg.arg_type == ArgType.REGISTER:
+            return self.read_register(arg.register)
+        if arg.arg_type == ArgType.UNSIGNED_8:
+            return hex(operands[0])
+        if arg.arg_type == ArgType.UNSIGNED_16:
+            return hex(operands[0] | operands[1] << 8)
+        raise UnsupportedInstruction(repr(instruction))
+
+    def write_operand(self, instruction: Instruction, arg, operands: Sequence[int], value: str) -> None:
+        if arg.dereference:
+            self.write_memory(self.address(instruction, arg, operands), value)
+        elif arg.arg_type == ArgType.REGISTER:
+            self.write_register(arg.register, value)
+        else:
+            raise UnsupportedInstruction(repr(instruction))
+
+    def push(self, value: str) -> None:
+        sp = self.read_register('sp')
+        temp = self.new_temp("p")
+        self.emit("{} = {}".format(temp, value))
+        self.write_register('sp', "({} - 2) & 0xFFFF".format(sp))
+        self.emit("wp[((sp + 1) & 0xFFFF) >> 8][(sp + 1) & 0xFF] = {} >> 8".format(temp))
+        self.emit("wp[sp >> 8][sp & 0xFF] = {} & 0xFF".format(temp))
+
+    def pop(self) -> str:
+        self.read_register('sp')
+        temp = self.new_temp("p")
+        self.emit("{} = rp[sp >> 8][sp & 0xFF] | rp[((sp + 1) & 0xFFFF) >> 8][(sp + 1) & 0xFF] << 8".format(temp))
+        self.write_register('sp', "(sp + 2) & 0xFFFF")
+        return temp
+
+    def condition(self, arg) -> str:
+        mask = FLAG_MASKS[arg.flag]
+        expected = mask if arg.arg_type == ArgType.FLAG_SET else 0
+        return "{} & {} == {}".format(self.flags(), hex(mask), hex(expected))
+
+    @staticmethod
+    def wide(arg) -> bool:
+        """returns whether the argument is a 16 bits register"""
+        return arg.arg_type == ArgType.REGISTER and not arg.dereference and len(arg.register) == 2
+
+    # instructions
+
+    def compile_instruction(self, instruction: Instruction, operands: Sequence[int], address: int,
+                            next_address: int, last: bool) -> None:
+        asm = instruction.asm
+        args = instruction.args
+
+        if asm == "LD" and instruction.opcode != 0x08:
+            value = self.read_operand(instruction, args[1], operands)
+            self.write_operand(instruction, args[0], operands, value)
+        elif asm in ("LDI", "LDD"):
+            hl = self.read_register('hl')
+            if args[0].register == "A":
+                self.write_register('a', self.read_memory(hl))
+            else:
+                self.write_memory(hl, self.read_register('a'))
+            self.write_register('hl', "({} {} 1) & 0xFFFF".format(hl, "+" if asm == "LDI" else "-"))
+        elif asm == "LDH":
+            if args[0].register == "A":
+                self.write_register('a', self.read_memory(hex(0xFF00 | operands[0])))
+            else:
+                self.write_memory(hex(0xFF00 | operands[0]), self.read_register('a'))
+        elif asm in ALU_EXPRESSIONS and not (asm in ("ADD", "INC", "DEC") and self.wide(args[0])):
+            self.compile_alu(instruction, operands)
+        elif asm in ("INC", "DEC"):
+            register = args[0].register
+            step = "+" if asm == "INC" else "-"
+            self.write_register(register, "({} {} 1) & 0xFFFF".format(self.read_register(register), step))
+        elif asm == "ADD" and args[0].register == "HL":
+            hl = self.new_temp("a")
+            value = self.new_temp("v")
+            result = self.new_temp("r")
+            self.emit("{} = {}".format(hl, self.read_register('hl')))
+            self.emit("{} = {}".format(value, self.read_register(args[1].register)))
+            self.emit("{} = {} + {}".format(result, hl, value))
+            self.write_register('hl', "{} & 0xFFFF".format(result))
+            self.update_flags(instruction, {
+                'h': "((({} & 0xFFF) + ({} & 0xFFF) > 0xFFF) << 5)".format(hl, value),
+                'c': "(({} > 0xFFFF) << 4)".format(result),
+            })
+        elif asm in ROTATE_EXPRESSIONS:
+            result, carry = ROTATE_EXPRESSIONS[asm]
+            value = self.new_temp("v")
+            self.emit("{} = {}".format(value, self.read_register('a')))
+            names = {'v': value, 'cin': "(({} >> 4) & 1)".format(self.flags()) if asm in CARRY_IN else ""}
+            carry = carry.format(**names)
+            if asm in CARRY_IN:
+                carry_temp = self.new_temp("c")
+                self.emit("{} = {}".format(carry_temp, carry))
+                carry = carry_temp
+            self.write_register('a', result.format(**names))
+            self.update_flags(instruction, {'c': carry})
+        elif asm == "CPL":
+            self.write_register('a', "{} ^ 0xFF".format(self.read_register('a')))
+            self.update_flags(instruction, {})
+        elif asm == "SCF":
+            self.update_flags(instruction, {})
+        elif asm == "CCF":
+            self.update_flags(instruction, {'c': "(({} & 0x10) ^ 0x10)".format(self.flags())})
+        elif asm == "PUSH":
+            self.push(self.read_register(args[0].register))
+        elif asm == "POP":
+            self.write_register(args[0].register, self.pop())
+        elif asm.startswith("RES") or asm.startswith("SET"):
+            bit = 1 << int(asm[4])
+            value = self.read_operand(instruction, args[0], operands)
+            if asm.startswith("RES"):
+                self.write_operand(instruction, args[0], operands, "{} & {}".format(value, hex(~bit & 0xFF)))
+            else:
+                self.write_operand(instruction, args[0], operands, "{} | {}".format(value, hex(bit)))
+        elif asm == "NOP":
+            pass
+        elif asm in ("JP", "JR", "CALL", "RET") and last:
+            self.compile_branch(instruction, operands, next_address)
+            return
+        else:
+            raise UnsupportedInstruction(repr(instruction))
+        self.cycles += instruction.cycles
+        if last:
+            self.emit("pc = {}".format(hex(next_address)))
+            self.emit("cycles = {}".format(self.cycles))
+
+    def compile_alu(self, instruction: Instruction, operands: Sequence[int]) -> None:
+        asm = instruction.asm
+        args = instruction.args
+        result, affected = ALU_EXPRESSIONS[asm]
+        names = {'a': '', 'v': '', 'cin': '', 'r': self.new_temp("r")}
+        if asm in ("INC", "DEC"):
+            value = self.new_temp("v")
+            self.emit("{} = {}".format(value, self.read_operand(instruction, args[0], operands)))
+            names['v'] = value
+        else:
+            names['a'] = self.new_temp("a")
+            self.emit("{} = {}".format(names['a'], self.read_register('a')))
+            value = self.new_temp("v")
+            self.emit("{} = {}".format(value, self.read_operand(instruction, args[-1], operands)))
+            names['v'] = value
+            if asm in CARRY_IN:
+                names['cin'] = self.new_temp("c")
+                self.emit("{} = ({} >> 4) & 1".format(names['cin'], self.flags()))
+        self.emit("{} = {}".format(names['r'], result.format(**names)))
+        if asm in ("INC", "DEC"):
+            self.write_operand(instruction, args[0], operands, "{} & 0xFF".format(names['r']))
+        elif asm != "CP":
+            self.write_register('a', "{} & 0xFF".format(names['r']))
+        self.update_flags(instruction, {flag: expression.format(**names) for flag, expression in affected.items()})
+
+    def compile_branch(self, instruction: Instruction, operands: Sequence[int], next_address: int) -> None:
+        asm = instruction.asm
+        args = instruction.args
+        taken = self.cycles + instruction.branch_cycles
+        not_taken = self.cycles + instruction.cycles
+        conditional = bool(args) and args[0].arg_type in (ArgType.FLAG_SET, ArgType.FLAG_NOT_SET)
+
+        if asm == "JP" and args[0].arg_type == ArgType.REGISTER:  # JP HL
+            self.emit("pc = {}".format(self.read_register('hl')))
+            self.emit("cycles = {}".format(not_taken))
+            return
+        if asm == "JP" or asm == "CALL":
+            target = hex(operands[0] | operands[1] << 8)
+        elif asm == "JR":
+            offset = operands[0] - 0x100 if operands[0] & 0x80 else operands[0]
+            target = hex((next_address + offset) & 0xFFFF)
+        else:  # RET
+            target = None
+
+        indent = ""
+        if conditional:
+            self.emit("if {}:".format(self.condition(args[0])))
+            indent = "    "
+        branch_start = len(self.lines)
+        if asm == "CALL":
+            self.push(hex(next_address))
+        if target is None:
+            target = self.pop()
+        self.emit("pc = {}".format(target))
+        self.emit("cycles = {}".format(taken))
+        self.lines[branch_start:] = [indent + line for line in self.lines[branch_start:]]
+        if conditional:
+            self.emit("else:")
+            self.emit("    pc = {}".format(hex(next_address)))
+            self.emit("    cycles = {}".format(not_taken))
+
+    def source(self, name: str) -> str:
+        """
+        returns the source of the function executing the block
+        """
+        count = len(self.block)
+        for index, (instruction, operands, address) in enumerate(self.block):
+            next_address = self.block[index + 1][2] if index + 1 < count else self.end
+            self.compile_instruction(instruction, operands, address, next_address, index == count - 1)
+        if self.pending_flags is not None:
+            self.flags()
+
+        registers = sorted(self.reads | self.writes)
+        prologue = ["    {} = registers.{}".format(register, register) for register in registers]
+        epilogue = ["    registers.{} = {}".format(register, register) for register in sorted(self.writes)]
+        return "\n".join(
+            ["def {}(registers=registers, rp=rp, wp=wp):".format(name)] + prologue + self.lines + epilogue +
+            ["    registers.pc = pc", "    return cycles", ""]
+        )
+
+
+# compiled blocks, by their decoded instructions and end : the code, the name
+# of the function it defines and its source, or None when not supported. Shared by the CPUs of the process, so
+# GameBoys running the same ROM only generate and compile a block once. The least recently used blocks are
+# dropped past CODE_CACHE_SIZE, as code in RAM or modifying itself keeps adding new ones.
+CODE_CACHE = OrderedDict()  # type: Dict[tuple, Optional[Tuple[CodeType, str, str]]]
+CODE_CACHE_SIZE = 8192
+
+
+def compile_block(cpu, block: Sequence[Decoded], end: int) -> Optional[Callable[[], int]]:
+    """
+    returns a function executing the decoded block, or None if one of its
+    instructions is not supported
+    """
+    key = (end,) + tuple((instruction, tuple(operands), address) for instruction, operands, address in block)
+    if key in CODE_CACHE:
+        compiled = CODE_CACHE[key]
+        CODE_CACHE.move_to_end(key)
+    else:
+        name = "block_{:04x}".format(block[0][2])
+        try:
+            source = BlockCompiler(block, end).source(name)
+            compiled = (compile(source, "<jit {}>".format(name), "exec"), name, source)
+        except UnsupportedInstruction:
+            compiled = None
+        CODE_CACHE[key] = compiled
+        while len(CODE_CACHE) > CODE_CACHE_SIZE:
+            CODE_CACHE.popitem(last=False)
+    if compiled is None:
+        return None
+    code, name, source = compiled
+    # the module code only defines the function, binding this CPU's state as defaults
+    namespace = {'registers': cpu.registers, 'rp': cpu.memory.read_pages, 'wp': cpu.memory.write_pages}
+    exec(code, namespace)
+    function = namespace[name]
+    function.source = source
+    return function
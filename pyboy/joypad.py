@@ -0,0 +1,117 @@
+"""
+The joypad, read through the P1 register (0xFF00).
+
+Buttons are given as a bitmask, 1 for pressed : the directions in the low
+nibble, the buttons in the high one. A press on a selected line requests
+the joypad interrupt.
+
+Input can also be scripted : a sequence of masks, one per frame, applied
+at the start of each frame by GameBoy.run_frame(). Input logs are stored
+the same way, one byte per frame, so a file of them can be memory-mapped
+(see load_inputs) and replayed without being read in memory first.
+"""
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+
+P1 = 0xFF00
+IF = 0xFF0F
+
+INTERRUPT_JOYPAD = 0x10
+
+RIGHT = 0x01
+LEFT = 0x02
+UP = 0x04
+DOWN = 0x08
+A = 0x10
+B = 0x20
+SELECT = 0x40
+START = 0x80
+
+
+def load_inputs(path: str, count: Optional[int] = None) -> np.ndarray:
+    """
+    memory-maps an input log : one byte per frame, or count bytes per frame
+    for a log of count GameBoys (a (frames, count) array)
+    """
+    inputs = np.memmap(path, dtype=np.uint8, mode='r')
+    if count is not None:
+        inputs = inputs.reshape(-1, count)
+    return inputs
+
+
+def save_inputs(path: str, inputs) -> None:
+    """writes an input log : a sequence of masks, or a (frames, count) array"""
+    with open(path, 'wb') as file:
+        file.write(np.ascontiguousarray(inputs, dtype=np.uint8).tobytes())
+
+
+class Joypad(object):
+    """
+    The P1 register : the game selects the directions and/or the buttons, and reads them.
+
+    inputs is the iterator of scripted masks, log the masks of the frames
+    recorded : both are None unless enabled.
+    """
+
+    def __init__(self, memory):
+        self.memory = memory
+        self.buttons = 0
+        self.select = 0x30
+        self.inputs = None  # type: Optional[Iterator[int]]
+        self.log = None  # type: Optional[bytearray]
+        memory.add_io_hook(P1, read=self.read, write=self.write)
+
+    def write(self, address: int, value: int) -> None:
+        self.select = value & 0x30
+
+    def read(self, address: int) -> int:
+        pressed = 0
+        if not self.select & 0x10:
+            pressed |= self.buttons & 0x0F
+        if not self.select & 0x20:
+            pressed |= self.buttons >> 4
+        # 0 is pressed
+        return 0xC0 | self.select | (~pressed & 0x0F)
+
+    def press(self, buttons: int) -> None:
+        """
+        sets the pressed buttons : the joypad interrupt is requested when one
+        of a selected line is pressed
+        """
+        pressed = buttons & ~self.buttons
+        self.buttons = buttons
+        if pressed:
+            lines = 0
+            if not self.select & 0x10:
+                lines |= 0x0F
+            if not self.select & 0x20:
+                lines |= 0xF0
+            if pressed & lines:
+                self.memory[IF] = self.memory[IF] | INTERRUPT_JOYPAD
+
+    def script(self, inputs: Iterable[int]) -> None:
+        """
+        presses the given masks, one per frame, from the next frame on. A
+        NumPy array (or memory map) of uint8, even strided, is read in place.
+        Once they run out, the last mask stays pressed.
+        """
+        if isinstance(inputs, np.ndarray):
+            inputs = memoryview(inputs.astype(np.uint8, copy=False))
+        self.inputs = iter(inputs)
+
+    def record(self) -> bytearray:
+        """records the masks pressed on the next frames, returns the log"""
+        self.log = bytearray()
+        return self.log
+
+    def frame(self) -> None:
+        """presses the next scripted mask, and records the mask of the frame"""
+        if self.inputs is not None:
+            buttons = next(self.inputs, None)
+            if buttons is None:
+                self.inputs = None
+            else:
+                self.press(buttons)
+        if self.log is not None:
+            self.log.append(self.buttons)
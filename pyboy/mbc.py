@@ -0,0 +1,414 @@
+import time
+from typing import Callable, List, Optional, Sequence
+
+from pyboy.cartridge import Cartridge
+from pyboy.cow import Snapshot, allocate
+from pyboy.page import UNMAPPED_PAGE, PAGE_SIZE, HookedPage, split_pages
+
+RAM_BANK_SIZE = 0x2000
+# pages of the external RAM area (0xA000-0xBFFF)
+RAM_WINDOW_PAGES = RAM_BANK_SIZE // PAGE_SIZE
+
+# cartridge header RAM size code: RAM size in bytes
+RAM_SIZES = {0x00: 0, 0x01: 0x800, 0x02: 0x2000, 0x03: 0x8000, 0x04: 0x20000, 0x05: 0x10000}
+
+
+class MBCException(BaseException):
+    pass
+
+
+class MBC(object):
+    """
+    Memory bank controller of a cartridge without one (ROM only, or ROM and
+    RAM : the RAM is then always enabled).
+
+    Writes to 0x0000-0x7FFF are handed to the controller, which switches banks
+    by pointing the memory page table to the pages of another bank : a bank
+    switch never copies nor allocates.
+
+    The RAM is read through ram_pages, one view per 256 bytes : the pages of
+    the ram buffer, or in a fork the pages of the snapshot it shares until
+    they are written (see pyboy.cow). ram_contents() returns the RAM as read.
+
+    The pages mapped to the external RAM area for a bank are built on its
+    first selection, then updated in place as pages are copied : mapping a
+    bank does not allocate.
+    """
+    # whether the RAM is only enabled by writing 0x0A to 0x0000-0x1FFF
+    ram_gate = False
+
+    def __init__(self, memory, cartridge: Cartridge, ram: Optional[Snapshot] = None):
+        self.memory = memory
+        self.cartridge = cartridge
+        ram_size = RAM_SIZES.get(cartridge.ram_size, 0)
+        self.ram = allocate(ram_size)
+        # the snapshot whose pages are shared until written, and how many still are
+        self.shared = None  # type: Optional[Snapshot]
+        self.shared_pages = 0
+        # the snapshot of the RAM given to forks, until it is written
+        self.frozen = None  # type: Optional[Snapshot]
+        if ram is not None and len(ram):
+            self.shared = ram
+            self.shared_pages = len(ram.pages)
+            self.ram_pages = list(ram.pages)  # type: List[memoryview]
+        else:
+            self.ram_pages = split_pages(memoryview(self.ram))
+        # RAM smaller than the 8 KiB window is mirrored over it
+        self.bank_pages = min(ram_size, RAM_BANK_SIZE) // PAGE_SIZE
+        self.ram_bank_count = max(ram_size // RAM_BANK_SIZE, 1) if ram_size else 0
+        self.ram_bank_number = 0
+        # the read and write pages of each bank, see window()
+        self.windows = [None] * self.ram_bank_count  # type: List[Optional[List[list]]]
+        self.ram_enabled = not self.ram_gate and bool(ram_size)
+
+        self.disabled_pages = [UNMAPPED_PAGE] * RAM_WINDOW_PAGES
+        self.discarded_pages = split_pages(memoryview(bytearray(RAM_BANK_SIZE)))
+        read_ram, write_ram = self.read_ram, self.write_ram
+        self.hooked_pages = [
+            HookedPage(0xA000 + page * PAGE_SIZE, read_ram, write_ram) for page in range(RAM_WINDOW_PAGES)
+        ]
+
+    def write(self, address: int, value: int) -> None:
+        """
+        handles a write to the ROM area (0x0000-0x7FFF)
+        """
+        pass
+
+    def ram_page(self, address: int) -> int:
+        """returns the index in ram_pages of an address of the external RAM area"""
+        return self.ram_bank_number * self.bank_pages + ((address - 0xA000) >> 8) % self.bank_pages
+
+    def read_ram(self, address: int) -> int:
+        """
+        handles a read from the external RAM area (0xA000-0xBFFF)
+        """
+        if not self.ram_enabled or not self.ram_pages:
+            return 0xFF
+        return self.ram_pages[self.ram_page(address)][address & 0xFF]
+
+    def write_ram(self, address: int, value: int) -> None:
+        """
+        handles a write to the external RAM area (0xA000-0xBFFF) : the first
+        write to a shared or frozen page makes it writable in place
+        """
+        if self.ram_enabled and self.ram_pages:
+            page = self.ram_page(address)
+            if self.frozen is not None or self.shared is not None:
+                self.own_page(page)
+            self.ram_pages[page][address & 0xFF] = value
+
+    def own_page(self, page: int) -> None:
+        """
+        drops the frozen snapshot and copies the page if shared, then maps
+        the RAM pages back
+        """
+        self.frozen = None
+        shared = self.shared
+        if shared is not None and self.ram_pages[page] is shared.pages[page]:
+            start = page * PAGE_SIZE
+            self.ram[start:start + PAGE_SIZE] = shared.pages[page]
+            view = self.ram_pages[page] = memoryview(self.ram)[start:start + PAGE_SIZE]
+            self.shared_pages -= 1
+            if not self.shared_pages:
+                self.shared = None
+            window = self.windows[page // self.bank_pages]
+            if window is not None:
+                for index in range(page % self.bank_pages, RAM_WINDOW_PAGES, self.bank_pages):
+                    window[0][index] = window[1][index] = view
+        self.map_ram()
+
+    def enable_ram(self, value: int) -> None:
+        self.ram_enabled = (value & 0x0F) == 0x0A
+        self.map_ram()
+
+    def select_ram_bank(self, bank: int) -> None:
+        if self.ram_bank_count:
+            self.ram_bank_number = bank % self.ram_bank_count
+            self.map_ram()
+
+    def map_ram(self) -> None:
+        """
+        maps the external RAM area of the memory page table to the selected
+        bank. Pages shared with a snapshot, or every page while frozen, are
+        written through hooks.
+        """
+        if not self.ram_enabled or not self.ram_pages:
+            self.memory.map_pages(0xA0, self.disabled_pages, self.discarded_pages)
+            return
+        read_pages, write_pages = self.window(self.ram_bank_number)
+        self.memory.map_pages(0xA0, read_pages, self.hooked_pages if self.frozen is not None else write_pages)
+
+    def window(self, bank: int) -> List[list]:
+        """
+        returns the read and write pages of a bank in the external RAM area,
+        built on its first selection. A bank smaller than the area is
+        mirrored over it.
+        """
+        window = self.windows[bank]
+        if window is None:
+            count = self.bank_pages
+            first = bank * count
+            pages = self.ram_pages[first:first + count] * (RAM_WINDOW_PAGES // count)
+            if self.shared is not None:
+                shared = self.shared.pages
+                write_pages = [hooked if page is shared[first + index % count] else page
+                               for index, (page, hooked) in enumerate(zip(pages, self.hooked_pages))]
+            else:
+                write_pages = pages
+            window = self.windows[bank] = [pages, write_pages]
+        return window
+
+    def freeze_ram(self) -> Snapshot:
+        """
+        returns a snapshot of the RAM, for forks : the same one until the RAM
+        is written
+        """
+        if self.frozen is None:
+            if self.shared is not None and self.shared_pages == len(self.ram_pages):
+                self.frozen = self.shared
+            else:
+                self.frozen = Snapshot(self.ram_contents())
+            self.map_ram()
+        return self.frozen
+
+    def ram_contents(self) -> bytes:
+        """returns the contents of the RAM"""
+        if self.frozen is not None:
+            return self.frozen.data
+        if self.shared is not None:
+            return b''.join(self.ram_pages)
+        return bytes(self.ram)
+
+    def load_ram(self, data: bytes) -> None:
+        """overwrites the RAM, which no longer shares pages with a snapshot"""
+        self.ram[:] = data
+        if self.shared is not None:
+            self.ram_pages = split_pages(memoryview(self.ram))
+            self.shared = None
+            self.shared_pages = 0
+            self.windows = [None] * self.ram_bank_count
+        self.frozen = None
+        self.map_ram()
+
+    def state(self) -> List[int]:
+        """returns the controller registers, for save states"""
+        return [self.ram_enabled, self.ram_bank_number]
+
+    def load_state(self, values: Sequence[int]) -> None:
+        """
+        restores the registers returned by state(). ROM banks are restored by
+        the memory.
+        """
+        self.ram_enabled = bool(values[0])
+        self.ram_bank_number = values[1]
+        self.map_ram()
+
+
+class MBC1(MBC):
+    """MBC1 : up to 2 MiB of ROM and 32 KiB of RAM"""
+    ram_gate = True
+
+    def __init__(self, memory, cartridge: Cartridge, ram: Optional[Snapshot] = None):
+        super().__init__(memory, cartridge, ram)
+        self.rom_bank_low = 1
+        self.bank_high = 0
+        self.mode = 0
+
+    def write(self, address: int, value: int) -> None:
+        if address < 0x2000:
+            self.enable_ram(value)
+            return
+        if address < 0x4000:
+            self.rom_bank_low = (value & 0x1F) or 1
+        elif address < 0x6000:
+            self.bank_high = value & 0x03
+        else:
+            self.mode = value & 0x01
+        # only the windows whose bank changed are mapped again
+        memory = self.memory
+        bank_count = self.cartridge.bank_count
+        rom_bank = (self.bank_high << 5) | self.rom_bank_low
+        if rom_bank % bank_count != memory.rom_bank:
+            memory.switch_rom_bank(rom_bank)
+        high = self.bank_high if self.mode else 0
+        if (high << 5) % bank_count != memory.rom0_bank:
+            memory.switch_rom0_bank(high << 5)
+        if self.ram_bank_count and high % self.ram_bank_count != self.ram_bank_number:
+            self.select_ram_bank(high)
+
+    def state(self) -> List[int]:
+        return super().state() + [self.rom_bank_low, self.bank_high, self.mode]
+
+    def load_state(self, values: Sequence[int]) -> None:
+        self.rom_bank_low, self.bank_high, self.mode = values[2:5]
+        super().load_state(values)
+
+
+class RTC(object):
+    """The MBC3 real time clock"""
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self.start = clock()  # time at which the counter was zero
+        self.halted_seconds = None  # type: Optional[int]
+        self.carry = 0
+        self.latched = [0, 0, 0, 0, 0]
+        self.latch_armed = False
+
+    def seconds(self) -> int:
+        """returns the counter value, in seconds"""
+        if self.halted_seconds is not None:
+            return self.halted_seconds
+        seconds = int(self.clock() - self.start)
+        if seconds >= 512 * 86400:
+            # the day counter overflowed
+            self.carry = 1
+            self.start += (seconds // (512 * 86400)) * 512 * 86400
+            seconds %= 512 * 86400
+        return seconds
+
+    def set_seconds(self, seconds: int) -> None:
+        if self.halted_seconds is not None:
+            self.halted_seconds = seconds
+        else:
+            self.start = self.clock() - seconds
+
+    def latch(self, value: int) -> None:
+        """a write of 0 then 1 latches the counter into the RTC registers"""
+        if self.latch_armed and value == 1:
+            seconds = self.seconds()
+            days = seconds // 86400
+            halt = self.halted_seconds is not None
+            self.latched = [
+                seconds % 60, (seconds // 60) % 60, (seconds // 3600) % 24,
+                days & 0xFF, (days >> 8) & 0x01 | halt << 6 | self.carry << 7
+            ]
+        self.latch_armed = value == 0
+
+    def read(self, register: int) -> int:
+        return self.latched[register - 0x08]
+
+    def write(self, register: int, value: int) -> None:
+        seconds = self.seconds()
+        fields = [seconds % 60, (seconds // 60) % 60, (seconds // 3600) % 24, seconds // 86400]
+        if register == 0x0C:
+            fields[3] = (fields[3] & 0xFF) | (value & 0x01) << 8
+            self.carry = (value >> 7) & 0x01
+            halt = bool(value & 0x40)
+            if halt and self.halted_seconds is None:
+                self.halted_seconds = seconds
+            elif not halt and self.halted_seconds is not None:
+                self.halted_seconds = None
+        elif register == 0x0B:
+            fields[3] = (fields[3] & 0x100) | value
+        else:
+            fields[register - 0x08] = value
+        self.set_seconds(fields[0] + fields[1] * 60 + fields[2] * 3600 + fields[3] * 86400)
+        self.latched[register - 0x08] = value
+
+    def state(self) -> List[int]:
+        return [self.seconds(), self.halted_seconds is not None, self.carry, self.latch_armed] + self.latched
+
+    def load_state(self, values: Sequence[int]) -> None:
+        seconds, halted, self.carry, latch_armed = values[:4]
+        self.latch_armed = bool(latch_armed)
+        self.latched = list(values[4:9])
+        self.halted_seconds = seconds if halted else None
+        self.start = self.clock() - seconds
+
+
+class MBC3(MBC):
+    """MBC3 : up to 2 MiB of ROM, 32 KiB of RAM and a real time clock"""
+    ram_gate = True
+
+    def __init__(self, memory, cartridge: Cartridge, ram: Optional[Snapshot] = None,
+                 clock: Callable[[], float] = time.time):
+        super().__init__(memory, cartridge, ram)
+        self.rtc = RTC(clock)
+        self.rtc_register = None  # type: Optional[int]
+
+    def write(self, address: int, value: int) -> None:
+        if address < 0x2000:
+            self.enable_ram(value)
+        elif address < 0x4000:
+            self.memory.switch_rom_bank((value & 0x7F) or 1)
+        elif address < 0x6000:
+            if 0x08 <= value <= 0x0C:
+                self.rtc_register = value
+                self.map_ram()
+            else:
+                self.rtc_register = None
+                self.select_ram_bank(value & 0x03)
+        else:
+            self.rtc.latch(value)
+
+    def map_ram(self) -> None:
+        if self.rtc_register is not None and self.ram_enabled:
+            self.memory.map_pages(0xA0, self.hooked_pages, self.hooked_pages)
+        else:
+            super().map_ram()
+
+    def read_ram(self, address: int) -> int:
+        if self.rtc_register is not None:
+            return self.rtc.read(self.rtc_register) if self.ram_enabled else 0xFF
+        return super().read_ram(address)
+
+    def write_ram(self, address: int, value: int) -> None:
+        if self.rtc_register is not None:
+            if self.ram_enabled:
+                self.rtc.write(self.rtc_register, value)
+            return
+        super().write_ram(address, value)
+
+    def state(self) -> List[int]:
+        rtc_register = -1 if self.rtc_register is None else self.rtc_register
+        return super().state() + [rtc_register] + self.rtc.state()
+
+    def load_state(self, values: Sequence[int]) -> None:
+        self.rtc_register = None if values[2] < 0 else values[2]
+        self.rtc.load_state(values[3:])
+        super().load_state(values)
+
+
+class MBC5(MBC):
+    """MBC5 : up to 8 MiB of ROM and 128 KiB of RAM"""
+    ram_gate = True
+
+    def __init__(self, memory, cartridge: Cartridge, ram: Optional[Snapshot] = None):
+        super().__init__(memory, cartridge, ram)
+        self.rom_bank = 1
+
+    def write(self, address: int, value: int) -> None:
+        if address < 0x2000:
+            self.enable_ram(value)
+        elif address < 0x3000:
+            self.rom_bank = (self.rom_bank & 0x100) | value
+            self.memory.switch_rom_bank(self.rom_bank)
+        elif address < 0x4000:
+            self.rom_bank = (self.rom_bank & 0xFF) | (value & 0x01) << 8
+            self.memory.switch_rom_bank(self.rom_bank)
+        elif address < 0x6000:
+            self.select_ram_bank(value & 0x0F)
+
+    def state(self) -> List[int]:
+        return super().state() + [self.rom_bank]
+
+    def load_state(self, values: Sequence[int]) -> None:
+        self.rom_bank = values[2]
+        super().load_state(values)
+
+
+def create_mbc(memory, cartridge: Cartridge, ram: Optional[Snapshot] = None) -> MBC:
+    """
+    returns the memory bank controller for the cartridge type in its header
+    """
+    cartridge_type = cartridge.cartridge_type
+    if cartridge_type in (0x00, 0x08, 0x09):
+        return MBC(memory, cartridge, ram)
+    if 0x01 <= cartridge_type <= 0x03:
+        return MBC1(memory, cartridge, ram)
+    if 0x0F <= cartridge_type <= 0x13:
+        return MBC3(memory, cartridge, ram)
+    if 0x19 <= cartridge_type <= 0x1E:
+        return MBC5(memory, cartridge, ram)
+    raise MBCException("cartridge type {:#04x} not supported".format(cartridge_type))
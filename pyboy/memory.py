@@ -1,25 +1,348 @@
+from typing import Callable, Dict, List, Optional, Set, Tuple, Union
+
+from pyboy.cartridge import Cartridge
+from pyboy.cow import Snapshot, allocate
+from pyboy.mbc import MBC, create_mbc
+from pyboy.page import PAGE_SIZE, HookedPage, split_pages
+
+Page = Union[memoryview, HookedPage]
+
+# name: (start, end) of each region of the address space, end excluded
+REGIONS = {
+    'rom0': (0x0000, 0x4000),  # ROM bank 0
+    'romx': (0x4000, 0x8000),  # switchable ROM bank
+    'vram': (0x8000, 0xA000),  # video RAM
+    'eram': (0xA000, 0xC000),  # external (cartridge) RAM
+    'wram': (0xC000, 0xE000),  # work RAM
+    'echo': (0xE000, 0xFE00),  # echo of the work RAM
+    'oam': (0xFE00, 0xFEA0),  # sprite attribute table
+    'io': (0xFF00, 0xFF80),  # IO registers
+    'hram': (0xFF80, 0xFFFF),  # high RAM
+    'ie': (0xFFFF, 0x10000),  # interrupt enable register
+}  # type: Dict[str, Tuple[int, int]]
+
+
+# regions read and written directly in the backing buffer
+DIRECT_REGIONS = ('vram', 'wram', 'oam', 'hram')
+# pages of the video and work RAM, which forks share copy-on-write : the
+# pages of a snapshot are in this order
+SHARED_PAGES = tuple(range(0x80, 0xA0)) + tuple(range(0xC0, 0xE0))
+# each of those pages and its echo, if any
+SHARED_ALIASES = {page: (page, page + 0x20) if 0xC0 <= page < 0xDE else (page,) for page in SHARED_PAGES}
+# the other parts of the backing buffer in use, copied by forks : OAM, IO and
+# high RAM, and without a cartridge the ROM and external RAM areas
+COPIED_RANGES = ((0xFE00, 0x10000),)
+UNMAPPED_RANGES = ((0x0000, 0x8000), (0xA000, 0xC000))
+
+
 class Memory(object):
-    """" Memory """
+    """"
+    Memory : the 64 KiB address space, backed by a buffer (an anonymous
+    memory map, see pyboy.cow).
+
+    Each region of the address space is exposed as a memoryview over the
+    backing buffer (memory.vram, memory.oam, ...), so it can be read or
+    written without copying. Once a cartridge is loaded, rom0 and romx are
+    views over the cartridge's memory-mapped banks instead, and writes to the
+    ROM and external RAM areas go through its memory bank controller.
+
+    Accesses go through a page table with one entry per high address byte :
+    plain RAM pages are views over their buffer, so a read or a write is a
+    single index, while pages with side effects (IO registers, bank
+    controller) are HookedPage objects calling the matching hooks.
+
+    fork() copies the memory, and shares the video, work and cartridge RAM
+    copy-on-write : a fork reads the pages of a snapshot (see pyboy.cow)
+    through its page table, and writes them through hooks copying a page
+    into its buffer on its first write. Code reading the buffer directly owns
+    the pages it reads first, see own().
+    """
     def __init__(self):
-        self.iter_index = -1
-        self.mem = [0 for _ in range(0xFFFF + 1)]
+        self.cartridge = None  # type: Optional[Cartridge]
+        self.mbc = None  # type: Optional[MBC]
+        # ROM banks mapped to 0x0000-0x3FFF and 0x4000-0x7FFF
+        self.rom0_bank = 0
+        self.rom_bank = 1
+        self.mem = allocate(0xFFFF + 1)
+        self.view = memoryview(self.mem)
+        self.regions = {}  # type: Dict[str, memoryview]
+        for name, (start, end) in REGIONS.items():
+            self.regions[name] = self.view[start:end]
+            setattr(self, name, self.regions[name])
+        # the echo region mirrors the work RAM
+        self.echo = self.regions['echo'] = self.wram[:0x1E00]
+
+        pages = split_pages(self.view)
+        # the video and work RAM pages of the buffer, mapped back when copied in a fork
+        self.buffer_pages = [None] * 0x100  # type: List[Optional[memoryview]]
+        for page in SHARED_PAGES:
+            self.buffer_pages[page] = pages[page]
+        pages[0xE0:0xFE] = pages[0xC0:0xDE]
+        self.read_pages = list(pages)  # type: List[Page]
+        self.write_pages = list(pages)  # type: List[Page]
+        # the page tables saved by an OAM DMA transfer, mapped back at its end
+        self.saved_pages = None  # type: Optional[List[List[Page]]]
+
+        # the snapshot whose pages are shared until written, and which still are
+        self.shared = None  # type: Optional[Snapshot]
+        self.shared_pages = set()  # type: Set[int]
+        # the last snapshot given to forks
+        self.frozen = None  # type: Optional[Snapshot]
+        # the write hooks of the shared pages, and the pages they replaced, by page
+        self.shared_hooks = [None] * 0x100  # type: List[Optional[HookedPage]]
+        self.hooked_pages = [None] * 0x100  # type: List[Optional[Page]]
+
+        # hooks of the IO page (0xFF00-0xFFFF), indexed by address & 0xFF
+        self.io_read_hooks = [None] * PAGE_SIZE  # type: List[Optional[Callable[[int], int]]]
+        self.io_write_hooks = [None] * PAGE_SIZE  # type: List[Optional[Callable[[int, int], None]]]
+        self.read_pages[0xFF] = self.write_pages[0xFF] = HookedPage(0xFF00, self.read_io, self.write_io)
 
     def __len__(self):
         return len(self.mem)
 
     def __iter__(self):
-        self.iter_index = -1
-        return self
-
-    def __next__(self):
-        self.iter_index += 1
-        if self.iter_index > 0xFFFF:
-            raise StopIteration
-        return self.mem[self.iter_index]
+        for address in range(len(self.mem)):
+            yield self[address]
 
     def __getitem__(self, item):
-        return self.mem[item]
+        return self.read_pages[item >> 8][item & 0xFF]
 
     def __setitem__(self, key, value):
-        self.mem[key] = value
+        self.write_pages[key >> 8][key & 0xFF] = value
         return value
+
+    def read_io(self, address: int) -> int:
+        hook = self.io_read_hooks[address & 0xFF]
+        if hook is None:
+            return self.mem[address]
+        return hook(address)
+
+    def write_io(self, address: int, value: int) -> None:
+        hook = self.io_write_hooks[address & 0xFF]
+        if hook is None:
+            self.mem[address] = value
+        else:
+            hook(address, value)
+
+    def add_io_hook(self, address: int,
+                    read: Optional[Callable[[int], int]] = None,
+                    write: Optional[Callable[[int, int], None]] = None) -> None:
+        """
+        makes reads and/or writes of an address in 0xFF00-0xFFFF call the given hooks
+        """
+        if read is not None:
+            self.io_read_hooks[address & 0xFF] = read
+        if write is not None:
+            self.io_write_hooks[address & 0xFF] = write
+
+    def tables(self) -> Tuple[List[Page], List[Page]]:
+        """
+        returns the read and write page tables pages are mapped to : during
+        an OAM DMA transfer, the ones mapped back at its end
+        """
+        if self.saved_pages is not None:
+            return self.saved_pages[0], self.saved_pages[1]
+        return self.read_pages, self.write_pages
+
+    def map_pages(self, first_page: int, read_pages: List[Page], write_pages: List[Page]) -> None:
+        """
+        maps the given pages to the page table, starting at first_page
+        """
+        tables = self.tables()
+        tables[0][first_page:first_page + len(read_pages)] = read_pages
+        tables[1][first_page:first_page + len(write_pages)] = write_pages
+
+    def region(self, address: int, length: int) -> Optional[str]:
+        """
+        returns the name of the region containing the whole block, if any
+        """
+        for name, (start, end) in REGIONS.items():
+            if start <= address and address + length <= end:
+                return name
+        return None
+
+    def hooked(self, start: int, end: int) -> bool:
+        """
+        returns whether writes to any page of start-end go through hooks
+        """
+        return any(isinstance(self.write_pages[page], HookedPage) for page in range(start >> 8, ((end - 1) >> 8) + 1))
+
+    def read_block(self, address: int, length: int) -> memoryview:
+        """
+        returns a view over length bytes starting at address. Blocks in ROM or
+        in a RAM region are not copied; other blocks are read byte by byte.
+        """
+        name = self.region(address, length)
+        if name in DIRECT_REGIONS or name in ('rom0', 'romx'):
+            if self.shared is not None:
+                self.own(address, address + length)
+            start = address - REGIONS[name][0]
+            return getattr(self, name)[start:start + length]
+        return memoryview(bytes(self[address + offset] for offset in range(length)))
+
+    def write_block(self, address: int, data) -> None:
+        """
+        writes a bytes-like object (or a sequence of ints) starting at address.
+        Blocks in a RAM region are written with one copy; other blocks are
+        written byte by byte, so writes keep their side effects.
+        """
+        end = address + len(data)
+        if address < 0 or end > len(self.mem):
+            raise IndexError("block {:#06x}-{:#06x} out of the address space".format(address, end))
+        name = self.region(address, len(data))
+        if name in DIRECT_REGIONS and not self.hooked(address, end):
+            self.mem[address:end] = bytes(data)
+        else:
+            for offset, value in enumerate(data):
+                self[address + offset] = value
+
+    def load_rom(self, cartridge: Cartridge, ram: Optional[Snapshot] = None) -> None:
+        """
+        maps the cartridge ROM banks 0 and 1 to 0x0000-0x7FFF. The cartridge
+        RAM is new, or shares the pages of the given snapshot until written.
+        """
+        self.cartridge = cartridge
+        self.mbc = create_mbc(self, cartridge, ram)
+        # one bound method for all the pages
+        write = self.mbc.write
+        self.write_pages[0x00:0x80] = [HookedPage(page << 8, write=write) for page in range(0x80)]
+        self.switch_rom0_bank(0)
+        self.switch_rom_bank(1)
+        self.mbc.map_ram()
+
+    def switch_rom_bank(self, bank: int) -> None:
+        """
+        maps the given cartridge ROM bank to 0x4000-0x7FFF
+        """
+        bank %= self.cartridge.bank_count
+        self.rom_bank = bank
+        self.romx = self.regions['romx'] = self.cartridge.bank(bank)
+        self.read_pages[0x40:0x80] = self.cartridge.bank_pages(bank)
+
+    def switch_rom0_bank(self, bank: int) -> None:
+        """
+        maps the given cartridge ROM bank to 0x0000-0x3FFF
+        """
+        bank %= self.cartridge.bank_count
+        self.rom0_bank = bank
+        self.rom0 = self.regions['rom0'] = self.cartridge.bank(bank)
+        self.read_pages[0x00:0x40] = self.cartridge.bank_pages(bank)
+
+    def write_shared(self, address: int, value: int) -> None:
+        """
+        handles the first write to a shared page : copies it, then writes
+        through the page it is mapped to
+        """
+        page = address >> 8
+        self.own_page(page - 0x20 if page >= 0xE0 else page)
+        self.hooked_pages[page][address & 0xFF] = value
+
+    def own_page(self, page: int) -> None:
+        """
+        copies a page still shared into the buffer, and maps it back in place
+        of the snapshot page and of the write hooks
+        """
+        view = self.buffer_pages[page]
+        if page in self.shared_pages:
+            # the snapshot holds the video RAM pages, then the work RAM ones
+            view[:] = self.shared.pages[page - 0x80 if page < 0xA0 else page - 0xA0]
+            self.shared_pages.remove(page)
+            if not self.shared_pages:
+                self.shared = None
+        read_pages, write_pages = self.tables()
+        hook = self.shared_hooks[page]
+        for alias in SHARED_ALIASES[page]:
+            read_pages[alias] = view
+            if write_pages[alias] is hook:
+                write_pages[alias] = self.hooked_pages[alias]
+
+    def own(self, start: int, end: int) -> None:
+        """copies the pages of start-end still shared, before reading the buffer directly"""
+        for page in range(start >> 8, ((end - 1) >> 8) + 1):
+            if page in self.shared_pages:
+                self.own_page(page)
+
+    def shared_block(self, start: int, end: int) -> Optional[memoryview]:
+        """
+        returns a view over start-end in the snapshot shared, to read it in
+        place, if none of its pages was copied yet. The block is in the video
+        or the work RAM.
+        """
+        if self.shared is None:
+            return None
+        for page in range(start >> 8, ((end - 1) >> 8) + 1):
+            if page not in self.shared_pages:
+                return None
+        offset = 0x8000 if start < 0xA000 else 0xA000
+        return memoryview(self.shared.data)[start - offset:end - offset]
+
+    def share(self, snapshot: Snapshot) -> None:
+        """
+        maps the pages of a snapshot of the video and work RAM returned by
+        freeze(), and write hooks copying them on their first write. The
+        write pages mapped until then are written once a page is copied.
+        """
+        read_pages, write_pages = self.tables()
+        write_shared = self.write_shared
+        for page, view in zip(SHARED_PAGES, snapshot.pages):
+            hook = self.shared_hooks[page]
+            if hook is None:
+                hook = self.shared_hooks[page] = HookedPage(page << 8, write=write_shared)
+            for alias in SHARED_ALIASES[page]:
+                read_pages[alias] = view
+                if write_pages[alias] is not hook:
+                    self.hooked_pages[alias] = write_pages[alias]
+                    write_pages[alias] = hook
+        self.shared = self.frozen = snapshot
+        self.shared_pages = set(SHARED_PAGES)
+
+    def freeze(self) -> Snapshot:
+        """
+        returns a snapshot of the video and work RAM, for forks : the same
+        one while they are unchanged
+        """
+        if self.shared is not None and len(self.shared_pages) == len(SHARED_PAGES):
+            return self.shared
+        read_pages = self.tables()[0]
+        data = b''.join([read_pages[page] for page in SHARED_PAGES])
+        if self.frozen is None or self.frozen.data != data:
+            self.frozen = Snapshot(data)
+        return self.frozen
+
+    def contents(self) -> bytes:
+        """returns the contents of the buffer, with the pages still shared"""
+        if self.shared is None:
+            return bytes(self.mem)
+        contents = bytearray(self.mem)
+        for page, view in zip(SHARED_PAGES, self.shared.pages):
+            if page in self.shared_pages:
+                contents[page << 8:(page + 1) << 8] = view
+        return bytes(contents)
+
+    def load(self, data: bytes) -> None:
+        """overwrites the buffer, which no longer shares pages with a snapshot"""
+        self.mem[:] = data
+        if self.shared is None:
+            return
+        self.shared_pages = set()
+        self.shared = None
+        # nothing left to copy : the buffer pages are mapped back
+        for page in SHARED_PAGES:
+            self.own_page(page)
+
+    def fork(self) -> 'Memory':
+        """
+        returns a memory with the same contents, and the same cartridge with
+        the same RAM contents. OAM, IO and high RAM are copied; the cartridge
+        RAM shares the pages of a snapshot of this one until they are written
+        (see pyboy.cow). The page table, banks and hooks of the fork are the
+        initial ones : once the components of the fork have mapped their
+        hooks, it shares the video and work RAM with share(freeze()).
+        """
+        memory = Memory()
+        ranges = COPIED_RANGES if self.cartridge is not None else COPIED_RANGES + UNMAPPED_RANGES
+        for start, end in ranges:
+            memory.mem[start:end] = self.mem[start:end]
+        if self.cartridge is not None:
+            memory.load_rom(self.cartridge, self.mbc.freeze_ram())
+        return memory
@@ -0,0 +1,35 @@
+from typing import Callable, Optional
+
+PAGE_SIZE = 0x100
+
+# page read when nothing is mapped : every byte reads as 0xFF
+UNMAPPED_PAGE = memoryview(b'\xFF' * PAGE_SIZE)
+
+
+class HookedPage(object):
+    """
+    A page of the address space whose accesses call hooks instead of indexing
+    a buffer. It is indexed by offset in the page, like a buffer page, and
+    passes the full address to its hooks.
+    """
+    __slots__ = ('base', 'read', 'write')
+
+    def __init__(self, base: int,
+                 read: Optional[Callable[[int], int]] = None,
+                 write: Optional[Callable[[int, int], None]] = None):
+        self.base = base
+        self.read = read
+        self.write = write
+
+    def __getitem__(self, offset: int) -> int:
+        return self.read(self.base | offset)
+
+    def __setitem__(self, offset: int, value: int) -> None:
+        self.write(self.base | offset, value)
+
+
+def split_pages(view: memoryview):
+    """
+    returns the page views of a page-aligned buffer view
+    """
+    return [view[start:start + PAGE_SIZE] for start in range(0, len(view), PAGE_SIZE)]
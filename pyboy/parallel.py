@@ -0,0 +1,151 @@
+"""
+Runs GameBoys in worker processes, to use more than one core.
+
+Instances are split in contiguous shards, one per worker, each run by a
+GameBoyBatch. Screens, work RAM and buttons live in shared memory blocks :
+workers render and copy their observations straight into them and the
+parent reads them without copying. Commands are single bytes sent through a
+pipe, so nothing is pickled per frame.
+"""
+import gc
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from pyboy.batch import GameBoyBatch
+from pyboy.gpu import SCREEN_HEIGHT, SCREEN_WIDTH
+
+STEP = b's'
+RESET = b'r'
+QUIT = b'q'
+DONE = b'd'
+
+WRAM_SIZE = 0x2000
+
+
+def shapes(count: int) -> List[Tuple[Tuple[int, ...], int]]:
+    """returns the shape and size of the screens, work RAM and buttons blocks"""
+    return [
+        ((count, SCREEN_HEIGHT, SCREEN_WIDTH), count * SCREEN_HEIGHT * SCREEN_WIDTH),
+        ((count, WRAM_SIZE), count * WRAM_SIZE),
+        ((count,), count),
+    ]
+
+
+def run_worker(connection, names: List[str], count: int, start: int, end: int, rom: str, options: dict) -> None:
+    """
+    runs the instances start to end of the shared blocks, until told to quit
+    """
+    blocks = [shared_memory.SharedMemory(name=name) for name in names]
+    screens, ram, buttons = [
+        np.ndarray(shape, dtype=np.uint8, buffer=block.buf)[start:end]
+        for (shape, _), block in zip(shapes(count), blocks)
+    ]
+
+    def create():
+        batch = GameBoyBatch(rom, end - start, screens=screens, **options)
+        return batch, [np.frombuffer(gameboy.memory.wram, dtype=np.uint8) for gameboy in batch]
+
+    batch, wrams = create()
+    while True:
+        command = connection.recv_bytes()
+        if command == STEP:
+            batch.step(buttons)
+            for index, wram in enumerate(wrams):
+                ram[index] = wram
+        elif command == RESET:
+            batch.close()
+            batch, wrams = create()
+        elif command == QUIT:
+            break
+        connection.send_bytes(DONE)
+
+    batch.close()
+    # the views must be gone before the blocks are closed
+    del batch, wrams, screens, ram, buttons
+    gc.collect()
+    for block in blocks:
+        block.close()
+    connection.send_bytes(DONE)
+
+
+class ParallelRunner(object):
+    """
+    Steps count GameBoys on the same ROM in lockstep, split across worker
+    processes (one per core by default).
+
+    screens (count, 144, 160), ram (count, 8192, the work RAM after the last
+    step) and buttons (count,) are NumPy arrays over shared memory.
+    Keyword options are passed to each GameBoy.
+    """
+
+    def __init__(self, rom: str, count: int, workers: Optional[int] = None, **options):
+        workers = min(workers or os.cpu_count() or 1, count)
+        self.count = count
+        self.blocks = [shared_memory.SharedMemory(create=True, size=size) for _, size in shapes(count)]
+        self.screens, self.ram, self.buttons = [
+            np.ndarray(shape, dtype=np.uint8, buffer=block.buf) for (shape, _), block in zip(shapes(count), self.blocks)
+        ]
+        self.buttons.fill(0)
+        names = [block.name for block in self.blocks]
+
+        context = multiprocessing.get_context()
+        self.connections = []
+        self.processes = []
+        bounds = [count * worker // workers for worker in range(workers + 1)]
+        for start, end in zip(bounds, bounds[1:]):
+            parent, child = context.Pipe()
+            process = context.Process(
+                target=run_worker, args=(child, names, count, start, end, rom, options), daemon=True
+            )
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+
+    def __len__(self):
+        return self.count
+
+    def command(self, command: bytes) -> None:
+        """sends a command to every worker, and waits for all of them to be done"""
+        for connection in self.connections:
+            connection.send_bytes(command)
+        for connection in self.connections:
+            connection.recv_bytes()
+
+    def step(self, buttons: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        runs a frame on every instance, with the given (count,) array of
+        pressed buttons or the previous ones, returns the screens
+        """
+        if buttons is not None:
+            self.buttons[:] = buttons
+        self.command(STEP)
+        return self.screens
+
+    def reset(self) -> None:
+        """restarts every instance from power on"""
+        self.command(RESET)
+        self.screens.fill(0xFF)
+        self.ram.fill(0)
+
+    def close(self) -> None:
+        if not self.processes:
+            return
+        self.command(QUIT)
+        for process in self.processes:
+            process.join()
+        self.processes = []
+        del self.screens, self.ram, self.buttons
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,92 @@
+# bits of the F register
+FLAG_Z = 0x80  # zero
+FLAG_N = 0x40  # subtract
+FLAG_H = 0x20  # half carry
+FLAG_C = 0x10  # carry
+
+FLAG_MASKS = {'z': FLAG_Z, 'n': FLAG_N, 'h': FLAG_H, 'c': FLAG_C}
+
+
+class Registers(object):
+    """
+    The CPU register file : the 8 bits registers are stored as attributes, and
+    the 16 bits pairs (AF, BC, DE, HL) are views over their 8 bits halves.
+
+    Registers can also be accessed by name, like a dict (``registers['HL']``),
+    in which case the value written is masked to the register's width. So
+    are the values written to the pairs. Writes to the other attributes (a
+    to l, sp, pc) are not, as they are the hot path of the CPU : callers
+    mask their values, which the CPU and the JIT tests check.
+    """
+    __slots__ = ('a', 'f', 'b', 'c', 'd', 'e', 'h', 'l', 'sp', 'pc')
+
+    names = ('A', 'F', 'B', 'C', 'D', 'E', 'H', 'L', 'AF', 'BC', 'DE', 'HL', 'SP', 'PC')
+    masks = {
+        'a': 0xFF, 'f': 0xF0, 'b': 0xFF, 'c': 0xFF, 'd': 0xFF, 'e': 0xFF, 'h': 0xFF, 'l': 0xFF,
+        'af': 0xFFF0, 'bc': 0xFFFF, 'de': 0xFFFF, 'hl': 0xFFFF, 'sp': 0xFFFF, 'pc': 0xFFFF,
+    }
+
+    def __init__(self):
+        self.a = self.f = self.b = self.c = self.d = self.e = self.h = self.l = 0
+        self.sp = self.pc = 0
+
+    @property
+    def af(self) -> int:
+        return (self.a << 8) | self.f
+
+    @af.setter
+    def af(self, value: int) -> None:
+        self.a = (value >> 8) & 0xFF
+        self.f = value & 0xF0
+
+    @property
+    def bc(self) -> int:
+        return (self.b << 8) | self.c
+
+    @bc.setter
+    def bc(self, value: int) -> None:
+        self.b = (value >> 8) & 0xFF
+        self.c = value & 0xFF
+
+    @property
+    def de(self) -> int:
+        return (self.d << 8) | self.e
+
+    @de.setter
+    def de(self, value: int) -> None:
+        self.d = (value >> 8) & 0xFF
+        self.e = value & 0xFF
+
+    @property
+    def hl(self) -> int:
+        return (self.h << 8) | self.l
+
+    @hl.setter
+    def hl(self, value: int) -> None:
+        self.h = (value >> 8) & 0xFF
+        self.l = value & 0xFF
+
+    def __getitem__(self, name: str) -> int:
+        return getattr(self, name.lower())
+
+    def __setitem__(self, name: str, value: int) -> None:
+        attribute = name.lower()
+        setattr(self, attribute, value & self.masks[attribute])
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.names
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def keys(self):
+        return list(self.names)
+
+    def items(self):
+        return [(name, self[name]) for name in self.names]
+
+    def __repr__(self):
+        return "Registers({})".format(", ".join("{}={:#06x}".format(name, value) for name, value in self.items()))
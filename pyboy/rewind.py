@@ -0,0 +1,124 @@
+"""
+Rewind : a ring buffer of the states recorded every few frames.
+
+States are serialized save states (see pyboy.state), which have the same
+length for a given cartridge. Every keyframe_interval-th record is a
+keyframe, stored whole; the records in between are stored as the XOR of the
+state with the previous one, which is mostly zeros. Both are compressed with
+zlib. Going back restores the nearest record at or before the requested
+frame : its keyframe, with the deltas up to it applied.
+
+When the records exceed max_bytes, the oldest keyframe is evicted along with
+the deltas depending on it.
+"""
+import zlib
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+import numpy as np
+
+from pyboy.state import State, restore, snapshot
+
+# zlib level : the deltas compress well even at the fastest one
+COMPRESSION_LEVEL = 1
+
+
+class Rewind(object):
+    """Records the states of a GameBoy, to go back in time"""
+
+    def __init__(self, gameboy, interval: int = 4, keyframe_interval: int = 16, max_bytes: int = 32 << 20):
+        if interval < 1 or keyframe_interval < 1:
+            raise ValueError("intervals must be positive")
+        self.gameboy = gameboy
+        self.interval = interval
+        self.keyframe_interval = keyframe_interval
+        self.max_bytes = max_bytes
+        # frames run since recording started
+        self.frames = 0
+        # (frame, keyframe, compressed state or delta)
+        self.records = deque()  # type: Deque[Tuple[int, bool, bytes]]
+        self.size = 0
+        # the last recorded state, to compute the next delta
+        self.previous = None  # type: Optional[np.ndarray]
+        self.since_keyframe = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.records)
+
+    def frame(self) -> None:
+        """counts a frame run, recording the state every interval frames"""
+        self.frames += 1
+        if self.frames % self.interval == 0:
+            self.record()
+
+    def record(self) -> None:
+        state = np.frombuffer(snapshot(self.gameboy).to_bytes(), dtype=np.uint8)
+        keyframe = self.previous is None or self.since_keyframe >= self.keyframe_interval - 1
+        if keyframe:
+            data = zlib.compress(state, COMPRESSION_LEVEL)
+            self.since_keyframe = 0
+        else:
+            data = zlib.compress(np.bitwise_xor(state, self.previous), COMPRESSION_LEVEL)
+            self.since_keyframe += 1
+        self.previous = state
+        self.records.append((self.frames, keyframe, data))
+        self.size += len(data)
+        self.evict()
+
+    def evict(self) -> None:
+        """drops the oldest keyframes and their deltas while over max_bytes"""
+        records = self.records
+        while self.size > self.max_bytes and len(records) > 1:
+            self.size -= len(records.popleft()[2])
+            while records and not records[0][1]:
+                self.size -= len(records.popleft()[2])
+            self.evictions += 1
+        if not records:
+            self.previous = None
+
+    def keyframe(self, index: int) -> int:
+        """returns the index of the keyframe of a record"""
+        while not self.records[index][1]:
+            index -= 1
+        return index
+
+    def state(self, index: int) -> np.ndarray:
+        """returns the state of a record, from its keyframe and deltas"""
+        start = self.keyframe(index)
+        state = np.frombuffer(zlib.decompress(self.records[start][2]), dtype=np.uint8).copy()
+        for position in range(start + 1, index + 1):
+            np.bitwise_xor(state, np.frombuffer(zlib.decompress(self.records[position][2]), dtype=np.uint8),
+                           out=state)
+        return state
+
+    def rewind(self, frames: int) -> int:
+        """
+        goes back at least the given number of frames, to the nearest record,
+        or to the oldest one. Records after it are dropped. Returns the frames
+        actually gone back, 0 if there is no record.
+        """
+        if not self.records:
+            return 0
+        target = self.frames - frames
+        index = len(self.records) - 1
+        while index > 0 and self.records[index][0] > target:
+            index -= 1
+        state = self.state(index)
+        restore(self.gameboy, State.from_bytes(state.tobytes()))
+        while len(self.records) > index + 1:
+            self.size -= len(self.records.pop()[2])
+        frame = self.records[index][0]
+        gone_back = self.frames - frame
+        self.frames = frame
+        self.previous = state
+        self.since_keyframe = index - self.keyframe(index)
+        return gone_back
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'records': len(self.records),
+            'keyframes': sum(1 for record in self.records if record[1]),
+            'bytes': self.size,
+            'evictions': self.evictions,
+        }
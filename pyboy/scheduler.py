@@ -0,0 +1,84 @@
+"""
+The event scheduler : a min-heap of callbacks keyed on the absolute cycle
+count at which they are due.
+
+Components schedule their own discrete events (a GPU mode change, a timer
+overflow) and derive everything else from the cycle counter when it is
+read, so the run loop only synchronizes with them on events : the cost per
+instruction does not depend on how many components there are.
+"""
+from heapq import heapify, heappop, heappush, heapreplace
+from itertools import count
+from typing import Callable, List, Optional
+
+# the cycle count of the next event when none is scheduled
+NEVER = 1 << 61
+
+# an event : [cycle, order of scheduling, callback or None once cancelled]
+Event = list
+
+
+class Scheduler(object):
+    """
+    The clock (cycles since power on) and the queue of events.
+
+    A callback is called with the cycle count its event was scheduled at.
+    It may return the cycle count of its next call, which is then scheduled
+    with the same event : for components with a single pending event, like
+    the GPU, it saves scheduling a new one.
+    """
+
+    def __init__(self):
+        self.cycles = 0
+        self.queue = []  # type: List[Event]
+        self.order = count()
+        self.next_event = NEVER
+
+    def schedule(self, cycle: int, callback: Callable[[int], Optional[int]]) -> Event:
+        """schedules a callback at the given cycle count, returns its event"""
+        event = [cycle, next(self.order), callback]
+        heappush(self.queue, event)
+        if cycle < self.next_event:
+            self.next_event = cycle
+        return event
+
+    @staticmethod
+    def cancel(event: Optional[Event]) -> None:
+        """
+        cancels an event : it stays in the queue, and is dropped when due
+        """
+        if event is not None:
+            event[2] = None
+
+    def run(self, cycles: int) -> int:
+        """
+        runs the events due at the given cycle count, in order, returns the
+        cycle count of the next one
+        """
+        queue = self.queue
+        order = self.order
+        while queue and queue[0][0] <= cycles:
+            event = queue[0]
+            callback = event[2]
+            cycle = None if callback is None else callback(event[0])
+            if queue[0] is not event:
+                # the callback scheduled an earlier event (rare)
+                queue.remove(event)
+                heapify(queue)
+                if cycle is not None:
+                    event[0] = cycle
+                    event[1] = next(order)
+                    heappush(queue, event)
+            elif cycle is None:
+                heappop(queue)
+            else:
+                # the callback's next event : the entry is reused, and sifted down from the top
+                event[0] = cycle
+                event[1] = next(order)
+                heapreplace(queue, event)
+        self.next_event = queue[0][0] if queue else NEVER
+        return self.next_event
+
+    def clear(self) -> None:
+        self.queue.clear()
+        self.next_event = NEVER
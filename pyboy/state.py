@@ -0,0 +1,166 @@
+"""
+Save states : snapshots of a GameBoy, restored by copying into its existing
+buffers and attributes rather than building new objects.
+
+A State holds the scalar state (registers, CPU flags, cycle counters, banks,
+GPU timing, joypad, timer, bank controller registers) as a tuple of ints and copies
+of the memory, cartridge RAM and framebuffer. Serialized, it is a versioned
+header followed by the scalars and the raw buffers.
+
+The ROM is not part of a state : it is restored on a GameBoy running the
+same cartridge. Caches derived from memory (decoded tiles, blocks in RAM)
+are invalidated on restore; blocks in ROM stay valid.
+"""
+import struct
+from typing import Optional, Tuple
+
+import numpy as np
+
+from pyboy.gpu import BGP, OBP0, OBP1, SCREEN_HEIGHT, SCREEN_WIDTH, palette
+
+MAGIC = b'PYBS'
+VERSION = 3
+
+# magic, version, scalar count, cartridge RAM size
+HEADER = struct.Struct('<4sHHI')
+MEMORY_SIZE = 0x10000
+FRAMEBUFFER_SIZE = SCREEN_HEIGHT * SCREEN_WIDTH
+
+# the scalars before the bank controller registers
+FIXED_SCALARS = 31
+
+
+class StateException(BaseException):
+    pass
+
+
+class State(object):
+    """
+    A snapshot of a GameBoy. The palettes decoded by the GPU are kept with
+    it, rather than decoded again from their registers on every restore.
+    """
+    __slots__ = ('scalars', 'mem', 'ram', 'framebuffer', 'palettes')
+
+    def __init__(self, scalars: Tuple[int, ...], mem: Optional[bytes], ram: Optional[bytes],
+                 framebuffer: np.ndarray, palettes: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None):
+        self.scalars = scalars
+        self.mem = mem
+        self.ram = ram
+        self.framebuffer = framebuffer
+        if palettes is None:
+            palettes = (palette(mem[BGP]), palette(mem[OBP0]), palette(mem[OBP1]))
+        self.palettes = palettes
+
+    def to_bytes(self) -> bytes:
+        if self.mem is None:
+            raise StateException("state without memory")
+        return b''.join([
+            HEADER.pack(MAGIC, VERSION, len(self.scalars), len(self.ram)),
+            struct.pack('<{}q'.format(len(self.scalars)), *self.scalars),
+            self.mem,
+            self.framebuffer.tobytes(),
+            self.ram,
+        ])
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'State':
+        if len(data) < HEADER.size:
+            raise StateException("state too short")
+        magic, version, scalar_count, ram_size = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise StateException("not a save state")
+        if version != VERSION:
+            raise StateException("save state version {} not supported (expected {})".format(version, VERSION))
+        offset = HEADER.size + scalar_count * 8
+        if len(data) != offset + MEMORY_SIZE + FRAMEBUFFER_SIZE + ram_size:
+            raise StateException("save state of {} bytes truncated or corrupted".format(len(data)))
+        scalars = struct.unpack_from('<{}q'.format(scalar_count), data, HEADER.size)
+        view = memoryview(data)
+        mem = bytes(view[offset:offset + MEMORY_SIZE])
+        offset += MEMORY_SIZE
+        framebuffer = np.frombuffer(data, dtype=np.uint8, count=FRAMEBUFFER_SIZE, offset=offset)
+        offset += FRAMEBUFFER_SIZE
+        return cls(scalars, mem, bytes(view[offset:]), framebuffer.reshape(SCREEN_HEIGHT, SCREEN_WIDTH).copy())
+
+
+def snapshot(gameboy, buffers: bool = True) -> State:
+    """
+    returns the state of a GameBoy. Without buffers, the memory and the
+    cartridge RAM are left out (see GameBoy.fork()).
+    """
+    cpu = gameboy.cpu
+    registers = cpu.registers
+    memory = gameboy.memory
+    gpu = gameboy.gpu
+    joypad = gameboy.joypad
+    timer = gameboy.timer
+    mbc = memory.mbc
+    scalars = (
+        registers.a, registers.f, registers.b, registers.c, registers.d, registers.e, registers.h, registers.l,
+        registers.sp, registers.pc,
+        cpu.stopped, cpu.halted, cpu.interrupts_enabled,
+        gameboy.cycles, gameboy.target_cycles,
+        memory.rom0_bank, memory.rom_bank,
+        gpu.mode, gpu.ly, gpu.window_line, gpu.next_event, gpu.frames,
+        gpu.screen_frame, gpu.frame_requested,
+        joypad.buttons, joypad.select,
+        timer.div_start, timer.tima, timer.tima_cycle, timer.tma, timer.tac,
+    )
+    if mbc is not None:
+        scalars += tuple(mbc.state())
+    return State(
+        tuple(map(int, scalars)),
+        memory.contents() if buffers else None,
+        (mbc.ram_contents() if mbc is not None else b'') if buffers else None,
+        gpu.framebuffer.copy(),
+        # palettes are replaced, never modified, by the GPU : they can be shared
+        (gpu.bg_palette,) + tuple(gpu.sprite_palettes),
+    )
+
+
+def restore(gameboy, state: State) -> None:
+    """restores a state returned by snapshot(), in place"""
+    cpu = gameboy.cpu
+    registers = cpu.registers
+    memory = gameboy.memory
+    gpu = gameboy.gpu
+    joypad = gameboy.joypad
+    timer = gameboy.timer
+    mbc = memory.mbc
+    scalars = state.scalars
+    if mbc is None:
+        matches = len(scalars) == FIXED_SCALARS and not state.ram
+    else:
+        matches = len(scalars) > FIXED_SCALARS and (state.ram is None or len(state.ram) == len(mbc.ram))
+    if not matches:
+        raise StateException("state of another cartridge")
+    # states do not keep DMA transfers : the current one ends, before the banks are switched
+    gameboy.dma.finish()
+
+    (registers.a, registers.f, registers.b, registers.c, registers.d, registers.e, registers.h, registers.l,
+     registers.sp, registers.pc) = scalars[:10]
+    cpu.stopped, cpu.halted, cpu.interrupts_enabled = map(bool, scalars[10:13])
+    gameboy.cycles, gameboy.target_cycles = scalars[13:15]
+    (gpu.mode, gpu.ly, gpu.window_line, gpu.next_event, gpu.frames,
+     gpu.screen_frame, frame_requested) = scalars[17:24]
+    gpu.frame_requested = bool(frame_requested)
+    # whether frames are rendered is configuration, kept by the GameBoy
+    gpu.select_rendering()
+    joypad.buttons, joypad.select = scalars[24:26]
+    timer.div_start, timer.tima, timer.tima_cycle, timer.tma, timer.tac = scalars[26:31]
+
+    if state.mem is not None:
+        memory.load(state.mem)
+    if mbc is not None:
+        if state.ram is not None:
+            mbc.load_ram(state.ram)
+        mbc.load_state(scalars[FIXED_SCALARS:])
+        memory.switch_rom0_bank(scalars[15])
+        memory.switch_rom_bank(scalars[16])
+    np.copyto(gpu.framebuffer, state.framebuffer)
+    gpu.bg_palette = state.palettes[0]
+    gpu.sprite_palettes = list(state.palettes[1:])
+    gpu.tile_cache.invalidate()
+    cpu.block_cache.invalidate_ram()
+    cpu.update_interrupts()
+    gameboy.reschedule()
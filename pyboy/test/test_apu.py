@@ -0,0 +1,158 @@
+import unittest
+from unittest import TestCase
+
+import numpy as np
+
+from pyboy.apu import (CLOCK, FRAME_CYCLES, NR10, NR12, NR13, NR14, NR21, NR22, NR23, NR24, NR30, NR32, NR33,
+                       NR34, NR42, NR43, NR44, NR50, NR51, NR52, SAMPLE_RATE, WAVE_RAM, lfsr)
+from pyboy.gameboy import GameBoy
+
+
+class TestAPU(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.gameboy = GameBoy(headless=True, audio=True)
+        self.memory = self.gameboy.memory
+        self.apu = self.gameboy.apu
+        # loop: JR loop
+        self.memory.write_block(0x100, [0x18, 0xFE])
+        self.memory[NR50] = 0x77
+        self.memory[NR51] = 0xFF
+        self.memory[NR10] = 0x00
+        self.memory[NR12] = 0x00  # the first channel's DAC is off
+
+    def play_square(self, frequency, length=None):
+        """plays the second channel at full volume, half duty"""
+        self.memory[NR21] = 0x80 | (0 if length is None else length)
+        self.memory[NR22] = 0xF0
+        self.memory[NR23] = frequency & 0xFF
+        self.memory[NR24] = 0x80 | (0 if length is None else 0x40) | frequency >> 8
+
+    def run_frames(self, frames):
+        for _ in range(frames):
+            self.gameboy.run_frame()
+        return self.gameboy.get_audio()
+
+    def test_disabled(self):
+        gameboy = GameBoy(headless=True)
+        self.assertIsNone(gameboy.apu)
+        # the sound registers are plain memory
+        self.assertIsNone(gameboy.memory.io_write_hooks[NR12 & 0xFF])
+        self.assertEqual(gameboy.get_audio().shape, (0, 2))
+        self.assertIsNotNone(GameBoy().apu)
+
+    def test_writes_recorded(self):
+        self.gameboy.run_cycles(100)
+        cycles = self.gameboy.cycles
+        self.memory[NR22] = 0xA3
+        self.assertEqual(self.apu.writes[-1], (cycles, NR22, 0xA3))
+        self.assertEqual(self.memory[NR22], 0xA3)
+        self.run_frames(1)
+        self.assertEqual(self.apu.writes, [])
+
+    def test_square(self):
+        # 131072 / (2048 - 1750) : 440 Hz
+        self.play_square(1750)
+        samples = self.run_frames(60)
+        self.assertEqual(samples.dtype, np.int16)
+        self.assertAlmostEqual(len(samples), SAMPLE_RATE * 60 * FRAME_CYCLES / CLOCK, delta=1)
+        left = samples[:, 0].astype(np.int32)
+        self.assertEqual(left.max(), 15 * 8 * 64)
+        spectrum = np.abs(np.fft.rfft(left))
+        frequency = spectrum[1:].argmax() * SAMPLE_RATE / len(left)
+        self.assertAlmostEqual(frequency, 131072 / (2048 - 1750), delta=2)
+        self.assertEqual(self.memory[NR52] & 0x0F, 0x02)
+
+    def test_length(self):
+        # (64 - 32) / 256 : an eighth of a second
+        self.play_square(1750, length=32)
+        self.assertEqual(self.memory[NR52] & 0x02, 0x02)
+        samples = self.run_frames(30)
+        self.assertEqual(self.memory[NR52] & 0x02, 0)
+        end = SAMPLE_RATE // 8
+        self.assertTrue(samples[end - 200:end, 0].any())
+        self.assertFalse(samples[end + 10:].any())
+
+    def test_envelope(self):
+        # decreasing by 1 every 1/64 second
+        self.play_square(1750)
+        self.memory[NR22] = 0xF1
+        self.memory[NR24] = 0x80 | 1750 >> 8
+        samples = self.run_frames(30)
+        step = SAMPLE_RATE // 64
+        self.assertEqual(np.abs(samples[:step - 10, 0]).max(), 15 * 8 * 64)
+        self.assertEqual(np.abs(samples[step + 10:2 * step - 10, 0]).max(), 14 * 8 * 64)
+        self.assertFalse(samples[16 * step + 10:].any())
+
+    def test_panning(self):
+        self.play_square(1750)
+        self.memory[NR51] = 0x20  # second channel on the left only
+        self.memory[NR50] = 0x30
+        samples = self.run_frames(2)
+        self.assertEqual(np.abs(samples[:, 0]).max(), 15 * 4 * 64)
+        self.assertFalse(samples[:, 1].any())
+
+    def test_power_off(self):
+        self.play_square(1750)
+        self.memory[NR52] = 0x00
+        self.assertEqual(self.memory[NR52], 0x70)
+        self.assertFalse(self.run_frames(2).any())
+
+    def test_powered_off_writes(self):
+        self.memory[NR52] = 0x00
+        self.assertEqual(self.memory[NR22], 0x00)
+        writes = len(self.apu.writes)
+        # NR10-NR51 ignore writes, the wave RAM does not
+        self.play_square(1750)
+        self.memory[NR50] = 0x77
+        self.memory[WAVE_RAM] = 0x12
+        self.assertEqual((self.memory[NR22], self.memory[NR24], self.memory[NR50]), (0, 0, 0))
+        self.assertEqual(self.memory[WAVE_RAM], 0x12)
+        self.assertEqual(len(self.apu.writes), writes + 1)
+        self.assertFalse(self.apu.channels[1].on)
+        # powered on again, nothing was kept : the channel stays silent
+        self.memory[NR52] = 0x80
+        self.memory[NR50] = 0x77
+        self.memory[NR51] = 0xFF
+        self.assertFalse(self.run_frames(2).any())
+        self.assertFalse(self.apu.channels[1].on)
+
+    def test_wave_and_noise(self):
+        self.memory.write_block(WAVE_RAM, bytes([0x0F] * 16))
+        self.memory[NR30] = 0x80
+        self.memory[NR32] = 0x20
+        self.memory[NR33] = 0x00
+        self.memory[NR34] = 0x87
+        self.memory[NR42] = 0xF0
+        self.memory[NR43] = 0x08
+        self.memory[NR44] = 0x80
+        self.assertEqual(self.memory[NR52] & 0x0F, 0x0C)
+        samples = self.run_frames(2)
+        self.assertTrue(samples.any())
+        self.assertEqual(len(lfsr(7)), 127)
+        self.assertEqual(len(lfsr(15)), 32767)
+
+    def test_sweep(self):
+        # up by frequency >> 1 every 1/128 second : overflows after 2 steps
+        self.memory[NR10] = 0x11
+        self.memory[NR12] = 0xF0
+        self.memory[NR13] = 0x00
+        self.memory[NR14] = 0x80 | 0x04
+        self.gameboy.run_cycles(40000)
+        self.assertEqual(self.memory[NR52] & 0x01, 0x01)
+        self.assertEqual(self.apu.channels[0].frequency, 0x600)
+        self.gameboy.run_cycles(30000)
+        self.assertEqual(self.memory[NR52] & 0x01, 0)
+
+    def test_state(self):
+        self.play_square(1750)
+        state = self.gameboy.save_state()
+        first = self.run_frames(2)
+        self.gameboy.load_state(state)
+        self.assertEqual(self.gameboy.get_audio().shape, (0, 2))
+        second = self.run_frames(2)
+        self.assertEqual(len(first), len(second))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import unittest
+from unittest import TestCase
+
+import numpy as np
+
+from pyboy.batch import GameBoyBatch
+from pyboy.joypad import DOWN, LEFT, RIGHT, UP
+from pyboy.test.test_cartridge import write_rom
+
+# LD A,0x20 / LDH (0x00),A : select the directions
+# loop: LDH A,(0x00) / LD (0xC000),A / JR loop
+PROGRAM = [0x3E, 0x20, 0xE0, 0x00, 0xF0, 0x00, 0xEA, 0x00, 0xC0, 0x18, 0xF9]
+
+
+class TestGameBoyBatch(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.path = write_rom(2, {0x100 + offset: byte for offset, byte in enumerate(PROGRAM)})
+        self.batch = GameBoyBatch(self.path, 4, jit_threshold=1)
+
+    def tearDown(self):
+        self.batch.close()
+        os.remove(self.path)
+        super().tearDown()
+
+    def test_step(self):
+        screens = self.batch.step(np.array([0, RIGHT, LEFT | UP, DOWN], dtype=np.uint8))
+        self.assertEqual(screens.shape, (4, 144, 160))
+        self.assertEqual(screens.dtype, np.uint8)
+        self.assertEqual([gameboy.memory[0xC000] & 0x0F for gameboy in self.batch],
+                         [0x0F, 0x0E, 0x09, 0x07])
+        self.assertEqual([gameboy.gpu.frames for gameboy in self.batch], [1] * 4)
+        # the same buttons, until given new ones
+        self.assertIs(self.batch.step(), screens)
+        self.assertEqual(self.batch[1].memory[0xC000] & 0x0F, 0x0E)
+
+    def test_shared(self):
+        self.batch.step()
+        first, second = self.batch[0], self.batch[1]
+        for index, gameboy in enumerate(self.batch):
+            self.assertTrue(np.shares_memory(gameboy.gpu.framebuffer, self.batch.screens[index]))
+        self.assertIs(first.cartridge, second.cartridge)
+        self.assertIs(first.memory.read_pages[0x01], second.memory.read_pages[0x01])
+        self.assertIs(first.cpu.instructions, second.cpu.instructions)
+        first_blocks = first.cpu.block_cache.blocks
+        second_blocks = second.cpu.block_cache.blocks
+        self.assertTrue(first_blocks)
+        for key, block in first_blocks.items():
+            self.assertTrue(hasattr(block.run, 'source'))
+            self.assertIs(block.run.__code__, second_blocks[key].run.__code__)
+
+    def test_script(self):
+        inputs = np.zeros((3, 4), dtype=np.uint8)
+        inputs[:, 1] = [RIGHT, LEFT, 0]
+        inputs[:, 3] = DOWN
+        self.batch.script(inputs)
+        self.batch.run(2)
+        self.assertEqual([gameboy.joypad.buttons for gameboy in self.batch], [0, LEFT, 0, DOWN])
+        self.assertEqual(self.batch[3].memory[0xC000] & 0x0F, 0x07)
+        self.batch.run(2)
+        self.assertEqual([gameboy.joypad.buttons for gameboy in self.batch], [0, 0, 0, DOWN])
+
+    def test_lockstep(self):
+        frames = []
+        for index, gameboy in enumerate(self.batch):
+            def run_frame(index=index, run_frame=gameboy.run_frame):
+                frames.append(index)
+                run_frame()
+            gameboy.run_frame = run_frame
+        self.batch.run(3)
+        # every instance runs a frame before any runs the next
+        self.assertEqual(frames, [0, 1, 2, 3] * 3)
+        self.assertEqual([gameboy.gpu.frames for gameboy in self.batch], [3] * 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+from unittest import TestCase
+from pyboy.gameboy import GameBoy
+from pyboy.instruction import WAITING
+
+
+class TestBlockCache(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.gameboy = GameBoy(use_block_cache=True)
+        self.cpu = self.gameboy.cpu
+        self.cache = self.cpu.block_cache
+
+    def write_to_mem(self, data, address=0x100):
+        for offset, byte in enumerate(data):
+            self.gameboy.memory[address + offset] = byte
+
+    def test_block(self):
+        # loop: INC A
+        #       LD B,0x12
+        #       LD (0xC000),A
+        #       JR loop
+        self.write_to_mem([0x3C, 0x06, 0x12, 0xEA, 0x00, 0xC0, 0x18, 0xF8])
+        self.cpu.registers['A'] = 0
+        self.assertEqual(self.cache.exec_block(), 4 + 8 + 16 + 12)
+        self.assertEqual(self.cpu.registers['PC'], 0x100)
+        self.assertEqual(self.cpu.registers['B'], 0x12)
+        self.assertEqual(self.gameboy.memory[0xC000], 1)
+        self.cache.exec_block()
+        self.assertEqual(self.gameboy.memory[0xC000], 2)
+        stats = self.cache.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['average_length'], 4)
+
+    def test_same_result_as_interpreter(self):
+        # LD HL,0xC100 / LD B,0x10 / loop: LDI (HL),A / INC A / DEC B / JR NZ,loop / HALT
+        program = [0x21, 0x00, 0xC1, 0x06, 0x10, 0x22, 0x3C, 0x05, 0x20, 0xFB, 0x76]
+        interpreter = GameBoy()
+        for gameboy in (self.gameboy, interpreter):
+            for offset, byte in enumerate(program):
+                gameboy.memory[0x100 + offset] = byte
+            gameboy.run_cycles(2000)
+        self.assertTrue(self.cpu.halted)
+        self.assertEqual(self.cpu.registers.items(), interpreter.cpu.registers.items())
+        self.assertEqual(bytes(self.gameboy.memory.wram), bytes(interpreter.memory.wram))
+
+    def test_idle_loop(self):
+        # wait: LDH A,(0x44) / CP 0x90 / JR NZ,wait
+        self.write_to_mem([0xF0, 0x44, 0xFE, 0x90, 0x20, 0xFA])
+        # LDH A,(0x44) / INC A / JR NZ : A is not only tested
+        self.write_to_mem([0xF0, 0x44, 0x3C, 0x20, 0xFB], 0x200)
+        # LD A,(0xFF41) / AND 0x03 / JP NZ,0x0300 : STAT, with a JP
+        self.write_to_mem([0xFA, 0x41, 0xFF, 0xE6, 0x03, 0xC2, 0x00, 0x03], 0x300)
+        # LDH A,(0x80) / CP 0x90 / JR NZ : HRAM can be written by the program
+        self.write_to_mem([0xF0, 0x80, 0xFE, 0x90, 0x20, 0xFA], 0x400)
+        self.cpu.registers.a = 0
+        for address, idle in ((0x100, True), (0x200, False), (0x300, True), (0x400, False)):
+            self.cpu.registers.pc = address
+            cycles = self.cache.exec_block()
+            self.assertEqual(self.cache.blocks[self.cache.key(address)].idle, idle)
+            self.assertEqual(cycles >= WAITING, idle)
+
+    def test_idle_loop_exit(self):
+        # wait:  LDH A,(0x44) / CP 0x90 / JR NZ,wait
+        #        INC B
+        # wait2: LDH A,(0x44) / CP 0x90 / JR Z,wait2
+        #        JR wait
+        program = [0xF0, 0x44, 0xFE, 0x90, 0x20, 0xFA, 0x04, 0xF0, 0x44, 0xFE, 0x90, 0x28, 0xFA, 0x18, 0xF1]
+        self.write_to_mem(program)
+        interpreter = GameBoy()
+        interpreter.memory.write_block(0x100, program)
+        for gameboy in (self.gameboy, interpreter):
+            gameboy.cpu.registers.b = 0
+            for _ in range(3):
+                gameboy.run_frame()
+        # one increment per frame, on line 144
+        self.assertEqual(self.cpu.registers.b, interpreter.cpu.registers.b)
+        self.assertEqual(self.cpu.registers.b, 3)
+        # an iteration per GPU event, rather than thousands per frame
+        self.assertLess(self.cache.hits + self.cache.misses, 3 * 154 * 4)
+
+    def test_invalidation(self):
+        # code in work RAM: LD A,0x01 / RET
+        self.write_to_mem([0x3E, 0x01, 0xC9], 0xC000)
+        self.cpu.registers['PC'] = 0xC000
+        self.cache.exec_block()
+        self.assertEqual(self.cpu.registers['A'], 1)
+        self.gameboy.memory[0xC001] = 0x02
+        self.assertEqual(self.cache.invalidations, 1)
+        self.cpu.registers['PC'] = 0xC000
+        self.cache.exec_block()
+        self.assertEqual(self.cpu.registers['A'], 2)
+        # through echo RAM
+        self.gameboy.memory[0xE001] = 0x03
+        self.cpu.registers['PC'] = 0xC000
+        self.cache.exec_block()
+        self.assertEqual(self.cpu.registers['A'], 3)
+
+    def test_clear(self):
+        self.write_to_mem([0x3E, 0x01, 0xC9], 0xC000)
+        self.cpu.registers['PC'] = 0xC000
+        self.cache.exec_block()
+        self.cache.clear()
+        self.assertEqual(self.cache.stats()['blocks'], 0)
+        self.assertFalse(self.gameboy.memory.hooked(0xC000, 0xC100))
+
+if __name__ == "__main__":
+    unittest.main()
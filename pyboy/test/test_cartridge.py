@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+from unittest import TestCase
+from pyboy.cartridge import BANK_SIZE, Cartridge
+from pyboy.gameboy import GameBoy
+
+
+def write_rom(bank_count, header=None):
+    """writes a ROM where each bank is filled with its number, returns its path"""
+    rom = bytearray()
+    for bank in range(bank_count):
+        rom += bytes([bank]) * BANK_SIZE
+    for address, value in (header or {}).items():
+        rom[address] = value
+    handle, path = tempfile.mkstemp(suffix=".gb")
+    with os.fdopen(handle, 'wb') as rom_file:
+        rom_file.write(rom)
+    return path
+
+
+class TestCartridge(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.path = write_rom(4, {0x134: ord('T'), 0x135: ord('E'), 0x147: 0x01})
+        self.gameboy = GameBoy()
+        self.gameboy.load_rom(self.path)
+
+    def tearDown(self):
+        self.gameboy.cartridge.close()
+        os.remove(self.path)
+        super().tearDown()
+
+    def test_header(self):
+        self.assertEqual(self.gameboy.cartridge.title, "TE")
+        self.assertEqual(self.gameboy.cartridge.cartridge_type, 0x01)
+        self.assertEqual(self.gameboy.cartridge.bank_count, 4)
+
+    def test_bank_switching(self):
+        memory = self.gameboy.memory
+        self.assertEqual(memory[0x0000], 0)
+        self.assertEqual(memory[0x4000], 1)
+        memory.switch_rom_bank(3)
+        self.assertEqual(memory[0x4000], 3)
+        self.assertEqual(memory[0x7FFF], 3)
+        memory.switch_rom_bank(2)
+        self.assertEqual(memory[0x5000], 2)
+
+    def test_zero_copy(self):
+        memory = self.gameboy.memory
+        memory.switch_rom_bank(3)
+        self.assertIs(memory.romx.obj, self.gameboy.cartridge.mmap)
+        self.assertIs(memory.rom0.obj, self.gameboy.cartridge.mmap)
+        self.assertTrue(memory.romx.readonly)
+        self.assertIs(self.gameboy.cartridge.bank(3), memory.romx)
+
+    def test_rom_is_read_only(self):
+        self.gameboy.memory[0x4000] = 0xFF
+        self.assertEqual(self.gameboy.memory[0x4000], 1)
+
+    def test_invalid_size(self):
+        handle, path = tempfile.mkstemp(suffix=".gb")
+        with os.fdopen(handle, 'wb') as rom_file:
+            rom_file.write(b'\x00' * 100)
+        with self.assertRaises(ValueError):
+            Cartridge(path)
+        os.remove(path)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,200 @@
+import os
+import unittest
+from unittest import TestCase
+
+from pyboy.cow import Snapshot, allocate
+from pyboy.cpu import LazyHandler
+from pyboy.dma import BUSY_READ_PAGE, BUSY_WRITE_PAGE, DMA_CYCLES
+from pyboy.gameboy import GameBoy
+from pyboy.test.test_cartridge import write_rom
+from pyboy.test.test_state import PROGRAM
+
+
+class TestSnapshot(TestCase):
+    def test_pages(self):
+        buffer = allocate(0x1000)
+        buffer[0x123] = 0x12
+        snapshot = Snapshot(bytes(buffer))
+        buffer[0x123] = 0x34
+        self.assertEqual(len(snapshot), 0x1000)
+        self.assertEqual(len(snapshot.pages), 0x10)
+        self.assertEqual(snapshot.pages[0x01][0x23], 0x12)
+        with self.assertRaises(TypeError):
+            snapshot.pages[0x01][0x23] = 0x56
+
+    def test_empty(self):
+        self.assertEqual(Snapshot(bytes(allocate(0))).pages, [])
+
+
+class TestFork(TestCase):
+    def setUp(self):
+        super().setUp()
+        rom = {0x100 + offset: byte for offset, byte in enumerate(PROGRAM)}
+        rom.update({0x147: 0x03, 0x149: 0x02})  # MBC1, 8 KiB of RAM
+        self.path = write_rom(8, rom)
+        self.gameboy = GameBoy(jit_threshold=2, frame_skip=1)
+        self.gameboy.load_rom(self.path)
+        self.gameboy.memory[0x0000] = 0x0A  # enable RAM
+        self.gameboy.memory[0x2000] = 0x03
+        self.gameboy.memory[0xA000] = 0x42
+        # tile 0, drawn all over the background
+        self.gameboy.memory.write_block(0x8000, b'\xFF\x00' * 8)
+        self.gameboy.run_cycles(23456)
+
+    def tearDown(self):
+        self.gameboy.cartridge.close()
+        os.remove(self.path)
+        super().tearDown()
+
+    def observe(self, gameboy):
+        return (gameboy.cpu.registers.items(), gameboy.memory.contents(), gameboy.memory.mbc.ram_contents(),
+                gameboy.cycles, gameboy.gpu.ly, gameboy.gpu.mode, gameboy.gpu.frames,
+                gameboy.memory[0x4000], gameboy.memory[0xA000], gameboy.get_screen().tobytes())
+
+    def test_fork(self):
+        fork = self.gameboy.fork()
+        self.assertIs(fork.cartridge, self.gameboy.cartridge)
+        self.assertEqual(fork.gpu.frame_interval, 2)
+        self.assertEqual(self.observe(fork), self.observe(self.gameboy))
+        for _ in range(2):
+            self.gameboy.run_frame()
+            fork.run_frame()
+            self.assertEqual(self.observe(fork), self.observe(self.gameboy))
+
+    def test_headless(self):
+        gameboy = GameBoy(headless=True)
+        fork = gameboy.fork()
+        self.assertTrue(fork.headless)
+        self.assertEqual(fork.gpu.frame_interval, 0)
+        self.assertFalse(fork.gpu.rendering)
+        self.assertIsNone(fork.apu)
+
+    def test_independent(self):
+        first = self.gameboy.fork()
+        second = self.gameboy.fork()
+        first.memory[0xD123] = 0x01
+        first.memory[0xA000] = 0x02
+        self.gameboy.memory[0xD123] = 0x03
+        self.assertEqual(second.memory[0xD123], 0x00)
+        self.assertEqual(second.memory[0xA000], 0x42)
+        self.assertEqual(self.gameboy.memory[0xA000], 0x42)
+        self.assertEqual(first.memory[0xD123], 0x01)
+        # forks of a fork
+        third = first.fork()
+        self.assertEqual((third.memory[0xD123], third.memory[0xA000]), (0x01, 0x02))
+
+    def test_shared_snapshot(self):
+        mbc = self.gameboy.memory.mbc
+        first = self.gameboy.fork()
+        snapshot = mbc.frozen
+        self.assertIs(first.memory.mbc.shared, snapshot)
+        self.gameboy.fork()
+        self.assertIs(mbc.frozen, snapshot)
+        # the fork reads the pages of the snapshot until it writes them
+        self.assertIs(first.memory.read_pages[0xA0], snapshot.pages[0])
+        # a fork of a fork not written yet shares the same snapshot
+        self.assertIs(first.fork().memory.mbc.shared, snapshot)
+        self.gameboy.memory[0xA001] = 0x01
+        self.assertIsNone(mbc.frozen)
+        self.gameboy.fork()
+        self.assertIsNot(mbc.frozen, snapshot)
+
+    def test_copy_on_write(self):
+        fork = self.gameboy.fork()
+        mbc = fork.memory.mbc
+        shared = mbc.shared_pages
+        fork.memory[0xA001] = 0x24
+        self.assertEqual(mbc.shared_pages, shared - 1)
+        self.assertEqual((fork.memory[0xA000], fork.memory[0xA001]), (0x42, 0x24))
+        self.assertEqual(self.gameboy.memory[0xA001], 0x00)
+        self.assertIsNone(mbc.frozen)
+        # the written page is mapped in place
+        self.assertIs(fork.memory.write_pages[0xA0], mbc.ram_pages[0])
+        self.assertEqual(fork.memory.mbc.ram_contents()[:2], b'\x42\x24')
+        # a state restored overwrites the shared pages
+        fork.load_state(self.gameboy.save_state())
+        self.assertIsNone(mbc.shared)
+        self.assertEqual(self.observe(fork), self.observe(self.gameboy))
+
+    def test_shared_ram(self):
+        memory = self.gameboy.memory
+        first = self.gameboy.fork().memory
+        second = self.gameboy.fork().memory
+        snapshot = first.shared
+        self.assertIs(second.shared, snapshot)
+        self.assertIs(memory.frozen, snapshot)
+        # the video RAM pages, then the work RAM ones
+        self.assertIs(first.read_pages[0x80], snapshot.pages[0])
+        self.assertIs(first.read_pages[0xC1], snapshot.pages[0x21])
+        self.assertIs(first.read_pages[0xE1], snapshot.pages[0x21])
+        self.assertEqual(first[0xC100], memory[0xC100])
+        self.assertEqual(first[0x8000], 0xFF)
+
+        first[0xE123] = 0x42  # echo of 0xC123
+        self.assertEqual((first[0xC123], first[0xE123]), (0x42, 0x42))
+        self.assertIs(first.read_pages[0xC1], first.buffer_pages[0xC1])
+        self.assertIs(first.write_pages[0xE1], first.buffer_pages[0xC1])
+        self.assertEqual(len(first.shared_pages), 0x3F)
+        self.assertNotEqual(second[0xC123], 0x42)
+        self.assertNotEqual(memory[0xC123], 0x42)
+        # the snapshot is reused while the RAM is unchanged
+        self.assertIs(self.gameboy.fork().memory.shared, snapshot)
+        memory[0xD000] = 0x01
+        self.assertIsNot(self.gameboy.fork().memory.shared, snapshot)
+        # a block read in place is copied first
+        self.assertEqual(bytes(second.read_block(0x8000, 2)), b'\xFF\x00')
+        self.assertNotIn(0x80, second.shared_pages)
+
+    def test_blocks_in_shared_ram(self):
+        self.gameboy.memory.write_block(0xC000, [0x3C, 0x18, 0xFD])  # loop: INC A / JR loop
+        fork = self.gameboy.fork()
+        cpu = fork.cpu
+        cpu.interrupts_enabled = False
+        cpu.registers.pc = 0xC000
+        cpu.registers.a = 0x00
+        for _ in range(4):
+            cpu.block_cache.exec_block()
+        self.assertEqual(cpu.registers.a, 0x04)
+        self.assertIn(0xC000, cpu.block_cache.blocks)
+        # the first write copies the page and drops its blocks
+        fork.memory[0xC000] = 0x3D  # DEC A
+        self.assertNotIn(0xC000, cpu.block_cache.blocks)
+        self.assertNotIn(0xC0, fork.memory.shared_pages)
+        for _ in range(4):
+            cpu.block_cache.exec_block()
+        self.assertEqual(cpu.registers.a, 0x00)
+        self.assertEqual(self.gameboy.memory[0xC000], 0x3C)
+
+    def test_fork_during_dma(self):
+        memory = self.gameboy.memory
+        memory[0xFF46] = 0xC1  # OAM DMA from the work RAM
+        self.assertTrue(self.gameboy.dma.active)
+        fork = self.gameboy.fork()
+        # the pages the CPU cannot access stay unmapped until the end of the transfer
+        self.assertIs(memory.read_pages[0xA0], BUSY_READ_PAGE)
+        self.assertIs(memory.write_pages[0xBF], BUSY_WRITE_PAGE)
+        self.assertIs(memory.read_pages[0xC1], BUSY_READ_PAGE)
+        self.assertEqual(memory[0xA000], 0xFF)
+        self.gameboy.scheduler.run(self.gameboy.cycles + DMA_CYCLES)
+        self.assertFalse(self.gameboy.dma.active)
+        self.assertEqual(memory[0xA000], 0x42)
+        self.assertEqual(bytes(memory.oam), bytes(memory.read_block(0xC100, 0xA0)))
+        # the fork starts after the transfer
+        self.assertEqual(fork.memory[0xA000], 0x42)
+        self.assertEqual(bytes(fork.memory.oam), bytes(memory.oam))
+        memory[0xA000] = 0x24
+        self.assertEqual(fork.memory[0xA000], 0x42)
+
+    def test_lazy_handlers(self):
+        fork = self.gameboy.fork()
+        dispatch = fork.cpu.dispatch
+        self.assertIsInstance(dispatch[0x3C], LazyHandler)
+        fork.cpu.registers.a = 0x01
+        fork.cpu.exec(0x3C)  # INC A
+        self.assertEqual(fork.cpu.registers.a, 0x02)
+        self.assertNotIsInstance(dispatch[0x3C], LazyHandler)
+        # only the instructions run are compiled
+        self.assertTrue(any(isinstance(handler, LazyHandler) for handler in dispatch))
+
+if __name__ == '__main__':
+    unittest.main()
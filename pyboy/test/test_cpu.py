@@ -2,6 +2,7 @@ import unittest
 from unittest import TestCase
 from pyboy.cpu import CPU
 from pyboy.memory import Memory
+from pyboy.registers import FLAG_C, FLAG_H, FLAG_N, FLAG_Z
 
 
 class TestCPU(TestCase):
@@ -16,6 +17,25 @@ class TestCPU(TestCase):
             self.cpu.registers["PC"] += 1
         self.cpu.registers["PC"] = 0x100
 
+    def test_registers_in_range(self):
+        # register attributes are not masked : every instruction must mask what it writes
+        registers = self.cpu.registers
+        programs = [[opcode, operand, operand] for opcode in range(0x100) if opcode != 0xCB
+                    for operand in (0x00, 0xFF)]
+        programs += [[0xCB, opcode] for opcode in range(0x100)]
+        for program in programs:
+            for fill in (0x00, 0xFF):
+                self.mem.write_block(0xC000, program)
+                for name in ('a', 'b', 'c', 'd', 'e', 'h', 'l'):
+                    setattr(registers, name, fill)
+                registers.f = fill & 0xF0
+                registers.sp = fill * 0x101
+                registers.pc = 0xC000
+                self.cpu.halted = False
+                self.cpu.exec_next()
+                for name, mask in registers.masks.items():
+                    self.assertEqual(registers[name] & ~mask, 0, "{} after {}".format(name, program))
+
     def test_exec_load(self):
         self._test_load_to_reg()
 
@@ -30,8 +50,162 @@ class TestCPU(TestCase):
         self.assertEqual(self.cpu.get_next_byte(), 0xFE)
         self.assertEqual(self.cpu.get_next_byte(), 0xFF)
 
+    def test_dispatch(self):
+        self.assertEqual(len(self.cpu.dispatch), 0x100)
+        self.assertEqual(len(self.cpu.dispatch_cb), 0x100)
+
+    def test_exec_load_c_deref(self):
+        # LD (C),A
+        # LD A,(C)
+        data = [0xE2, 0xF2]
+        self.write_to_mem(data)
+        self.cpu.registers['A'] = 0x42
+        self.cpu.registers['C'] = 0x80
+        self.cpu.exec_next()
+        self.assertEqual(self.mem[0xFF80], 0x42)
+        self.cpu.registers['A'] = 0
+        self.cpu.exec_next()
+        self.assertEqual(self.cpu.registers['A'], 0x42)
+
     def test_signed(self):
         self.assertEquals(CPU.signed(0xFF), -1)
+        self.assertEqual(CPU.signed(0x80), -128)
+        self.assertEqual(CPU.signed(0x7F), 127)
+
+    def test_cycles(self):
+        # LD A,0xFF
+        # LD (0xFFFE),A
+        # NOP
+        data = [0x3E, 0xFF, 0xEA, 0xFE, 0xFF, 0x00]
+        self.write_to_mem(data)
+        self.assertEqual([self.cpu.exec_next() for _ in range(3)], [8, 16, 4])
+
+    def test_exec_alu(self):
+        # ADD A,B
+        # SUB 0x10
+        # CP A
+        # ADC A,0xFF
+        data = [0x80, 0xD6, 0x10, 0xBF, 0xCE, 0xFF]
+        self.write_to_mem(data)
+        self.cpu.registers['A'] = 0x0F
+        self.cpu.registers['B'] = 0x01
+        self.cpu.exec_next()
+        self.assertEqual(self.cpu.registers['A'], 0x10)
+        self.assertEqual(self.cpu.registers['F'], FLAG_H)
+        self.cpu.exec_next()
+        self.assertEqual(self.cpu.registers['A'], 0x00)
+        self.assertEqual(self.cpu.registers['F'], FLAG_Z | FLAG_N)
+        self.cpu.registers['A'] = 0x01
+        self.cpu.exec_next()
+        self.assertEqual(self.cpu.registers['A'], 0x01)
+        self.assertEqual(self.cpu.registers['F'], FLAG_Z | FLAG_N)
+        self.cpu.registers['F'] = FLAG_C
+        self.cpu.exec_next()
+        self.assertEqual(self.cpu.registers['A'], 0x01)
+        self.assertEqual(self.cpu.registers['F'], FLAG_H | FLAG_C)
+
+    def test_alu_flags(self):
+        # XOR A / ADD A,0x80 / ADD A,0x80 / JR NZ,0x10 / JR Z,0x10
+        data = [0xAF, 0xC6, 0x80, 0xC6, 0x80, 0x20, 0x10, 0x28, 0x10]
+        self.write_to_mem(data)
+        for _ in range(4):
+            self.cpu.exec_next()
+        self.assertEqual(self.cpu.registers['PC'], 0x107)
+        self.assertEqual(self.cpu.registers['F'], FLAG_Z | FLAG_C)
+        self.cpu.exec_next()
+        self.assertEqual(self.cpu.registers['PC'], 0x119)
+
+    def test_exec_inc_dec(self):
+        # INC B
+        # DEC C
+        # INC HL
+        # DEC (HL)
+        data = [0x04, 0x0D, 0x23, 0x35]
+        self.write_to_mem(data)
+        self.cpu.registers['F'] = FLAG_C
+        self.cpu.registers['B'] = 0xFF
+        self.cpu.registers['C'] = 0x10
+        self.cpu.registers['HL'] = 0xC0FF
+        self.cpu.exec_next()
+        self.assertEqual(self.cpu.registers['B'], 0x00)
+        self.assertEqual(self.cpu.registers['F'], FLAG_Z | FLAG_H | FLAG_C)
+        self.cpu.exec_next()
+        self.assertEqual(self.cpu.registers['C'], 0x0F)
+        self.assertEqual(self.cpu.registers['F'], FLAG_N | FLAG_H | FLAG_C)
+        self.cpu.exec_next()
+        self.assertEqual(self.cpu.registers['HL'], 0xC100)
+        self.mem[0xC100] = 0x01
+        self.assertEqual(self.cpu.exec_next(), 12)
+        self.assertEqual(self.mem[0xC100], 0x00)
+        self.assertEqual(self.cpu.registers['F'], FLAG_Z | FLAG_N | FLAG_C)
+
+    def test_exec_conditional_jumps(self):
+        # JP NZ,0x0110
+        # JR Z,-4
+        data = [0xC2, 0x10, 0x01, 0x28, 0xFC]
+        self.write_to_mem(data)
+        self.cpu.registers['F'] = FLAG_Z
+        self.assertEqual(self.cpu.exec_next(), 12)
+        self.assertEqual(self.cpu.registers['PC'], 0x103)
+        self.assertEqual(self.cpu.exec_next(), 12)
+        self.assertEqual(self.cpu.registers['PC'], 0x101)
+        self.cpu.registers['PC'] = 0x100
+        self.cpu.registers['F'] = 0
+        self.assertEqual(self.cpu.exec_next(), 16)
+        self.assertEqual(self.cpu.registers['PC'], 0x110)
+
+    def test_exec_call_ret(self):
+        # CALL 0x0110
+        # ...
+        # PUSH BC
+        # POP AF
+        # RET NC
+        data = [0xCD, 0x10, 0x01] + [0x00] * 13 + [0xC5, 0xF1, 0xD0]
+        self.write_to_mem(data)
+        self.cpu.registers['BC'] = 0x12FF
+        self.assertEqual(self.cpu.exec_next(), 24)
+        self.assertEqual(self.cpu.registers['PC'], 0x110)
+        self.assertEqual(self.cpu.registers['SP'], 0xFFFC)
+        self.assertEqual(self.cpu.exec_next(), 16)
+        self.assertEqual(self.cpu.exec_next(), 12)
+        self.assertEqual(self.cpu.registers['AF'], 0x12F0)
+        self.assertEqual(self.cpu.exec_next(), 8)
+        self.cpu.registers['PC'] = 0x112
+        self.cpu.registers['F'] = 0
+        self.assertEqual(self.cpu.exec_next(), 20)
+        self.assertEqual(self.cpu.registers['PC'], 0x103)
+        self.assertEqual(self.cpu.registers['SP'], 0xFFFE)
+
+    def test_exec_prefix_cb(self):
+        # SWAP A
+        # BIT 7,A
+        # SET 7,(HL)
+        # RL B
+        data = [0xCB, 0x37, 0xCB, 0x7F, 0xCB, 0xFE, 0xCB, 0x10]
+        self.write_to_mem(data)
+        self.cpu.registers['A'] = 0x1F
+        self.cpu.registers['HL'] = 0xC000
+        self.cpu.registers['B'] = 0x80
+        self.assertEqual(self.cpu.exec_next(), 8)
+        self.assertEqual(self.cpu.registers['A'], 0xF1)
+        self.cpu.exec_next()
+        self.assertEqual(self.cpu.registers['F'], FLAG_H)
+        self.assertEqual(self.cpu.exec_next(), 16)
+        self.assertEqual(self.mem[0xC000], 0x80)
+        self.cpu.exec_next()
+        self.assertEqual(self.cpu.registers['B'], 0x00)
+        self.assertEqual(self.cpu.registers['F'], FLAG_Z | FLAG_C)
+
+    def test_exec_daa(self):
+        # ADD A,B
+        # DAA
+        data = [0x80, 0x27]
+        self.write_to_mem(data)
+        self.cpu.registers['A'] = 0x19
+        self.cpu.registers['B'] = 0x28
+        self.cpu.exec_next()
+        self.cpu.exec_next()
+        self.assertEqual(self.cpu.registers['A'], 0x47)
 
     def _test_load_to_reg(self):
         # LD A,0xFF
@@ -0,0 +1,87 @@
+import unittest
+from unittest import TestCase
+
+from pyboy.dma import DMA_CYCLES, DMA_REGISTER
+from pyboy.gameboy import GameBoy
+
+
+class TestDMA(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.gameboy = GameBoy()
+        self.memory = self.gameboy.memory
+        self.dma = self.gameboy.dma
+        self.source = bytes(range(0x20, 0x20 + 0xA0))
+        self.memory.write_block(0xC100, self.source)
+
+    def test_copy(self):
+        self.memory[DMA_REGISTER] = 0xC1
+        self.assertEqual(bytes(self.memory.oam), self.source)
+        self.assertEqual(self.memory[DMA_REGISTER], 0xC1)
+        # from the echo of the work RAM
+        self.dma.finish()
+        self.memory.write_block(0xC200, bytes(0xA0))
+        self.memory[DMA_REGISTER] = 0xE2
+        self.assertEqual(bytes(self.memory.oam), bytes(0xA0))
+
+    def test_restrictions(self):
+        self.memory[0xFF80] = 0x12
+        # the CPU waits in high RAM : loop: JR loop
+        self.memory.write_block(0xFF90, [0x18, 0xFE])
+        self.gameboy.cpu.registers.pc = 0xFF90
+        self.memory[DMA_REGISTER] = 0xC1
+        self.assertTrue(self.dma.active)
+        # only the high RAM and the IO registers can be accessed
+        self.assertEqual(self.memory[0xC100], 0xFF)
+        self.assertEqual(self.memory[0xFE00], 0xFF)
+        self.memory[0xC100] = 0x00
+        self.memory[0xFF81] = 0x34
+        self.assertEqual(self.memory[0xFF80], 0x12)
+        self.assertEqual(self.memory[0xFF81], 0x34)
+        self.gameboy.run_cycles(DMA_CYCLES - 8)
+        self.assertTrue(self.dma.active)
+        self.gameboy.run_cycles(8)
+        self.assertFalse(self.dma.active)
+        self.assertEqual(self.memory[0xC100], 0x20)
+        self.assertEqual(self.memory[0xFE00], 0x20)
+
+    def test_hram_routine(self):
+        # the usual routine, copied to HRAM :
+        # LD A,0xC1 / LDH (0x46),A / LD A,40 / wait: DEC A / JR NZ,wait / LD B,A / LD A,(0xC100) / HALT
+        routine = [0x3E, 0xC1, 0xE0, 0x46, 0x3E, 0x28, 0x3D, 0x20, 0xFD, 0x47, 0xFA, 0x00, 0xC1, 0x76]
+        self.memory.write_block(0xFF80, routine)
+        self.gameboy.cpu.registers.pc = 0xFF80
+        self.gameboy.run_cycles(2000)
+        self.assertEqual(bytes(self.memory.oam), self.source)
+        self.assertEqual(self.gameboy.cpu.registers.a, 0x20)
+
+    def test_block_cache(self):
+        gameboy = GameBoy(use_block_cache=True)
+        cache = gameboy.cpu.block_cache
+        # LD A,0x42 / HALT
+        gameboy.memory.write_block(0xC000, [0x3E, 0x42, 0x76])
+        gameboy.memory[DMA_REGISTER] = 0xC1
+        gameboy.cpu.registers.sp = 0xFFFE
+        gameboy.cpu.registers.pc = 0xC000
+        # the CPU reads 0xFF (RST 0x38) : no block is built from it
+        cache.exec_block()
+        self.assertEqual(gameboy.cpu.registers.pc, 0x38)
+        self.assertEqual(len(cache.blocks), 0)
+        gameboy.dma.finish()
+        gameboy.cpu.registers.pc = 0xC000
+        cache.exec_block()
+        self.assertEqual(gameboy.cpu.registers.a, 0x42)
+        self.assertEqual(len(cache.blocks), 1)
+
+    def test_state(self):
+        state = self.gameboy.save_state()
+        self.memory[DMA_REGISTER] = 0xC1
+        self.gameboy.load_state(state)
+        self.assertFalse(self.dma.active)
+        self.assertEqual(self.memory[0xC100], 0x20)
+        self.memory[0xC100] = 0x01
+        self.assertEqual(self.memory[0xC100], 0x01)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+from unittest import TestCase
+from pyboy.gameboy import CYCLES_PER_FRAME, GameBoy
+from pyboy.joypad import A, LEFT, START
+
+
+class TestGameBoy(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.gameboy = GameBoy()
+
+    def write_to_mem(self, data, address=0x100):
+        for offset, byte in enumerate(data):
+            self.gameboy.memory[address + offset] = byte
+
+    def test_run_cycles(self):
+        # loop: INC A
+        #       JR loop
+        self.write_to_mem([0x3C, 0x18, 0xFD])
+        self.gameboy.cpu.registers['A'] = 0
+        self.assertEqual(self.gameboy.run_cycles(160), 160)
+        self.assertEqual(self.gameboy.cpu.registers['A'], 10)
+        # INC A is 4 cycles, JR 12 : a budget of 10 overruns by 6
+        self.assertEqual(self.gameboy.run_cycles(10), 16)
+        self.assertEqual(self.gameboy.run_cycles(10), 4)
+        self.assertEqual(self.gameboy.cycles, 180)
+
+    def test_event_scheduled_before_limit(self):
+        # NOPs up to cycle 84, then TMA=0x40 / TIMA=0xFC / TAC=5 (16 cycles per step) / LD HL,0xC000
+        # loop: LDH A,(TIMA) / LDI (HL),A / JR loop
+        program = [0x3E, 0x40, 0xE0, 0x06, 0x3E, 0xFC, 0xE0, 0x05, 0x3E, 0x05, 0xE0, 0x07,
+                   0x21, 0x00, 0xC0, 0xF0, 0x05, 0x22, 0x18, 0xFB]
+        self.write_to_mem([0x00] * 21 + program)
+        self.gameboy.memory[0xFF0F] = 0
+        self.gameboy.run_cycles(84)
+        self.assertGreater(self.gameboy.scheduler.next_event, 84 + 120)
+        # the overflow, scheduled by the write to TAC, is due before that GPU event
+        self.gameboy.run_cycles(150)
+        values = bytes(self.gameboy.memory.wram[:3])
+        self.assertGreaterEqual(values[0], 0xFC)
+        # TIMA reloads TMA when it overflows, never reads below it
+        self.assertTrue(all(value >= 0x40 for value in values), values)
+        self.assertLess(values[-1], 0xFC)
+        self.assertEqual(self.gameboy.memory[0xFF0F] & 0x04, 0x04)
+
+    def test_run_frame(self):
+        self.write_to_mem([0x3C, 0x18, 0xFD])
+        self.gameboy.run_frame()
+        self.assertGreaterEqual(self.gameboy.cycles, CYCLES_PER_FRAME)
+        self.assertLess(self.gameboy.cycles, CYCLES_PER_FRAME + 24)
+
+    def test_halt(self):
+        # HALT
+        self.write_to_mem([0x76])
+        self.gameboy.run_cycles(100)
+        self.assertTrue(self.gameboy.cpu.halted)
+        self.assertEqual(self.gameboy.cpu.registers['PC'], 0x101)
+
+    def test_halt_fast_forward(self):
+        # HALT
+        self.write_to_mem([0x76])
+        executed = []
+        exec_next = self.gameboy.cpu.exec_next
+
+        def count():
+            executed.append(self.gameboy.cycles)
+            return exec_next()
+        self.gameboy.cpu.exec_next = count
+        self.assertEqual(self.gameboy.run_cycles(1000), 1000)
+        self.assertEqual(self.gameboy.run_cycles(1002), 1004)
+        self.assertEqual(self.gameboy.cycles, 2004)
+        # one call per GPU event, not one per 4 cycles
+        self.assertLess(len(executed), 20)
+        self.assertEqual(self.gameboy.gpu.ly, 4)
+
+    def test_joypad(self):
+        memory = self.gameboy.memory
+        self.gameboy.joypad.buttons = START | A | LEFT
+        memory[0xFF00] = 0x10  # buttons
+        self.assertEqual(memory[0xFF00], 0xD6)
+        memory[0xFF00] = 0x20  # directions
+        self.assertEqual(memory[0xFF00], 0xED)
+        memory[0xFF00] = 0x30
+        self.assertEqual(memory[0xFF00], 0xFF)
+
+    def write_screen(self, gameboy):
+        # tile 1 is black, and fills the background map
+        gameboy.memory.write_block(0x8010, [0xFF] * 16)
+        gameboy.memory.write_block(0x9800, [0x01] * 0x400)
+        gameboy.memory[0xFF47] = 0xE4
+
+    def test_headless(self):
+        gameboy = GameBoy(headless=True)
+        self.write_screen(gameboy)
+        lines = []
+        gameboy.gpu.render_line = lines.append
+        gameboy.memory[0xFF0F] = 0
+        gameboy.run_frame()
+        # timing and interrupts go on, but nothing is rendered
+        self.assertEqual(gameboy.gpu.frames, 1)
+        self.assertEqual(gameboy.memory[0xFF0F] & 0x01, 0x01)
+        self.assertEqual(lines, [])
+        del gameboy.gpu.render_line
+        self.assertEqual(gameboy.get_screen()[0][0], 0x00)
+
+    def test_frame_skip(self):
+        gameboy = GameBoy(frame_skip=2)
+        rendered = []
+        render_line = gameboy.gpu.render_line
+
+        def record(ly):
+            if ly == 0:
+                rendered.append(gameboy.gpu.frames)
+            render_line(ly)
+        gameboy.gpu.render_line = record
+        for _ in range(7):
+            gameboy.run_frame()
+        self.assertEqual(rendered, [0, 3, 6])
+        # frame 6 is rendered, and returned as is
+        self.write_screen(gameboy)
+        self.assertEqual(gameboy.get_screen()[0][0], 0xFF)
+        gameboy.gpu.request_frame()
+        gameboy.run_frame()
+        self.assertEqual(rendered, [0, 3, 6, 7])
+        self.assertEqual(gameboy.get_screen()[0][0], 0x00)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+import unittest
+from unittest import TestCase
+from pyboy.gameboy import GameBoy
+from pyboy.gpu import (BGP, IF, LCDC, LY, LYC, MODE_HBLANK, MODE_OAM_SCAN, MODE_TRANSFER, MODE_VBLANK, OBP0,
+                       SCX, STAT, WX, WY, LINE_CYCLES)
+
+WHITE, LIGHT, DARK, BLACK = 0xFF, 0xAA, 0x55, 0x00
+
+
+class TestGPU(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.gameboy = GameBoy()
+        self.memory = self.gameboy.memory
+        self.gpu = self.gameboy.gpu
+        # identity palettes : color n is shade n
+        self.memory[BGP] = 0xE4
+        self.memory[OBP0] = 0xE4
+
+    def write_tile(self, address, color_rows):
+        """writes a tile from 8 rows of 8 color numbers"""
+        for row, colors in enumerate(color_rows):
+            low = high = 0
+            for color in colors:
+                low = low << 1 | (color & 1)
+                high = high << 1 | (color >> 1)
+            self.memory[address + row * 2] = low
+            self.memory[address + row * 2 + 1] = high
+
+    def test_modes(self):
+        gpu = self.gpu
+        self.assertEqual(gpu.mode, MODE_OAM_SCAN)
+        gpu.update(80)
+        self.assertEqual(gpu.mode, MODE_TRANSFER)
+        self.assertEqual(self.memory[STAT] & 0x03, MODE_TRANSFER)
+        gpu.update(80 + 172)
+        self.assertEqual(gpu.mode, MODE_HBLANK)
+        gpu.update(LINE_CYCLES)
+        self.assertEqual(gpu.mode, MODE_OAM_SCAN)
+        self.assertEqual(self.memory[LY], 1)
+        self.memory[IF] = 0
+        gpu.update(144 * LINE_CYCLES)
+        self.assertEqual(gpu.mode, MODE_VBLANK)
+        self.assertEqual(self.memory[LY], 144)
+        self.assertEqual(self.memory[IF] & 0x01, 0x01)
+        self.assertEqual(gpu.frames, 1)
+        gpu.update(154 * LINE_CYCLES)
+        self.assertEqual(self.memory[LY], 0)
+        self.assertEqual(gpu.mode, MODE_OAM_SCAN)
+
+    def test_lyc(self):
+        self.memory[LYC] = 3
+        self.memory[STAT] = 0x40
+        self.memory[IF] = 0
+        self.gpu.update(2 * LINE_CYCLES)
+        self.assertEqual(self.memory[STAT] & 0x04, 0)
+        self.assertEqual(self.memory[IF] & 0x02, 0)
+        self.gpu.update(3 * LINE_CYCLES)
+        self.assertEqual(self.memory[STAT] & 0x04, 0x04)
+        self.assertEqual(self.memory[IF] & 0x02, 0x02)
+
+    def test_run_frame(self):
+        self.gameboy.run_frame()
+        self.assertEqual(self.gpu.frames, 1)
+        self.assertEqual(self.memory[LY], 0)
+
+    def test_background(self):
+        # tile 1 : color 3 on the first column, 1 elsewhere
+        self.write_tile(0x8010, [[3, 1, 1, 1, 1, 1, 1, 1]] * 8)
+        self.memory[LCDC] = 0x91  # unsigned tile data, map at 0x9800
+        self.memory[0x9800] = 1
+        self.memory[0x9801] = 1
+        self.gpu.render_line(0)
+        row = self.gpu.framebuffer[0]
+        self.assertEqual(list(row[:9]), [BLACK] + [LIGHT] * 7 + [BLACK])
+        self.assertEqual(row[16], WHITE)
+        self.memory[SCX] = 1
+        self.gpu.render_line(0)
+        self.assertEqual(list(row[:8]), [LIGHT] * 7 + [BLACK])
+        # palette
+        self.memory[BGP] = 0x1B
+        self.gpu.render_line(0)
+        self.assertEqual(row[7], WHITE)
+        self.assertEqual(row[0], DARK)
+
+    def test_signed_tile_data(self):
+        # tile -1 is at 0x8FF0 when tile data is at 0x8800-0x97FF
+        self.write_tile(0x8FF0, [[2] * 8] * 8)
+        self.memory[LCDC] = 0x81
+        self.memory[0x9800] = 0xFF
+        self.gpu.render_line(0)
+        self.assertEqual(list(self.gpu.framebuffer[0][:9]), [DARK] * 8 + [WHITE])
+
+    def test_window(self):
+        self.write_tile(0x8010, [[3] * 8] * 8)
+        self.memory[0x9C00] = 1
+        self.memory[LCDC] = 0xF1  # window on, window map at 0x9C00
+        self.memory[WY] = 2
+        self.memory[WX] = 7 + 100
+        self.gpu.render_line(1)
+        self.assertEqual(self.gpu.framebuffer[1][100], WHITE)
+        self.gpu.render_line(2)
+        self.assertEqual(list(self.gpu.framebuffer[2][99:109]), [WHITE] + [BLACK] * 8 + [WHITE])
+        self.assertEqual(self.gpu.window_line, 1)
+
+    def test_sprites(self):
+        # tile 2 : color 1 on the first column, transparent elsewhere
+        self.write_tile(0x8020, [[1, 0, 0, 0, 0, 0, 0, 0]] * 8)
+        self.memory[LCDC] = 0x93
+        # sprite 0 at (10, 0), sprite 1 flipped at (20, 0) with the second palette
+        for index, (y, x, tile, attributes) in enumerate([(16, 18, 2, 0x00), (16, 28, 2, 0x30)]):
+            for offset, value in enumerate((y, x, tile, attributes)):
+                self.memory[0xFE00 + index * 4 + offset] = value
+        self.memory[0xFF49] = 0xFF
+        self.gpu.render_line(0)
+        row = self.gpu.framebuffer[0]
+        self.assertEqual(row[10], LIGHT)
+        self.assertEqual(row[11], WHITE)
+        self.assertEqual(row[27], BLACK)
+        self.assertEqual(row[26], WHITE)
+        # below the sprite
+        self.gpu.render_line(8)
+        self.assertEqual(self.gpu.framebuffer[8][10], WHITE)
+
+    def test_sprite_priority(self):
+        self.write_tile(0x8020, [[1] * 8] * 8)
+        self.write_tile(0x8030, [[2] * 8] * 8)
+        self.memory[LCDC] = 0x93
+        # overlapping sprites : the one with the lowest x is on top
+        for index, (x, tile) in enumerate([(12, 2), (8, 3)]):
+            for offset, value in enumerate((16, x, tile, 0)):
+                self.memory[0xFE00 + index * 4 + offset] = value
+        self.gpu.render_line(0)
+        row = self.gpu.framebuffer[0]
+        self.assertEqual(list(row[:12]), [DARK] * 8 + [LIGHT] * 4)
+        # behind the background : only drawn over color 0
+        self.write_tile(0x8010, [[0, 3, 0, 3, 0, 3, 0, 3]] * 8)
+        self.memory[0x9800] = 1
+        self.memory[0xFE07] = 0x80
+        self.gpu.render_line(0)
+        self.assertEqual(list(row[:4]), [DARK, BLACK, DARK, BLACK])
+
+    def test_sprites_per_line(self):
+        self.write_tile(0x8020, [[1] * 8] * 8)
+        self.memory[LCDC] = 0x93
+        # 11 sprites on the line : the last one in OAM is not drawn, even with the lowest x
+        for index in range(11):
+            x = 8 + (10 - index) * 8
+            for offset, value in enumerate((16, x, 2, 0)):
+                self.memory[0xFE00 + index * 4 + offset] = value
+        self.gpu.render_line(0)
+        row = self.gpu.framebuffer[0]
+        self.assertEqual(row[0], WHITE)
+        self.assertEqual(list(row[8:88]), [LIGHT] * 80)
+
+
+if __name__ == '__main__':
+    unittest.main()
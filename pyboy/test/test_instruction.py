@@ -0,0 +1,44 @@
+import unittest
+from unittest import TestCase
+from pyboy.cpu import CPU
+from pyboy.instruction import FlagAction
+from pyboy.instructiontable import INSTRUCTION_TABLE
+from pyboy.memory import Memory
+
+
+class TestInstructionTable(TestCase):
+    def test_shared(self):
+        first = CPU(Memory())
+        second = CPU(Memory())
+        self.assertIs(first.instructions, INSTRUCTION_TABLE)
+        self.assertIs(second.instructions, INSTRUCTION_TABLE)
+
+    def test_immutable(self):
+        table = INSTRUCTION_TABLE.tables['default']
+        instruction = table[0x80]
+        with self.assertRaises(AttributeError):
+            instruction.cycles = 0
+        with self.assertRaises(AttributeError):
+            instruction.args[0].register = "B"
+        with self.assertRaises(TypeError):
+            instruction.flags['c'] = FlagAction.RESET
+        with self.assertRaises(TypeError):
+            table[0x80] = table[0x00]
+
+    def test_flags_per_entry(self):
+        table = INSTRUCTION_TABLE.tables['default']
+        # ADD A,B and INC B were built from the same dict
+        self.assertEqual(table[0x80].flags['c'], FlagAction.AFFECTED)
+        self.assertEqual(table[0x04].flags['c'], FlagAction.NOT_AFFECTED)
+
+    def test_length(self):
+        table = INSTRUCTION_TABLE.tables['default']
+        self.assertEqual(table[0x00].length, 1)
+        self.assertEqual(table[0x06].length, 2)
+        self.assertEqual(table[0xC3].length, 3)
+        self.assertEqual(table[0xCB].length, 2)
+        self.assertEqual(table[0x10].length, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+from unittest import TestCase
+
+from pyboy.cpu import IE, IF
+from pyboy.gameboy import GameBoy
+from pyboy.timer import DIV, TAC, TIMA, TMA
+
+VBLANK, STAT, TIMER = 0x01, 0x02, 0x04
+
+
+class TestInterrupts(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.gameboy = GameBoy()
+        self.memory = self.gameboy.memory
+        self.cpu = self.gameboy.cpu
+        self.registers = self.cpu.registers
+        self.memory[IE] = 0
+        self.memory[IF] = 0
+        for vector in (0x40, 0x48, 0x50, 0x58, 0x60):
+            # LD A,vector / LDI (HL),A / RETI : records the order of the handlers
+            self.memory.write_block(vector, [0x3E, vector, 0x22, 0xD9])
+        self.registers.hl = 0xC000
+        # loop: JR loop
+        self.memory.write_block(0x100, [0x18, 0xFE])
+
+    def handled(self, count):
+        return list(self.memory.wram[:count])
+
+    def test_priority(self):
+        self.memory[IE] = VBLANK | STAT | TIMER
+        self.memory[IF] = TIMER | STAT | VBLANK
+        self.assertEqual(self.cpu.pending, VBLANK | STAT | TIMER)
+        self.gameboy.run_cycles(200)
+        self.assertEqual(self.handled(4), [0x40, 0x48, 0x50, 0x00])
+        self.assertEqual(self.memory[IF] & 0x1F, 0)
+        self.assertEqual(self.cpu.pending, 0)
+        self.assertEqual(self.registers.pc, 0x100)
+        self.assertEqual(self.registers.sp, 0xFFFE)
+
+    def test_disabled(self):
+        self.memory[IF] = VBLANK | TIMER
+        self.memory[IE] = TIMER
+        self.cpu.interrupts_enabled = False
+        self.cpu.update_interrupts()
+        self.gameboy.run_cycles(100)
+        self.assertEqual(self.handled(1), [0])
+        # RETI enables the interrupts, only the timer one is enabled in IE
+        self.registers.pc = 0x58
+        self.gameboy.run_cycles(100)
+        self.assertEqual(self.handled(3), [0x58, 0x50, 0])
+        self.assertEqual(self.memory[IF] & 0x1F, VBLANK)
+
+    def test_ei_delay(self):
+        # EI / INC B / INC B / loop: JR loop
+        self.memory.write_block(0x100, [0xFB, 0x04, 0x04, 0x18, 0xFE])
+        self.cpu.interrupts_enabled = False
+        self.memory.write_block(0x40, [0x78, 0xEA, 0x00, 0xC0, 0xD9])  # LD A,B / LD (0xC000),A / RETI
+        self.registers.b = 0
+        self.memory[IE] = VBLANK
+        self.memory[IF] = VBLANK
+        self.gameboy.run_cycles(100)
+        # the interrupt came after the instruction following EI
+        self.assertEqual(self.handled(1), [1])
+        self.assertEqual(self.registers.b, 2)
+
+    def test_halt_wakeup(self):
+        # HALT / INC B / loop: JR loop
+        self.memory.write_block(0x100, [0x76, 0x04, 0x18, 0xFE])
+        self.registers.b = 0
+        self.cpu.interrupts_enabled = False
+        self.memory[IE] = TIMER
+        self.memory[DIV] = 0
+        self.memory[TIMA] = 0xFF
+        self.memory[TAC] = 0x04  # overflows in 1024 cycles
+        self.gameboy.run_cycles(1000)
+        self.assertTrue(self.cpu.halted)
+        self.gameboy.run_cycles(100)
+        # with IME reset, HALT ends without calling the handler
+        self.assertFalse(self.cpu.halted)
+        self.assertEqual(self.registers.b, 1)
+        self.assertEqual(self.handled(1), [0])
+
+    def test_gpu_and_timer(self):
+        # EI / loop: HALT / JR loop
+        self.memory.write_block(0x100, [0xFB, 0x76, 0x18, 0xFD])
+        self.memory.write_block(0x40, [0x04, 0xD9])  # INC B / RETI
+        self.memory.write_block(0x50, [0x0C, 0xD9])  # INC C / RETI
+        self.registers.b = self.registers.c = 0
+        self.memory[DIV] = 0
+        self.memory[TMA] = 0
+        self.memory[TIMA] = 0
+        self.memory[TAC] = 0x05  # overflows every 4096 cycles
+        self.memory[IE] = VBLANK | TIMER
+        self.gameboy.run_cycles(4096 * 30 + 100)
+        self.assertEqual(self.registers.c, 30)
+        self.assertEqual(self.registers.b, self.gameboy.gpu.frames)
+
+    def test_block_cache(self):
+        gameboy = GameBoy(use_block_cache=True)
+        gameboy.memory.write_block(0x100, [0xFB, 0x76, 0x18, 0xFD])
+        gameboy.memory.write_block(0x40, [0x04, 0xD9])
+        gameboy.cpu.registers.b = 0
+        gameboy.memory[IE] = VBLANK
+        for _ in range(3):
+            gameboy.run_frame()
+        self.assertEqual(gameboy.cpu.registers.b, gameboy.gpu.frames)
+        self.assertGreater(gameboy.cpu.registers.b, 0)
+
+    def test_state(self):
+        self.memory[IE] = VBLANK
+        self.memory[IF] = VBLANK
+        self.cpu.interrupts_enabled = False
+        self.cpu.update_interrupts()
+        state = self.gameboy.save_state()
+        self.cpu.interrupts_enabled = True
+        self.cpu.update_interrupts()
+        self.assertEqual(self.cpu.pending, VBLANK)
+        self.gameboy.load_state(state)
+        self.assertEqual(self.cpu.pending, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
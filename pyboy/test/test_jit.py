@@ -0,0 +1,145 @@
+import random
+import unittest
+from unittest import TestCase
+from pyboy import jit
+from pyboy.gameboy import GameBoy
+
+# straight-line instructions for the random programs : register and (HL)
+# operations leaving H alone, so (HL) stays in the work RAM
+FUZZ_OPCODES = (
+    [op for op in range(0x40, 0xC0) if not 0x60 <= op < 0x68 and op != 0x76] +
+    [0x04, 0x05, 0x0C, 0x0D, 0x14, 0x15, 0x1C, 0x1D, 0x2C, 0x2D, 0x34, 0x35, 0x3C, 0x3D,
+     0x03, 0x0B, 0x13, 0x1B, 0x07, 0x0F, 0x17, 0x1F, 0x2F, 0x37, 0x3F, 0x00, 0x0A, 0x1A]
+)
+FUZZ_IMMEDIATE_OPCODES = [0x06, 0x0E, 0x16, 0x1E, 0x2E, 0x3E, 0x36, 0xC6, 0xCE, 0xD6, 0xDE, 0xE6, 0xEE, 0xF6, 0xFE]
+# RES and SET, but of H
+FUZZ_CB_OPCODES = [op for op in range(0x80, 0x100) if op & 0x07 != 0x04]
+# balanced pushes and pops through AF : PUSH AF / POP AF, PUSH AF / POP DE, PUSH BC / POP AF
+FUZZ_STACK_SEQUENCES = ([0xF5, 0xF1], [0xF5, 0xD1], [0xC5, 0xF1])
+
+
+class TestJIT(TestCase):
+    """Runs the same programs through the interpreter and the JIT and compares the results"""
+
+    def run_both(self, program, registers=None, wram=b"", cycles=20000):
+        interpreter = GameBoy()
+        jit = GameBoy(jit_threshold=1)
+        for gameboy in (interpreter, jit):
+            for offset, byte in enumerate(program):
+                gameboy.memory[0x100 + offset] = byte
+            gameboy.memory.write_block(0xC000, wram)
+            for name, value in (registers or {}).items():
+                gameboy.cpu.registers[name] = value
+            gameboy.run_cycles(cycles)
+        self.assertTrue(interpreter.cpu.halted)
+        self.assertTrue(jit.cpu.halted)
+        self.assertEqual(jit.cpu.registers.items(), interpreter.cpu.registers.items())
+        # compiled blocks mask the registers they write, as the interpreter does
+        for name, mask in jit.cpu.registers.masks.items():
+            self.assertEqual(getattr(jit.cpu.registers, name) & ~mask, 0, name)
+        self.assertEqual(bytes(jit.memory.wram), bytes(interpreter.memory.wram))
+        self.assertEqual(bytes(jit.memory.hram), bytes(interpreter.memory.hram))
+        return jit
+
+    def test_copy_loop(self):
+        # LD HL,0xC000 / LD DE,0xC100 / LD B,0x20
+        # loop: LDI A,(HL) / LD (DE),A / INC DE / DEC B / JR NZ,loop / HALT
+        program = [0x21, 0x00, 0xC0, 0x11, 0x00, 0xC1, 0x06, 0x20,
+                   0x2A, 0x12, 0x13, 0x05, 0x20, 0xFA, 0x76]
+        jit = self.run_both(program, wram=bytes(range(0x20, 0x40)))
+        self.assertEqual(bytes(jit.memory.wram[0x100:0x120]), bytes(range(0x20, 0x40)))
+        self.assertGreater(jit.cpu.block_cache.compiled, 0)
+
+    def test_adc_checksum(self):
+        # LD HL,0xC000 / LD B,0x40 / XOR A / LD C,A
+        # loop: ADD A,(HL) / LD D,A / LD A,C / ADC A,0 / LD C,A / LD A,D / INC HL / DEC B / JR NZ,loop / HALT
+        program = [0x21, 0x00, 0xC0, 0x06, 0x40, 0xAF, 0x4F,
+                   0x86, 0x57, 0x79, 0xCE, 0x00, 0x4F, 0x7A, 0x23, 0x05, 0x20, 0xF5, 0x76]
+        jit = self.run_both(program, wram=bytes((byte * 37) & 0xFF for byte in range(0x40)))
+        total = sum((byte * 37) & 0xFF for byte in range(0x40))
+        self.assertEqual(jit.cpu.registers['C'] << 8 | jit.cpu.registers['A'], total)
+
+    def test_call_ret(self):
+        # LD SP,0xD000 / LD B,0x10
+        # loop: CALL sub / DEC B / JR NZ,loop / HALT
+        # sub: INC C / SCF / CCF / RET NC / HALT
+        program = [0x31, 0x00, 0xD0, 0x06, 0x10, 0xCD, 0x0E, 0x01, 0x05, 0x20, 0xFA, 0x76, 0x00, 0x00,
+                   0x0C, 0x37, 0x3F, 0xD0, 0x76]
+        jit = self.run_both(program, registers={'C': 0})
+        self.assertEqual(jit.cpu.registers['C'], 0x10)
+        self.assertEqual(jit.cpu.registers['PC'], 0x10C)
+
+    def test_push_pop(self):
+        # LD SP,0xD000 / LD BC,0x1234
+        # loop: PUSH BC / POP AF / PUSH AF / POP DE / INC BC / LD A,E / CP 0x80 / JR NZ,loop / HALT
+        program = [0x31, 0x00, 0xD0, 0x01, 0x34, 0x12,
+                   0xC5, 0xF1, 0xF5, 0xD1, 0x03, 0x7B, 0xFE, 0x80, 0x20, 0xF6, 0x76]
+        jit = self.run_both(program, cycles=100000)
+        self.assertEqual(jit.cpu.registers['E'], 0x80)
+
+    def test_push_af_pending_flags(self):
+        # LD SP,0xD000 / LD B,5
+        # loop: LD A,0x0F / ADD A,1 / PUSH AF / POP DE / DEC B / JR NZ,loop / HALT
+        program = [0x31, 0x00, 0xD0, 0x06, 0x05,
+                   0x3E, 0x0F, 0xC6, 0x01, 0xF5, 0xD1, 0x05, 0x20, 0xF7, 0x76]
+        jit = self.run_both(program)
+        # H from ADD, not N from the DEC of the previous iteration
+        self.assertEqual(jit.cpu.registers['E'], 0x20)
+
+    def test_res_set_jp_hl(self):
+        # LD HL,0xC010 / LD B,0x08
+        # loop: SET 0,(HL) / RES 7,(HL) / SET 3,C / INC L / DEC B / JR NZ,loop
+        # LD HL,0x0117 / JP HL / 0x0117: HALT
+        program = [0x21, 0x10, 0xC0, 0x06, 0x08,
+                   0xCB, 0xC6, 0xCB, 0xBE, 0xCB, 0xD9, 0x2C, 0x05, 0x20, 0xF6,
+                   0x21, 0x17, 0x01, 0xE9, 0x00, 0x00, 0x00, 0x00, 0x76]
+        jit = self.run_both(program, wram=b"\x00" * 0x10 + b"\xF0" * 0x10)
+        self.assertEqual(bytes(jit.memory.wram[0x10:0x18]), b"\x71" * 8)
+
+    def test_unsupported_block(self):
+        # loop: ADD A,0x19 / DAA / DEC B / JR NZ,loop / HALT
+        program = [0xC6, 0x19, 0x27, 0x05, 0x20, 0xFA, 0x76]
+        jit = self.run_both(program, registers={'A': 0, 'B': 0x10})
+        self.assertGreater(jit.cpu.block_cache.not_compiled, 0)
+
+    def test_code_cache_bound(self):
+        size = jit.CODE_CACHE_SIZE
+        jit.CODE_CACHE_SIZE = 4
+        try:
+            gameboy = GameBoy(jit_threshold=1)
+            cache = gameboy.cpu.block_cache
+            # code in work RAM rewritten 10 times : LD A,n / RET
+            for value in range(10):
+                gameboy.memory.write_block(0xC000, [0x3E, value, 0xC9])
+                gameboy.cpu.registers.pc = 0xC000
+                cache.exec_block()
+                self.assertEqual(gameboy.cpu.registers.a, value)
+                self.assertLessEqual(len(jit.CODE_CACHE), 4)
+            self.assertEqual(cache.compiled, 10)
+        finally:
+            jit.CODE_CACHE_SIZE = size
+
+    def test_random_programs(self):
+        rng = random.Random(0x1234)
+        for _ in range(50):
+            program = []
+            for _ in range(rng.randrange(1, 60)):
+                kind = rng.random()
+                if kind < 0.7:
+                    program.append(rng.choice(FUZZ_OPCODES))
+                elif kind < 0.85:
+                    program += [rng.choice(FUZZ_IMMEDIATE_OPCODES), rng.randrange(0x100)]
+                elif kind < 0.9:
+                    program += rng.choice(FUZZ_STACK_SEQUENCES)
+                else:
+                    program += [0xCB, rng.choice(FUZZ_CB_OPCODES)]
+            # LD H,0xC1 / <program> / HALT : with a threshold of 1, blocks are compiled on their first run
+            program = [0x26, 0xC1] + program + [0x76]
+            registers = {name: rng.randrange(0x100) for name in ('A', 'B', 'C', 'D', 'E', 'L')}
+            registers['F'] = rng.randrange(0x100) & 0xF0
+            wram = bytes(rng.randrange(0x100) for _ in range(0x200))
+            self.run_both(program, registers=registers, wram=wram)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+from unittest import TestCase
+
+import numpy as np
+
+from pyboy.cpu import IE, IF
+from pyboy.gameboy import GameBoy
+from pyboy.joypad import A, INTERRUPT_JOYPAD, LEFT, P1, RIGHT, START, UP, load_inputs, save_inputs
+
+
+class TestJoypad(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.gameboy = GameBoy(headless=True)
+        self.memory = self.gameboy.memory
+        self.joypad = self.gameboy.joypad
+        # loop: JR loop
+        self.memory.write_block(0x100, [0x18, 0xFE])
+        self.memory[IE] = 0
+        self.memory[IF] = 0
+
+    def test_read(self):
+        self.joypad.press(RIGHT | A)
+        self.memory[P1] = 0x20  # the directions
+        self.assertEqual(self.memory[P1], 0xEE)
+        self.memory[P1] = 0x10  # the buttons
+        self.assertEqual(self.memory[P1], 0xDE)
+        self.memory[P1] = 0x30
+        self.assertEqual(self.memory[P1], 0xFF)
+
+    def test_interrupt(self):
+        self.memory[P1] = 0x20  # the directions
+        self.joypad.press(RIGHT)
+        self.assertEqual(self.memory[IF] & INTERRUPT_JOYPAD, INTERRUPT_JOYPAD)
+        self.memory[IF] = 0
+        # held, then a button of the line not selected
+        self.joypad.press(RIGHT)
+        self.joypad.press(RIGHT | A)
+        self.assertEqual(self.memory[IF] & INTERRUPT_JOYPAD, 0)
+        self.joypad.press(RIGHT | A | UP)
+        self.assertEqual(self.memory[IF] & INTERRUPT_JOYPAD, INTERRUPT_JOYPAD)
+
+    def test_script(self):
+        self.joypad.script(np.array([RIGHT, 0, LEFT], dtype=np.uint8))
+        pressed = []
+        for _ in range(4):
+            self.gameboy.run_frame()
+            pressed.append(self.joypad.buttons)
+        # the last mask stays pressed
+        self.assertEqual(pressed, [RIGHT, 0, LEFT, LEFT])
+        self.assertIsNone(self.joypad.inputs)
+        # any iterable
+        self.joypad.script(iter([A, START]))
+        self.gameboy.run_frame()
+        self.assertEqual(self.joypad.buttons, A)
+
+    def test_interrupt_handler(self):
+        # EI / loop: HALT / JR loop ; joypad handler : INC B / RETI
+        self.memory.write_block(0x100, [0xFB, 0x76, 0x18, 0xFD])
+        self.memory.write_block(0x60, [0x04, 0xD9])
+        self.gameboy.cpu.registers.b = 0
+        self.memory[P1] = 0x10  # the buttons
+        self.memory[IE] = INTERRUPT_JOYPAD
+        # 3 presses of A, one of START while A is held
+        self.joypad.script([A, 0, A, A, 0, A, A | START, 0])
+        for _ in range(8):
+            self.gameboy.run_frame()
+        self.assertEqual(self.gameboy.cpu.registers.b, 4)
+
+    def test_log(self):
+        masks = np.random.RandomState(0).randint(0, 0x100, 120).astype(np.uint8)
+        log = self.joypad.record()
+        self.joypad.script(masks)
+        for _ in range(120):
+            self.gameboy.run_frame()
+        self.assertEqual(bytes(log), masks.tobytes())
+        handle, path = tempfile.mkstemp()
+        os.close(handle)
+        try:
+            save_inputs(path, log)
+            self.assertEqual(os.path.getsize(path), 120)
+            inputs = load_inputs(path)
+            self.assertIsInstance(inputs, np.memmap)
+            replay = GameBoy(headless=True)
+            replayed = replay.joypad.record()
+            replay.joypad.script(inputs)
+            for _ in range(120):
+                replay.run_frame()
+            self.assertEqual(replayed, log)
+            self.assertEqual(load_inputs(path, 4).shape, (30, 4))
+            del inputs
+        finally:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,207 @@
+import os
+import unittest
+from unittest import TestCase
+from pyboy.gameboy import GameBoy
+from pyboy.mbc import MBC1, MBC3, MBC5, RTC, MBCException
+from pyboy.test.test_cartridge import write_rom
+
+
+class MBCTestCase(TestCase):
+    cartridge_type = 0x00
+    ram_size = 0x00
+    bank_count = 8
+
+    def setUp(self):
+        super().setUp()
+        self.path = write_rom(self.bank_count, {0x147: self.cartridge_type, 0x149: self.ram_size})
+        self.gameboy = GameBoy()
+        self.gameboy.load_rom(self.path)
+        self.mem = self.gameboy.memory
+
+    def tearDown(self):
+        self.gameboy.cartridge.close()
+        os.remove(self.path)
+        super().tearDown()
+
+
+class TestROMOnly(MBCTestCase):
+    def test_read_only(self):
+        self.mem[0x2000] = 0x03
+        self.assertEqual(self.mem[0x4000], 1)
+        self.assertEqual(self.mem[0xA000], 0xFF)
+
+
+class TestROMAndRAM(MBCTestCase):
+    cartridge_type = 0x08
+    ram_size = 0x02
+
+    def test_ram(self):
+        # no controller : the RAM is always enabled
+        self.mem[0xA123] = 0x42
+        self.assertEqual(self.mem[0xA123], 0x42)
+        self.assertEqual(self.mem.mbc.ram[0x123], 0x42)
+        self.mem[0x0000] = 0x00
+        self.mem[0xBFFF] = 0x24
+        self.assertEqual(self.mem[0xBFFF], 0x24)
+        self.assertEqual(self.mem[0x4000], 1)
+
+
+class TestMBC1(MBCTestCase):
+    cartridge_type = 0x03
+    ram_size = 0x03
+
+    def test_type(self):
+        self.assertIsInstance(self.mem.mbc, MBC1)
+
+    def test_rom_bank(self):
+        self.mem[0x2000] = 0x05
+        self.assertEqual(self.mem[0x4000], 5)
+        self.assertIs(self.mem.romx, self.gameboy.cartridge.bank(5))
+        self.mem[0x2000] = 0x00
+        self.assertEqual(self.mem[0x4000], 1)
+
+    def test_ram(self):
+        self.mem[0xA000] = 0x12
+        self.assertEqual(self.mem[0xA000], 0xFF)
+        self.mem[0x0000] = 0x0A
+        self.mem[0xA000] = 0x12
+        self.assertEqual(self.mem[0xA000], 0x12)
+        self.mem[0x6000] = 0x01
+        self.mem[0x4000] = 0x02
+        self.assertEqual(self.mem[0xA000], 0x00)
+        self.mem[0xA000] = 0x34
+        self.mem[0x4000] = 0x00
+        self.assertEqual(self.mem[0xA000], 0x12)
+        self.assertEqual(self.mem.mbc.ram[0x4000], 0x34)
+
+    def test_ram_windows(self):
+        mbc = self.mem.mbc
+        self.mem[0x0000] = 0x0A
+        self.mem[0x6000] = 0x01
+        self.mem[0x4000] = 0x02
+        window = mbc.windows[2]
+        self.mem[0x4000] = 0x00
+        self.mem[0x4000] = 0x02
+        # the pages of a bank are built once
+        self.assertIs(mbc.windows[2], window)
+        self.assertIs(self.mem.read_pages[0xA0], mbc.ram_pages[0x40])
+        self.assertIs(self.mem.read_pages[0xA0], window[0][0])
+
+    def test_remap_changed_banks(self):
+        switches = []
+        memory = self.mem
+
+        def record(owner, name):
+            method = getattr(owner, name)
+
+            def recorded(*args):
+                switches.append(name)
+                method(*args)
+            setattr(owner, name, recorded)
+        record(memory, 'switch_rom_bank')
+        record(memory, 'switch_rom0_bank')
+        record(memory.mbc, 'map_ram')
+        memory[0x2000] = 0x05
+        self.assertEqual(switches, ['switch_rom_bank'])
+        del switches[:]
+        # with 8 banks, ROM banks 0x25 and 0x20 are banks 5 and 0
+        memory[0x4000] = 0x01
+        self.assertEqual(switches, [])
+        memory[0x6000] = 0x01  # mode 1 : RAM bank 1
+        self.assertEqual(switches, ['map_ram'])
+        del switches[:]
+        memory[0x2000] = 0x06
+        self.assertEqual(switches, ['switch_rom_bank'])
+        self.assertEqual(memory.rom_bank, 6)
+        del switches[:]
+        memory[0x6000] = 0x01
+        self.assertEqual(switches, [])
+
+
+class TestMBC3(MBCTestCase):
+    cartridge_type = 0x10
+    ram_size = 0x03
+
+    def setUp(self):
+        super().setUp()
+        self.now = 1000.0
+        self.mem.mbc.rtc = RTC(clock=lambda: self.now)
+
+    def test_type(self):
+        self.assertIsInstance(self.mem.mbc, MBC3)
+
+    def test_rom_bank(self):
+        self.mem[0x2000] = 0x07
+        self.assertEqual(self.mem[0x4000], 7)
+        self.mem[0x2000] = 0x00
+        self.assertEqual(self.mem[0x4000], 1)
+
+    def latch(self):
+        self.mem[0x6000] = 0x00
+        self.mem[0x6000] = 0x01
+
+    def test_rtc(self):
+        self.mem[0x0000] = 0x0A
+        self.now += 2 * 86400 + 3 * 3600 + 4 * 60 + 5
+        self.latch()
+        values = []
+        for register in range(0x08, 0x0D):
+            self.mem[0x4000] = register
+            values.append(self.mem[0xA000])
+        self.assertEqual(values, [5, 4, 3, 2, 0])
+
+    def test_rtc_halt(self):
+        self.mem[0x0000] = 0x0A
+        self.mem[0x4000] = 0x0C
+        self.mem[0xA000] = 0x40
+        self.now += 100
+        self.latch()
+        self.mem[0x4000] = 0x08
+        self.assertEqual(self.mem[0xA000], 0)
+        self.mem[0xA000] = 30
+        self.mem[0x4000] = 0x0C
+        self.mem[0xA000] = 0x00
+        self.now += 10
+        self.latch()
+        self.mem[0x4000] = 0x08
+        self.assertEqual(self.mem[0xA000], 40)
+
+    def test_ram_after_rtc(self):
+        self.mem[0x0000] = 0x0A
+        self.mem[0x4000] = 0x01
+        self.mem[0xA000] = 0x56
+        self.assertEqual(self.mem.mbc.ram[0x2000], 0x56)
+
+
+class TestMBC5(MBCTestCase):
+    cartridge_type = 0x19
+    ram_size = 0x04
+
+    def test_type(self):
+        self.assertIsInstance(self.mem.mbc, MBC5)
+
+    def test_rom_bank(self):
+        self.mem[0x2000] = 0x00
+        self.assertEqual(self.mem[0x4000], 0)
+        self.mem[0x2000] = 0x03
+        self.mem[0x3000] = 0x01
+        self.assertEqual(self.mem.mbc.rom_bank, 0x103)
+        self.assertEqual(self.mem[0x4000], 0x103 % self.bank_count)
+
+    def test_ram_bank(self):
+        self.mem[0x0000] = 0x0A
+        self.mem[0x4000] = 0x0F
+        self.mem[0xA000] = 0x78
+        self.assertEqual(self.mem.mbc.ram[0x1E000], 0x78)
+
+
+class TestUnsupported(TestCase):
+    def test_unsupported(self):
+        path = write_rom(2, {0x147: 0xFC})
+        gameboy = GameBoy()
+        with self.assertRaises(MBCException):
+            gameboy.load_rom(path)
+        os.remove(path)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from unittest import TestCase
+from pyboy.memory import Memory
+
+
+class TestMemory(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.mem = Memory()
+
+    def test_regions(self):
+        self.assertEqual(len(self.mem.vram), 0x2000)
+        self.assertEqual(len(self.mem.oam), 0xA0)
+        self.assertEqual(len(self.mem.ie), 1)
+        self.mem[0x8010] = 0xAB
+        self.assertEqual(self.mem.vram[0x10], 0xAB)
+        self.mem.oam[4] = 0xCD
+        self.assertEqual(self.mem[0xFE04], 0xCD)
+
+    def test_read_block(self):
+        block = self.mem.read_block(0xC000, 4)
+        self.mem[0xC002] = 0x42
+        self.assertEqual(bytes(block), b'\x00\x00\x42\x00')
+
+    def test_write_block(self):
+        self.mem.write_block(0xFF80, b'\x01\x02\x03')
+        self.assertEqual(list(self.mem.hram[:4]), [1, 2, 3, 0])
+        self.mem.write_block(0xC000, [4, 5])
+        self.assertEqual(self.mem[0xC001], 5)
+        self.assertEqual(len(self.mem), 0x10000)
+        with self.assertRaises(IndexError):
+            self.mem.write_block(0xFFFF, b'\x00\x00')
+
+    def test_echo(self):
+        self.mem[0xC123] = 0x42
+        self.assertEqual(self.mem[0xE123], 0x42)
+        self.mem[0xFDFF] = 0x24
+        self.assertEqual(self.mem[0xDDFF], 0x24)
+
+    def test_io_hooks(self):
+        writes = []
+        self.mem.add_io_hook(0xFF46, read=lambda address: 0x99, write=lambda address, value: writes.append(value))
+        self.mem[0xFF46] = 0x12
+        self.assertEqual(writes, [0x12])
+        self.assertEqual(self.mem[0xFF46], 0x99)
+        self.mem[0xFF80] = 0x34
+        self.assertEqual(self.mem[0xFF80], 0x34)
+        self.assertEqual(self.mem.hram[0], 0x34)
+
+    def test_iter(self):
+        self.mem[0] = 1
+        self.assertEqual(sum(self.mem), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import unittest
+from unittest import TestCase
+
+import numpy as np
+
+from pyboy.joypad import DOWN, LEFT, RIGHT, UP
+from pyboy.parallel import ParallelRunner
+from pyboy.test.test_batch import PROGRAM
+from pyboy.test.test_cartridge import write_rom
+
+
+class TestParallelRunner(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.path = write_rom(2, {0x100 + offset: byte for offset, byte in enumerate(PROGRAM)})
+        self.runner = ParallelRunner(self.path, 5, workers=2, jit_threshold=1)
+
+    def tearDown(self):
+        self.runner.close()
+        os.remove(self.path)
+        super().tearDown()
+
+    def test_step(self):
+        self.assertEqual(len(self.runner.processes), 2)
+        screens = self.runner.step(np.array([0, RIGHT, LEFT | UP, DOWN, UP], dtype=np.uint8))
+        self.assertEqual(screens.shape, (5, 144, 160))
+        self.assertTrue((screens == 0xFF).all())
+        self.assertEqual((self.runner.ram[:, 0] & 0x0F).tolist(), [0x0F, 0x0E, 0x09, 0x07, 0x0B])
+        # the same buttons, until given new ones
+        self.assertIs(self.runner.step(), screens)
+        self.assertEqual(self.runner.ram[1, 0] & 0x0F, 0x0E)
+        self.runner.buttons[1] = LEFT
+        self.runner.step()
+        self.assertEqual(self.runner.ram[1, 0] & 0x0F, 0x0D)
+
+    def test_reset(self):
+        self.runner.step(np.full(5, RIGHT, dtype=np.uint8))
+        self.runner.reset()
+        self.assertTrue((self.runner.ram == 0).all())
+        self.runner.buttons.fill(0)
+        self.runner.step()
+        self.assertEqual((self.runner.ram[:, 0] & 0x0F).tolist(), [0x0F] * 5)
+
+    def test_close(self):
+        processes = self.runner.processes
+        self.runner.close()
+        self.assertFalse(any(process.is_alive() for process in processes))
+        self.runner.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
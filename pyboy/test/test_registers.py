@@ -0,0 +1,41 @@
+import unittest
+from unittest import TestCase
+from pyboy.registers import Registers
+
+
+class TestRegisters(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.registers = Registers()
+
+    def test_pairs(self):
+        self.registers.h = 0x12
+        self.registers.l = 0x34
+        self.assertEqual(self.registers.hl, 0x1234)
+        self.registers.bc = 0xABCD
+        self.assertEqual(self.registers.b, 0xAB)
+        self.assertEqual(self.registers.c, 0xCD)
+
+    def test_af_low_nibble(self):
+        self.registers.af = 0x12FF
+        self.assertEqual(self.registers.a, 0x12)
+        self.assertEqual(self.registers.f, 0xF0)
+
+    def test_wrap_around(self):
+        self.registers.hl = 0xFFFF
+        self.registers.hl += 1
+        self.assertEqual(self.registers.hl, 0)
+        self.registers['A'] = 0x100
+        self.assertEqual(self.registers['A'], 0)
+        self.registers['SP'] = -1
+        self.assertEqual(self.registers['SP'], 0xFFFF)
+
+    def test_dict_access(self):
+        self.registers['DE'] = 0x1234
+        self.assertEqual(self.registers['D'], 0x12)
+        self.assertEqual(self.registers['E'], 0x34)
+        self.assertIn('HL', self.registers)
+        self.assertEqual(dict(self.registers.items())['DE'], 0x1234)
+
+if __name__ == "__main__":
+    unittest.main()
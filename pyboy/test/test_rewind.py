@@ -0,0 +1,69 @@
+import os
+import unittest
+from unittest import TestCase
+
+from pyboy.gameboy import GameBoy
+from pyboy.test.test_cartridge import write_rom
+from pyboy.test.test_state import PROGRAM
+
+
+class TestRewind(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.path = write_rom(2, {0x100 + offset: byte for offset, byte in enumerate(PROGRAM)})
+        self.gameboy = GameBoy(jit_threshold=2)
+        self.gameboy.load_rom(self.path)
+
+    def tearDown(self):
+        self.gameboy.cartridge.close()
+        os.remove(self.path)
+        super().tearDown()
+
+    def observe(self):
+        gameboy = self.gameboy
+        return gameboy.cpu.registers.items(), bytes(gameboy.memory.mem), gameboy.cycles, gameboy.get_screen().tobytes()
+
+    def test_rewind(self):
+        rewind = self.gameboy.enable_rewind(interval=2, keyframe_interval=3)
+        observed = {}
+        for frame in range(1, 13):
+            self.gameboy.run_frame()
+            observed[frame] = self.observe()
+        self.assertEqual(len(rewind), 6)
+        self.assertEqual(rewind.stats()['keyframes'], 2)
+        # frame 12 - 3 = 9 was not recorded : back to 8, a delta after the keyframe at 6
+        self.assertEqual(rewind.rewind(3), 4)
+        self.assertEqual(self.observe(), observed[8])
+        self.assertEqual(len(rewind), 4)
+        # recording goes on from there
+        for frame in range(9, 13):
+            self.gameboy.run_frame()
+            self.assertEqual(self.observe(), observed[frame])
+        self.assertEqual(rewind.rewind(4), 4)
+        self.assertEqual(self.observe(), observed[8])
+        self.assertEqual(rewind.rewind(100), 6)
+        self.assertEqual(self.observe(), observed[2])
+        self.assertEqual(len(rewind), 1)
+
+    def test_eviction(self):
+        rewind = self.gameboy.enable_rewind(interval=1, keyframe_interval=4)
+        for _ in range(8):
+            self.gameboy.run_frame()
+        size = rewind.stats()['bytes']
+        rewind.max_bytes = size - 1
+        self.gameboy.run_frame()
+        stats = rewind.stats()
+        # the first keyframe and its 3 deltas are gone
+        self.assertEqual(stats['records'], 5)
+        self.assertEqual(stats['evictions'], 1)
+        self.assertLessEqual(stats['bytes'], rewind.max_bytes)
+        self.assertTrue(rewind.records[0][1])
+        self.assertEqual(rewind.rewind(100), 4)
+
+    def test_empty(self):
+        rewind = self.gameboy.enable_rewind()
+        self.assertEqual(rewind.rewind(10), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+from unittest import TestCase
+
+from pyboy.scheduler import NEVER, Scheduler
+
+
+class TestScheduler(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.scheduler = Scheduler()
+        self.calls = []
+
+    def record(self, name, period=None):
+        def callback(cycle):
+            self.calls.append((name, cycle))
+            return None if period is None else cycle + period
+        return callback
+
+    def test_order(self):
+        scheduler = self.scheduler
+        self.assertEqual(scheduler.next_event, NEVER)
+        scheduler.schedule(30, self.record('c'))
+        scheduler.schedule(10, self.record('a'))
+        scheduler.schedule(30, self.record('d'))
+        scheduler.schedule(20, self.record('b'))
+        self.assertEqual(scheduler.next_event, 10)
+        self.assertEqual(scheduler.run(25), 30)
+        self.assertEqual(self.calls, [('a', 10), ('b', 20)])
+        self.assertEqual(scheduler.run(100), NEVER)
+        # same cycle : in the order they were scheduled
+        self.assertEqual(self.calls[2:], [('c', 30), ('d', 30)])
+
+    def test_periodic(self):
+        self.scheduler.schedule(0, self.record('tick', 100))
+        self.scheduler.schedule(150, self.record('once'))
+        self.assertEqual(self.scheduler.run(250), 300)
+        self.assertEqual(self.calls, [('tick', 0), ('tick', 100), ('once', 150), ('tick', 200)])
+        self.assertEqual(len(self.scheduler.queue), 1)
+
+    def test_cancel(self):
+        event = self.scheduler.schedule(10, self.record('a'))
+        self.scheduler.schedule(20, self.record('b'))
+        self.scheduler.cancel(event)
+        self.scheduler.cancel(None)
+        self.scheduler.run(20)
+        self.assertEqual(self.calls, [('b', 20)])
+
+    def test_schedule_from_callback(self):
+        scheduler = self.scheduler
+
+        def first(cycle):
+            self.calls.append(('first', cycle))
+            # earlier than this callback's next call
+            scheduler.schedule(cycle + 5, self.record('nested'))
+            return cycle + 10
+        scheduler.schedule(0, first)
+        scheduler.run(12)
+        self.assertEqual(self.calls, [('first', 0), ('nested', 5), ('first', 10)])
+        self.assertEqual(scheduler.next_event, 15)
+
+
+if __name__ == '__main__':
+    unittest.main()
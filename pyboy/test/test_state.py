@@ -0,0 +1,158 @@
+import os
+import unittest
+from unittest import TestCase
+
+import numpy as np
+
+from pyboy.gameboy import GameBoy
+from pyboy.joypad import LEFT
+from pyboy.state import StateException
+from pyboy.test.test_cartridge import write_rom
+
+# start: LD HL,0xC100 / LD B,0x00
+# loop:  LD A,(HL) / ADD A,B / LDI (HL),A / INC B / JR NZ,loop
+#        LD A,(0xFF00) / JP start
+PROGRAM = [0x21, 0x00, 0xC1, 0x06, 0x00,
+           0x7E, 0x80, 0x22, 0x04, 0x20, 0xFA,
+           0xF0, 0x00, 0xC3, 0x00, 0x01]
+
+
+class TestState(TestCase):
+    def setUp(self):
+        super().setUp()
+        rom = {0x100 + offset: byte for offset, byte in enumerate(PROGRAM)}
+        rom.update({0x147: 0x03, 0x149: 0x02})  # MBC1, 8 KiB of RAM
+        self.path = write_rom(8, rom)
+        self.gameboy = self.create()
+
+    def tearDown(self):
+        self.gameboy.cartridge.close()
+        os.remove(self.path)
+        super().tearDown()
+
+    def create(self, **options):
+        gameboy = GameBoy(jit_threshold=2, **options)
+        gameboy.load_rom(self.path)
+        gameboy.memory.write_block(0x8000, bytes(range(256)) * 4)
+        gameboy.memory[0xFF40] = 0x91
+        return gameboy
+
+    def observe(self, gameboy):
+        return (gameboy.cpu.registers.items(), bytes(gameboy.memory.mem), bytes(gameboy.memory.mbc.ram),
+                gameboy.cycles, gameboy.gpu.ly, gameboy.gpu.mode, gameboy.gpu.frames,
+                gameboy.memory.rom_bank, gameboy.get_screen().tobytes())
+
+    def prepare(self):
+        gameboy = self.gameboy
+        gameboy.memory[0x0000] = 0x0A  # enable RAM
+        gameboy.memory[0x2000] = 0x05  # ROM bank 5
+        gameboy.memory[0xA010] = 0x42
+        gameboy.joypad.buttons = LEFT
+        gameboy.run_cycles(12345)
+
+    def test_restore(self):
+        self.prepare()
+        gameboy = self.gameboy
+        state = gameboy.snapshot()
+        expected = self.observe(gameboy)
+        gameboy.run_frame()
+        after = self.observe(gameboy)
+        gameboy.memory[0x2000] = 0x02
+        gameboy.memory[0xA010] = 0x00
+        gameboy.joypad.buttons = 0
+
+        gameboy.restore(state)
+        self.assertEqual(self.observe(gameboy), expected)
+        self.assertEqual(gameboy.memory[0xA010], 0x42)
+        self.assertEqual(gameboy.memory[0x4000], 5)
+        self.assertEqual(gameboy.joypad.buttons, LEFT)
+        # the same frame again
+        gameboy.run_frame()
+        self.assertEqual(self.observe(gameboy), after)
+
+    def test_save_load(self):
+        self.prepare()
+        data = self.gameboy.save_state()
+        self.assertEqual(data[:4], b'PYBS')
+        other = self.create()
+        try:
+            other.load_state(data)
+            self.assertEqual(self.observe(other), self.observe(self.gameboy))
+            self.assertEqual(other.save_state(), data)
+            self.gameboy.run_frame()
+            other.run_frame()
+            self.assertEqual(self.observe(other), self.observe(self.gameboy))
+        finally:
+            other.cartridge.close()
+
+    def test_flags(self):
+        registers = self.gameboy.cpu.registers
+        # CP 0x01 with A = 0x01
+        registers.a = 0x01
+        self.gameboy.memory.write_block(0xC000, [0xFE, 0x01])
+        registers.pc = 0xC000
+        self.gameboy.cpu.exec_next()
+        state = self.gameboy.snapshot()
+        registers.f = 0x00
+        self.gameboy.restore(state)
+        self.assertEqual(registers.f, 0xC0)
+
+    def test_ram_blocks(self):
+        gameboy = self.gameboy
+        # INC A / JR -3, in work RAM
+        gameboy.memory.write_block(0xC000, [0x3C, 0x18, 0xFD])
+        gameboy.cpu.registers.pc = 0xC000
+        gameboy.cpu.registers.a = 0
+        state = gameboy.snapshot()
+        # DEC A / JR -3
+        gameboy.memory.write_block(0xC000, [0x3D, 0x18, 0xFD])
+        gameboy.run_cycles(160)
+        self.assertEqual(gameboy.cpu.registers.a, 0xF6)
+        blocks = len(gameboy.cpu.block_cache.blocks)
+        gameboy.restore(state)
+        self.assertEqual(len(gameboy.cpu.block_cache.blocks), blocks - 1)
+        gameboy.run_cycles(160)
+        self.assertEqual(gameboy.cpu.registers.a, 10)
+
+    def test_tile_cache(self):
+        gameboy = self.gameboy
+        gameboy.memory.write_block(0x8000, [0x00] * 16)
+        state = gameboy.snapshot()
+        before = gameboy.gpu.screen().copy()
+        gameboy.gpu.render_frame()
+        np.testing.assert_array_equal(gameboy.gpu.framebuffer[0, :8], [0xFF] * 8)
+        gameboy.memory.write_block(0x8000, [0xFF] * 16)
+        gameboy.gpu.render_frame()
+        self.assertEqual(gameboy.gpu.framebuffer[0, 0], 0x00)
+        gameboy.restore(state)
+        np.testing.assert_array_equal(gameboy.get_screen(), before)
+        gameboy.gpu.render_frame()
+        np.testing.assert_array_equal(gameboy.gpu.framebuffer[0, :8], [0xFF] * 8)
+
+    def test_rendering_not_restored(self):
+        # whether frames are rendered belongs to the GameBoy, not to its state
+        headless = self.create(headless=True)
+        try:
+            data = headless.save_state()
+            self.gameboy.load_state(data)
+            self.assertTrue(self.gameboy.gpu.rendering)
+            headless.load_state(self.gameboy.save_state())
+            self.assertFalse(headless.gpu.rendering)
+            self.assertEqual(headless.save_state(), data)
+        finally:
+            headless.cartridge.close()
+
+    def test_invalid(self):
+        data = self.gameboy.save_state()
+        with self.assertRaises(StateException):
+            self.gameboy.load_state(b'PYBS' + data[4:-1])
+        with self.assertRaises(StateException):
+            self.gameboy.load_state(b'XXXX' + data[4:])
+        with self.assertRaises(StateException):
+            self.gameboy.load_state(data[:4] + b'\x63\x00' + data[6:])
+        with self.assertRaises(StateException):
+            GameBoy().load_state(data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+from unittest import TestCase
+from pyboy.memory import Memory
+from pyboy.tilecache import TileCache
+
+
+class TestTileCache(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.memory = Memory()
+        self.cache = TileCache(self.memory)
+
+    def test_decode(self):
+        # row 0 of tile 1 : colors 3, 2, 1, 0, 0, 0, 0, 0
+        self.memory[0x8010] = 0b10100000
+        self.memory[0x8011] = 0b11000000
+        self.assertEqual(list(self.cache.tile(1)[0]), [3, 2, 1, 0, 0, 0, 0, 0])
+        self.assertEqual(self.cache.tiles_decoded, 384)
+
+    def test_invalidation(self):
+        self.cache.tile(0)
+        self.memory[0x8020] = 0xFF
+        self.memory[0x802F] = 0xFF
+        self.assertEqual(self.cache.dirty, {2})
+        self.assertEqual(self.cache.tile_invalidations, 1)
+        self.assertEqual(list(self.cache.tile(2)[0]), [1] * 8)
+        self.assertEqual(list(self.cache.tile(2)[7]), [2] * 8)
+        self.assertEqual(self.cache.tiles_decoded, 385)
+        # writing the same value again changes nothing
+        self.memory[0x8020] = 0xFF
+        self.assertEqual(self.cache.dirty, set())
+        self.assertEqual(self.memory[0x8020], 0xFF)
+
+    def test_tile_map(self):
+        self.memory.write_block(0x8010, [0xFF, 0x00] * 8)  # tile 1 : color 1
+        self.memory.write_block(0x9000, [0x00, 0xFF] * 8)  # tile 256 : color 2
+        self.memory[0x9801] = 1
+        image = self.cache.tile_map(0x1800, True)
+        self.assertEqual(image.shape, (256, 256))
+        self.assertEqual(list(image[3, 6:10]), [0, 0, 1, 1])
+        self.assertIs(self.cache.tile_map(0x1800, True), image)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+        # signed tile data : tile 0 is at 0x9000
+        self.assertEqual(list(self.cache.tile_map(0x1800, False)[0, :9]), [2] * 8 + [0])
+        # a map write drops the images
+        self.memory[0x9800] = 1
+        self.assertEqual(self.cache.map_invalidations, 2)
+        self.assertEqual(list(self.cache.tile_map(0x1800, True)[0, :9]), [1] * 9)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+from unittest import TestCase
+
+from pyboy.gameboy import GameBoy
+from pyboy.timer import DIV, IF, TAC, TIMA, TMA
+
+
+class TestTimer(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.gameboy = GameBoy()
+        self.memory = self.gameboy.memory
+        self.memory[IF] = 0
+        # loop: JR loop
+        self.memory.write_block(0x100, [0x18, 0xFE])
+
+    def test_div(self):
+        self.memory[DIV] = 0x12
+        self.assertEqual(self.memory[DIV], 0)
+        self.gameboy.run_cycles(256 * 5)
+        self.assertEqual(self.memory[DIV], 5)
+        self.gameboy.run_cycles(256 * 256)
+        self.assertEqual(self.memory[DIV], 5)
+        self.memory[DIV] = 0
+        self.assertEqual(self.memory[DIV], 0)
+
+    def test_tima(self):
+        self.memory[DIV] = 0
+        self.memory[TIMA] = 0
+        self.gameboy.run_cycles(1200)
+        # disabled
+        self.assertEqual(self.memory[TIMA], 0)
+        self.memory[DIV] = 0
+        self.memory[TAC] = 0x05  # every 16 cycles
+        self.assertEqual(self.memory[TAC], 0xFD)
+        self.gameboy.run_cycles(160)
+        self.assertEqual(self.memory[TIMA], 10)
+        self.memory[TAC] = 0x06  # every 64 cycles
+        self.gameboy.run_cycles(640)
+        self.assertEqual(self.memory[TIMA], 20)
+        self.memory[TIMA] = 0x80
+        self.memory[TAC] = 0x02  # stopped
+        self.gameboy.run_cycles(640)
+        self.assertEqual(self.memory[TIMA], 0x80)
+
+    def test_overflow(self):
+        self.memory[DIV] = 0
+        self.memory[TMA] = 0xF0
+        self.memory[TIMA] = 0xFE
+        self.memory[TAC] = 0x04  # every 1024 cycles
+        self.gameboy.run_cycles(1024)
+        self.assertEqual(self.memory[TIMA], 0xFF)
+        self.assertEqual(self.memory[IF] & 0x04, 0)
+        self.gameboy.run_cycles(1024)
+        self.assertEqual(self.memory[TIMA], 0xF0)
+        self.assertEqual(self.memory[IF] & 0x04, 0x04)
+        self.memory[IF] = 0
+        self.gameboy.run_cycles(1024 * 16)
+        self.assertEqual(self.memory[TIMA], 0xF0)
+        self.assertEqual(self.memory[IF] & 0x04, 0x04)
+
+    def test_halt(self):
+        # HALT : the run loop skips to the overflow
+        self.memory.write_block(0x100, [0x76])
+        self.memory[0xFF40] = 0x00  # the LCD is off : the GPU has an event every line
+        self.memory[DIV] = 0
+        self.memory[TIMA] = 0xFF
+        self.memory[TAC] = 0x04
+        self.gameboy.run_cycles(2000)
+        self.assertTrue(self.gameboy.cpu.halted)
+        self.assertEqual(self.memory[IF] & 0x04, 0x04)
+        self.assertEqual(self.memory[TIMA], 0x00)
+
+    def test_state(self):
+        self.memory[DIV] = 0
+        self.memory[TIMA] = 0xF8
+        self.memory[TAC] = 0x05
+        self.gameboy.run_cycles(100)
+        state = self.gameboy.save_state()
+        self.gameboy.run_cycles(100)
+        expected = self.memory[TIMA], self.memory[DIV], self.memory[IF]
+        self.gameboy.load_state(state)
+        self.gameboy.run_cycles(100)
+        self.assertEqual((self.memory[TIMA], self.memory[DIV], self.memory[IF]), expected)
+        self.assertEqual(self.memory[IF] & 0x04, 0x04)
+
+
+if __name__ == '__main__':
+    unittest.main()
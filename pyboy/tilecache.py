@@ -0,0 +1,126 @@
+from typing import AbstractSet, Dict, Tuple
+
+import numpy as np
+
+from pyboy.page import HookedPage
+
+TILE_COUNT = 384
+TILE_DATA_SIZE = TILE_COUNT * 16  # 0x8000-0x97FF, then the tile maps
+ALL_TILES = frozenset(range(TILE_COUNT))
+
+# the 8 color numbers of a tile row, indexed by its low and high bytes
+_bits = np.unpackbits(np.arange(256, dtype=np.uint8)).reshape(256, 8)
+ROW_PIXELS = _bits[:, np.newaxis, :] | (_bits[np.newaxis, :, :] << 1)  # type: np.ndarray
+del _bits
+
+
+class TileCache(object):
+    """
+    Caches the VRAM tiles decoded into color numbers, and the 256x256 images
+    of the tile maps built from them.
+
+    Writes to VRAM go through a write hook of the memory page table : a write
+    changing a tile marks it dirty, to be decoded again when next used, and
+    any change drops the map images. Reads are not affected.
+    """
+
+    def __init__(self, memory):
+        self.memory = memory
+        self.vram = memory.vram
+        self.vram_array = np.frombuffer(memory.vram, dtype=np.uint8)
+        # tiles, rows, pixels
+        self.tiles = np.zeros((TILE_COUNT, 8, 8), dtype=np.uint8)
+        # ALL_TILES itself while every tile is dirty : writes then add nothing
+        self.dirty = ALL_TILES  # type: AbstractSet[int]
+        # (map offset in VRAM, unsigned tile data): image
+        self.maps = {}  # type: Dict[Tuple[int, bool], np.ndarray]
+        self.hits = 0
+        self.misses = 0
+        self.tile_invalidations = 0
+        self.map_invalidations = 0
+        self.tiles_decoded = 0
+        for page in range(0x80, 0xA0):
+            memory.write_pages[page] = HookedPage(page << 8, write=self.write)
+
+    def write(self, address: int, value: int) -> None:
+        offset = address - 0x8000
+        if self.vram[offset] == value:
+            return
+        self.vram[offset] = value
+        if offset < TILE_DATA_SIZE:
+            tile = offset >> 4
+            if tile not in self.dirty:
+                self.dirty.add(tile)
+                self.tile_invalidations += 1
+        if self.maps:
+            self.map_invalidations += len(self.maps)
+            self.maps.clear()
+
+    def invalidate(self) -> None:
+        """
+        marks every tile dirty and drops the map images, when VRAM was
+        changed behind the write hooks
+        """
+        self.dirty = ALL_TILES
+        self.maps.clear()
+
+    def vram_contents(self) -> np.ndarray:
+        """
+        returns the video RAM : in a fork, the snapshot it shares until it
+        writes the video RAM, which is then copied whole
+        """
+        memory = self.memory
+        if memory.shared is None:
+            return self.vram_array
+        shared = memory.shared_block(0x8000, 0xA000)
+        if shared is not None:
+            return np.frombuffer(shared, dtype=np.uint8)
+        memory.own(0x8000, 0xA000)
+        return self.vram_array
+
+    def refresh(self) -> None:
+        """
+        decodes the dirty tiles
+        """
+        vram = self.vram_contents()
+        tiles = np.fromiter(self.dirty, dtype=np.intp, count=len(self.dirty))
+        rows = tiles[:, np.newaxis] * 16 + np.arange(0, 16, 2)
+        self.tiles[tiles] = ROW_PIXELS[vram[rows], vram[rows + 1]]
+        self.tiles_decoded += len(tiles)
+        self.dirty = set()
+
+    def tile(self, tile: int) -> np.ndarray:
+        """returns the 8x8 color numbers of a tile, by its index in VRAM"""
+        if self.dirty:
+            self.refresh()
+        return self.tiles[tile]
+
+    def tile_map(self, map_offset: int, unsigned: bool) -> np.ndarray:
+        """
+        returns the 256x256 color numbers of the tile map at the given VRAM
+        offset, with the tile data at 0x8000 (unsigned) or 0x8800
+        """
+        if self.dirty:
+            self.refresh()
+        key = (map_offset, unsigned)
+        image = self.maps.get(key)
+        if image is not None:
+            self.hits += 1
+            return image
+        self.misses += 1
+        indices = self.vram_contents()[map_offset:map_offset + 0x400]
+        if unsigned:
+            tiles = indices.astype(np.intp)
+        else:  # tiles 0-127 at 0x9000, 128-255 at 0x8800
+            tiles = 256 + indices.view(np.int8).astype(np.intp)
+        image = self.maps[key] = self.tiles[tiles].reshape(32, 32, 8, 8).transpose(0, 2, 1, 3).reshape(256, 256)
+        return image
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'tile_invalidations': self.tile_invalidations,
+            'map_invalidations': self.map_invalidations,
+            'tiles_decoded': self.tiles_decoded,
+        }
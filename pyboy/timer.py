@@ -0,0 +1,113 @@
+"""
+The timer : the divider (DIV, 0xFF04) and the timer counter (TIMA, 0xFF05)
+with its modulo (TMA, 0xFF06) and control (TAC, 0xFF07) registers.
+
+Both counters are computed from the cycle counter of the scheduler when
+read, instead of being incremented as cycles pass : only the overflow of
+TIMA, which reloads it and requests the timer interrupt, is an event.
+"""
+from typing import Optional
+
+from pyboy.scheduler import Event, Scheduler
+
+DIV = 0xFF04
+TIMA = 0xFF05
+TMA = 0xFF06
+TAC = 0xFF07
+IF = 0xFF0F
+
+INTERRUPT_TIMER = 0x04
+
+# TIMA counts every 1024, 16, 64 or 256 cycles, by the 2 low bits of TAC
+TIMER_SHIFTS = (10, 4, 6, 8)
+TIMER_ENABLED = 0x04
+# DIV counts every 256 cycles
+DIV_SHIFT = 8
+
+
+class Timer(object):
+    """
+    The counters are kept as their value at a cycle count : the divider as
+    the cycle count it was reset at, TIMA as its value when last written
+    (tima at tima_cycle). Both count on the same system counter, which
+    starts when the divider is reset.
+    """
+
+    def __init__(self, memory, scheduler: Scheduler):
+        self.memory = memory
+        self.mem = memory.mem
+        self.scheduler = scheduler
+        self.div_start = 0
+        self.tima = self.mem[TIMA]
+        self.tima_cycle = 0
+        self.tma = self.mem[TMA]
+        self.tac = self.mem[TAC] & 0x07
+        self.overflow = None  # type: Optional[Event]
+        memory.add_io_hook(DIV, read=self.read_div, write=self.write_div)
+        memory.add_io_hook(TIMA, read=self.read_tima, write=self.write_tima)
+        memory.add_io_hook(TMA, write=self.write_tma)
+        memory.add_io_hook(TAC, read=self.read_tac, write=self.write_tac)
+        self.reschedule()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.tac & TIMER_ENABLED)
+
+    def ticks(self, cycles: int) -> int:
+        """returns the TIMA increments since tima_cycle, at the given cycle count"""
+        if not self.tac & TIMER_ENABLED:
+            return 0
+        shift = TIMER_SHIFTS[self.tac & 0x03]
+        return ((cycles - self.div_start) >> shift) - ((self.tima_cycle - self.div_start) >> shift)
+
+    def sync(self) -> None:
+        """brings tima up to the current cycle count"""
+        cycles = self.scheduler.cycles
+        self.tima = (self.tima + self.ticks(cycles)) & 0xFF
+        self.tima_cycle = cycles
+
+    def reschedule(self) -> None:
+        """schedules the next overflow of TIMA, if it is counting"""
+        self.scheduler.cancel(self.overflow)
+        self.overflow = None
+        if self.tac & TIMER_ENABLED:
+            shift = TIMER_SHIFTS[self.tac & 0x03]
+            tick = ((self.tima_cycle - self.div_start) >> shift) + 0x100 - self.tima
+            self.overflow = self.scheduler.schedule(self.div_start + (tick << shift), self.overflow_event)
+
+    def overflow_event(self, cycle: int) -> None:
+        self.tima = self.tma
+        self.tima_cycle = cycle
+        self.memory[IF] = self.memory[IF] | INTERRUPT_TIMER
+        self.overflow = None
+        self.reschedule()
+
+    # registers
+
+    def read_div(self, address: int) -> int:
+        return ((self.scheduler.cycles - self.div_start) >> DIV_SHIFT) & 0xFF
+
+    def write_div(self, address: int, value: int) -> None:
+        # any write resets the system counter
+        self.sync()
+        self.div_start = self.tima_cycle = self.scheduler.cycles
+        self.reschedule()
+
+    def read_tima(self, address: int) -> int:
+        return (self.tima + self.ticks(self.scheduler.cycles)) & 0xFF
+
+    def write_tima(self, address: int, value: int) -> None:
+        self.sync()
+        self.tima = value
+        self.reschedule()
+
+    def write_tma(self, address: int, value: int) -> None:
+        self.tma = self.mem[TMA] = value
+
+    def read_tac(self, address: int) -> int:
+        return 0xF8 | self.tac
+
+    def write_tac(self, address: int, value: int) -> None:
+        self.sync()
+        self.tac = value & 0x07
+        self.reschedule()